@@ -1,16 +1,119 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading
+import queue
 import os
 import sys
+import time
 from pathlib import Path
-from src.laptop_repair.crew import LaptopRepairCrew
+
+_START_TIME = time.perf_counter()
+
+# Live progress is moved from the worker threads' queue into the results pane in batches
+EVENT_POLL_MS = 100
+MAX_EVENTS_PER_POLL = 500
+
+# Long text is inserted this many characters per event loop turn
+RENDER_CHUNK_CHARS = 16 * 1024
+# Characters rendered before the user has to ask for more
+RENDER_PAGE_CHARS = 256 * 1024
+# Most characters a text widget keeps; the oldest lines are dropped beyond this
+MAX_RETAINED_CHARS = 1024 * 1024
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+from src.laptop_repair.cancellation import CancellationToken, DiagnosisCancelled
+from src.laptop_repair.progress import LLM_TOKEN, STEP, format_event
+from src.laptop_repair.report import ReportParser, parse_report
+from src.laptop_repair.tracing import tracer
+
+
+def load_crew_class():
+    # Deferred so the window appears before crewai, litellm and pydantic are imported
+    from src.laptop_repair.crew import LaptopRepairCrew
+    return LaptopRepairCrew
+
+
+class ChunkedText:
+    """
+    Fills a read-only ScrolledText a chunk at a time from the Tk event loop so
+    that huge reports never block the window. Only a page is rendered until
+    "Load more" is pressed, and the widget never keeps more than max_chars.
+    """
+
+    def __init__(self, widget, more_button, chunk_chars=RENDER_CHUNK_CHARS, page_chars=RENDER_PAGE_CHARS,
+                 max_chars=MAX_RETAINED_CHARS):
+        self.widget = widget
+        self.more_button = more_button
+        self.more_button.config(command=self.load_more)
+        self.chunk_chars = chunk_chars
+        self.page_chars = page_chars
+        self.max_chars = max_chars
+        self._text = ""
+        self._position = 0
+        self._limit = 0
+        self._retained = 0
+        self._job = None
+
+    def set_text(self, text):
+        self._cancel()
+        self.more_button.grid_remove()
+        self.widget.config(state=tk.NORMAL)
+        self.widget.delete("1.0", tk.END)
+        self.widget.config(state=tk.DISABLED)
+        self._retained = 0
+        self._text = text or ""
+        self._position = 0
+        self._limit = min(len(self._text), self.page_chars)
+        self._render_next()
+
+    def load_more(self):
+        self.more_button.grid_remove()
+        self._limit = min(len(self._text), self._limit + self.page_chars)
+        self._render_next()
+
+    def append(self, text):
+        """Add text at the end right away (used for the live log) and scroll to it."""
+        self._insert(text)
+        self.widget.see(tk.END)
+
+    def _cancel(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _render_next(self):
+        self._job = None
+        end = min(self._limit, self._position + self.chunk_chars)
+        if end < self._limit:
+            # Break on a line boundary so a half-rendered line is never shown
+            newline = self._text.rfind("\n", self._position, end)
+            if newline > self._position:
+                end = newline + 1
+        self._insert(self._text[self._position:end])
+        self._position = end
+        if self._position < self._limit:
+            self._job = self.widget.after(1, self._render_next)
+        elif self._position < len(self._text):
+            remaining_kb = (len(self._text) - self._position + 1023) // 1024
+            self.more_button.config(text=f"⬇ Load more ({remaining_kb} KB remaining)")
+            self.more_button.grid()
+
+    def _insert(self, text):
+        if not text:
+            return
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, text)
+        self._retained += len(text)
+        if self._retained > self.max_chars:
+            cut = f"1.0 + {self._retained - self.max_chars} chars lineend + 1 chars"
+            self._retained -= len(self.widget.get("1.0", cut))
+            self.widget.delete("1.0", cut)
+        self.widget.config(state=tk.DISABLED)
+
 
 class WindowsSystemDiagnosticGUI:
-    def __init__(self, root):
+    def __init__(self, root, report_startup_time=False):
         self.root = root
         self.root.title("Windows System Diagnostic Agent")
         self.root.geometry("900x700")
@@ -20,10 +123,23 @@ class WindowsSystemDiagnosticGUI:
         
         self.diagnosis_report = ""
         self.script_content = ""
+        self.script_kind = None
         self.diagnosis_content = ""
         self.submitted_problem = ""
         self.show_script_permission = False
         self.user_approved_script = False
+        self.last_progress_update = 0.0
+        self.report_startup_time = report_startup_time
+        # Reused across diagnoses while the API key stays the same
+        self.repair_crew = None
+        self.repair_crew_api_key = None
+        # Token of the running diagnosis, cancelled by the Cancel button or closing the window
+        self.cancel_token = None
+        # Progress events from the crew's threads, drained on the Tk thread by pump_events
+        self.events = queue.Queue()
+        self.streaming = False
+        # Parses the model's streamed output so the diagnosis can be shown before the script is written
+        self.live_parser = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -61,8 +177,12 @@ Describe the issue you're facing, provide your Gemini API key, and I'll investig
         self.problem_text = scrolledtext.ScrolledText(input_frame, height=4, width=50)
         self.problem_text.grid(row=1, column=1, sticky=(tk.W, tk.E), pady=(5, 10), padx=(10, 0))
         
-        self.diagnose_btn = ttk.Button(input_frame, text="🔍 Diagnose My System", command=self.start_diagnosis)
-        self.diagnose_btn.grid(row=2, column=1, pady=(0, 5), padx=(10, 0), sticky=tk.W)
+        action_frame = ttk.Frame(input_frame)
+        action_frame.grid(row=2, column=1, pady=(0, 5), padx=(10, 0), sticky=tk.W)
+        self.diagnose_btn = ttk.Button(action_frame, text="🔍 Diagnose My System", command=self.start_diagnosis)
+        self.diagnose_btn.grid(row=0, column=0, padx=(0, 10))
+        self.cancel_btn = ttk.Button(action_frame, text="⏹ Cancel", command=self.cancel_diagnosis, state=tk.DISABLED)
+        self.cancel_btn.grid(row=0, column=1)
         
         self.progress_var = tk.StringVar(value="Ready to diagnose...")
         self.progress_label = ttk.Label(input_frame, textvariable=self.progress_var)
@@ -83,6 +203,10 @@ Describe the issue you're facing, provide your Gemini API key, and I'll investig
         
         self.results_text = scrolledtext.ScrolledText(self.results_frame, height=15, state=tk.DISABLED)
         self.results_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        results_more_btn = ttk.Button(self.results_frame)
+        results_more_btn.grid(row=2, column=0, pady=(5, 0))
+        self.results_view = ChunkedText(self.results_text, results_more_btn)
+        results_more_btn.grid_remove()
         self.results_frame.grid_remove()
         
     def create_script_permission_section(self, parent, row):
@@ -122,9 +246,13 @@ Before you proceed:
         
         self.script_text = scrolledtext.ScrolledText(self.script_frame, height=10, state=tk.DISABLED, font=("Courier", 9))
         self.script_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        script_more_btn = ttk.Button(self.script_frame)
+        script_more_btn.grid(row=2, column=0, pady=(0, 10))
+        self.script_view = ChunkedText(self.script_text, script_more_btn)
+        script_more_btn.grid_remove()
         
         script_buttons_frame = ttk.Frame(self.script_frame)
-        script_buttons_frame.grid(row=2, column=0, pady=(0, 10))
+        script_buttons_frame.grid(row=3, column=0, pady=(0, 10))
         
         ttk.Button(script_buttons_frame, text="📥 Save Fix Script", command=self.save_script).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(script_buttons_frame, text="🔄 Generate New Script", command=self.regenerate_script).grid(row=0, column=1)
@@ -139,7 +267,7 @@ Before you proceed:
 7. Test if your original problem is resolved"""
         
         self.instructions_label = ttk.Label(self.script_frame, text=instructions_text, foreground="blue", wraplength=800, justify=tk.LEFT)
-        self.instructions_label.grid(row=3, column=0, pady=(10, 0), sticky=(tk.W, tk.E))
+        self.instructions_label.grid(row=4, column=0, pady=(10, 0), sticky=(tk.W, tk.E))
         self.script_frame.grid_remove()
         
     def start_diagnosis(self):
@@ -158,61 +286,161 @@ Before you proceed:
         os.environ["GEMINI_API_KEY"] = api_key
         self.submitted_problem = problem
         self.diagnose_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
         self.progress_var.set("The diagnostic agents are investigating... This may take a moment.")
         self.progress_bar.start()
-        thread = threading.Thread(target=self.run_diagnosis, args=(problem,))
+        self.cancel_token = CancellationToken()
+        self.start_live_log()
+        thread = threading.Thread(target=self.run_diagnosis, args=(problem, self.cancel_token))
         thread.daemon = True
         thread.start()
-        
-    def run_diagnosis(self, problem):
+
+    def start_live_log(self):
+        while not self.events.empty():
+            self.events.get_nowait()
+        self.results_frame.grid()
+        self.problem_label.config(text=f"Investigating: {self.submitted_problem}")
+        self.results_view.set_text("")
+        self.live_parser = ReportParser(on_section=self.on_report_section)
+        self.streaming = True
+        self.root.after(EVENT_POLL_MS, self.pump_events)
+
+    def pump_events(self):
+        """Append queued progress events to the results pane with one insert per poll."""
+        chunks = []
+        while len(chunks) < MAX_EVENTS_PER_POLL:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event.kind == LLM_TOKEN:
+                self.live_parser.feed(event.text)
+            elif event.kind == STEP:
+                # Each step starts a new completion; only the last one holds the report
+                self.live_parser = ReportParser(on_section=self.on_report_section)
+            chunks.append(format_event(event))
+        if chunks and self.streaming:
+            self.results_view.append("".join(chunks))
+        if self.streaming:
+            # Come back sooner while a backlog remains
+            self.root.after(1 if len(chunks) == MAX_EVENTS_PER_POLL else EVENT_POLL_MS, self.pump_events)
+
+    def on_report_section(self, section, report):
+        if not self.streaming:
+            return
+        if section == "diagnosis" and report.diagnosis:
+            self.progress_var.set(f"🩺 {report.diagnosis.splitlines()[0][:100]} (preparing the fix script...)")
+
+    def cancel_diagnosis(self):
+        if self.cancel_token is None:
+            return
+        # Kills running commands and stops waiting on Gemini; the worker thread reports back
+        self.cancel_token.cancel()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.progress_var.set("Cancelling diagnosis...")
+
+    def diagnosis_cancelled(self):
+        self.cancel_token = None
+        self.streaming = False
+        self.progress_bar.stop()
+        self.progress_var.set("Diagnosis cancelled.")
+        self.diagnose_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+
+    def on_close(self):
+        # Do not leave diagnostic commands running after the window is gone
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.root.destroy()
+        
+    def warm_up(self):
+        """Import the crew stack in the background once the window is visible."""
+        if self.report_startup_time:
+            print(f"[startup] window shown: {(time.perf_counter() - _START_TIME) * 1000:.0f} ms")
+        thread = threading.Thread(target=self.load_crew_stack)
+        thread.daemon = True
+        thread.start()
+
+    def load_crew_stack(self):
         try:
-            repair_crew = LaptopRepairCrew(problem)
-            report = repair_crew.run()
+            load_crew_class()
+        except Exception as e:
+            print(f"Failed to preload the diagnostic engine: {e}")
+            return
+        if self.report_startup_time:
+            print(f"[startup] crew stack imported: {(time.perf_counter() - _START_TIME) * 1000:.0f} ms")
+
+    def run_diagnosis(self, problem, cancel_token=None):
+        try:
+            LaptopRepairCrew = load_crew_class()
+            api_key = os.environ.get("GEMINI_API_KEY")
+            if self.repair_crew is None or self.repair_crew_api_key != api_key:
+                self.repair_crew = LaptopRepairCrew(progress_callback=self.on_command_output,
+                                                    event_callback=self.events.put)
+                self.repair_crew_api_key = api_key
+            report = self.repair_crew.run(problem, cancel_token=cancel_token)
             self.root.after(0, self.diagnosis_complete, report)
-            
+
+        except DiagnosisCancelled:
+            self.root.after(0, self.diagnosis_cancelled)
+
         except Exception as e:
             error_msg = f"An error occurred while running the diagnosis: {e}"
             self.root.after(0, self.diagnosis_error, error_msg)
             
+    def on_command_output(self, command, line):
+        # Called from worker threads for every output line; throttle UI updates
+        now = time.monotonic()
+        if now - self.last_progress_update < 0.1 or not line.strip():
+            return
+        self.last_progress_update = now
+        self.root.after(0, self.progress_var.set, f"Running {command}: {line.strip()[:80]}")
+
     def diagnosis_complete(self, report):
         self.diagnosis_report = report
+        self.cancel_token = None
+        self.streaming = False
         self.progress_bar.stop()
         self.progress_var.set("Diagnosis complete!")
         self.diagnose_btn.config(state=tk.NORMAL)
-        
-        if "--- BATCH SCRIPT START ---" in report:
-            try:
-                diagnosis, script_full = report.split("--- BATCH SCRIPT START ---", 1)
-                script_content = script_full.split("--- BATCH SCRIPT END ---")[0].strip()
-                self.diagnosis_content = diagnosis
-                self.script_content = script_content
-                self.show_script_permission = True
-            except ValueError:
-                self.diagnosis_content = report
-                self.show_script_permission = False
-        else:
-            self.diagnosis_content = report
-            self.show_script_permission = False
+        self.cancel_btn.config(state=tk.DISABLED)
+        
+        with tracer.span("gui.parse_report", report_chars=len(report)):
+            parsed = parse_report(report)
+            self.diagnosis_content = parsed.body
+            self.script_content = parsed.script
+            self.script_kind = parsed.script_kind
+            self.show_script_permission = parsed.has_script
             
         # Update UI
-        self.display_results()
+        with tracer.span("gui.display_results"):
+            self.display_results()
+        self.export_trace()
+
+    def export_trace(self):
+        """Append this diagnosis' spans to the file named by DIAG_TRACE, if set."""
+        trace_path = os.getenv("DIAG_TRACE")
+        if not trace_path or not tracer.enabled:
+            return
+        try:
+            tracer.export(trace_path)
+        except OSError as e:
+            print(f"Could not write trace to {trace_path}: {e}")
+        tracer.clear()
         
     def diagnosis_error(self, error_msg):
+        self.cancel_token = None
+        self.streaming = False
         self.progress_bar.stop()
         self.progress_var.set("Diagnosis failed!")
         self.diagnose_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
         messagebox.showerror("Diagnosis Error", error_msg)
         
     def display_results(self):
         self.results_frame.grid()
         self.problem_label.config(text=f"Problem Investigated: {self.submitted_problem}")
-        self.results_text.config(state=tk.NORMAL)
-        self.results_text.delete("1.0", tk.END)
-        if self.diagnosis_content:
-            self.results_text.insert(tk.END, self.diagnosis_content)
-        else:
-            self.results_text.insert(tk.END, self.diagnosis_report)
-        self.results_text.config(state=tk.DISABLED)
+        self.results_view.set_text(self.diagnosis_content or self.diagnosis_report)
 
         if self.show_script_permission and not self.user_approved_script:
             self.permission_frame.grid()
@@ -223,10 +451,21 @@ Before you proceed:
         self.user_approved_script = True
         self.permission_frame.grid_remove()
         self.display_script()
+        self.record_approval(True)
         
     def decline_script(self):
         self.show_script_permission = False
         self.permission_frame.grid_remove()
+        self.record_approval(False)
+
+    def record_approval(self, approved):
+        # Approved cases are preferred when a similar problem is reported again
+        if self.repair_crew is None:
+            return
+        try:
+            self.repair_crew.record_approval(approved)
+        except Exception as e:
+            print(f"Could not record the script decision: {e}")
         
     def regenerate_script(self):
         self.user_approved_script = False
@@ -244,6 +483,7 @@ Before you proceed:
     def reset_state(self):
         self.diagnosis_report = ""
         self.script_content = ""
+        self.script_kind = None
         self.diagnosis_content = ""
         self.submitted_problem = ""
         self.show_script_permission = False
@@ -252,20 +492,23 @@ Before you proceed:
     def display_script(self):
         if self.user_approved_script and self.script_content:
             self.script_frame.grid()
-            self.script_text.config(state=tk.NORMAL)
-            self.script_text.delete("1.0", tk.END)
-            self.script_text.insert(tk.END, self.script_content)
-            self.script_text.config(state=tk.DISABLED)
+            self.script_view.set_text(self.script_content)
             
     def save_script(self):
         if not self.script_content:
             messagebox.showwarning("No Script", "No script content to save.")
             return
             
+        if self.script_kind == "powershell":
+            extension, file_type = ".ps1", ("PowerShell scripts", "*.ps1")
+        elif self.script_kind == "shell":
+            extension, file_type = ".sh", ("Shell scripts", "*.sh")
+        else:
+            extension, file_type = ".bat", ("Batch files", "*.bat")
         filename = filedialog.asksaveasfilename(
-            defaultextension=".bat",
-            filetypes=[("Batch files", "*.bat"), ("All files", "*.*")],
-            initialname="system_fix_script.bat"
+            defaultextension=extension,
+            filetypes=[file_type, ("All files", "*.*")],
+            initialname=f"system_fix_script{extension}"
         )
         
         if filename:
@@ -277,12 +520,16 @@ Before you proceed:
                 messagebox.showerror("Save Error", f"Failed to save script: {e}")
 
 def main():
+    report_startup_time = "--startup-time" in sys.argv or os.getenv("DIAG_STARTUP_TIME") == "1"
     root = tk.Tk()
-    app = WindowsSystemDiagnosticGUI(root)
+    app = WindowsSystemDiagnosticGUI(root, report_startup_time=report_startup_time)
     root.update_idletasks()
     x = (root.winfo_screenwidth() // 2) - (root.winfo_width() // 2)
     y = (root.winfo_screenheight() // 2) - (root.winfo_height() // 2)
     root.geometry(f"+{x}+{y}")
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    # Warm up the crew stack only after the first frame has been drawn
+    root.after(50, app.warm_up)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import csv
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import IO, Iterator, List
+
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.crew import LaptopRepairCrew
+from src.laptop_repair.report import parse_report
+from src.laptop_repair.tools.command_cache import command_cache
+from src.laptop_repair.tools.custom_tool import _get_prefetch_commands
+from src.laptop_repair.tools.prefetch import DiagnosticPrefetcher
+
+
+_PROBLEM_FIELDS = ("problem", "problem_description", "description")
+
+
+def _ticket(index: int, record) -> dict:
+    """A ticket from a parsed JSON object or CSV row; invalid records become tickets carrying an error."""
+    if not isinstance(record, dict):
+        return {"id": str(index), "problem": "", "error": f"Line {index}: expected a JSON object"}
+    ticket_id = record.get("id")
+    ticket_id = str(ticket_id) if ticket_id not in (None, "") else str(index)
+    problem = next((record[field] for field in _PROBLEM_FIELDS if record.get(field)), "")
+    if not isinstance(problem, str):
+        return {"id": ticket_id, "problem": "",
+                "error": f"Line {index}: the problem must be a string, not {type(problem).__name__}"}
+    return {"id": ticket_id, "problem": problem.strip()}
+
+
+def read_problems(source: IO[str], csv_format: bool = False) -> List[dict]:
+    """
+    Read problem tickets from a JSONL, CSV or plain-text stream. JSON lines and
+    CSV rows may use a 'problem', 'problem_description' or 'description' field
+    plus an optional 'id'; plain text lines are taken as the problem itself.
+    Lines that cannot be read are returned as tickets with an 'error' instead
+    of stopping the batch; blank problems are skipped.
+    """
+    tickets = []
+    if csv_format:
+        for index, row in enumerate(csv.DictReader(source), start=1):
+            tickets.append(_ticket(index, row))
+    else:
+        for index, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    tickets.append({"id": str(index), "problem": "", "error": f"Line {index}: invalid JSON ({e})"})
+                    continue
+                tickets.append(_ticket(index, record))
+            else:
+                tickets.append({"id": str(index), "problem": line})
+    return [ticket for ticket in tickets if ticket["problem"] or ticket.get("error")]
+
+
+def _rejected(ticket: dict) -> dict:
+    """The result record of a ticket that could not be read."""
+    return {"id": ticket["id"], "problem": ticket["problem"], "result": None, "report": None,
+            "error": ticket["error"], "duration": 0.0}
+
+
+def _diagnose(ticket: dict, prefetcher: DiagnosticPrefetcher, workers: threading.local,
+              cancel_token: CancellationToken = None) -> dict:
+    start = time.perf_counter()
+    try:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        # One long-lived crew per worker thread, reused for every ticket it handles
+        if not hasattr(workers, "crew"):
+            # A failed diagnosis raises instead of returning manual steps, so the ticket is reported as an error
+            workers.crew = LaptopRepairCrew(prefetcher=prefetcher, fallback=False)
+        result = workers.crew.run(ticket["problem"], cancel_token=cancel_token)
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    return {
+        "id": ticket["id"],
+        "problem": ticket["problem"],
+        "result": result,
+        "report": parse_report(result).to_dict() if result is not None else None,
+        "error": error,
+        "duration": round(time.perf_counter() - start, 2),
+    }
+
+
+def run_batch(tickets: List[dict], output: IO[str] = sys.stdout, concurrency: int = 4,
+              cancel_token: CancellationToken = None) -> Iterator[dict]:
+    """
+    Diagnose tickets concurrently, sharing one system snapshot (prefetcher) and
+    the command cache across all of them. Each result is written to output as
+    a JSON line as soon as it finishes, and also yielded. Tickets that carry
+    an error from read_problems are reported without being diagnosed. Cancelling
+    cancel_token (or abandoning the iterator) stops every running diagnosis;
+    tickets that had not started are reported with a cancellation error.
+    """
+    cancel_token = cancel_token or CancellationToken()
+    for ticket in tickets:
+        if ticket.get("error"):
+            record = _rejected(ticket)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            yield record
+    tickets = [ticket for ticket in tickets if not ticket.get("error")]
+    if not tickets:
+        return
+    prefetcher = DiagnosticPrefetcher(max_workers=max(4, concurrency), cache=command_cache,
+                                      cancel_token=cancel_token)
+    prefetcher.start(_get_prefetch_commands())
+    workers = threading.local()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="diag-batch") as executor:
+            futures = [executor.submit(_diagnose, ticket, prefetcher, workers, cancel_token) for ticket in tickets]
+            try:
+                for future in as_completed(futures):
+                    record = future.result()
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    yield record
+            except BaseException:
+                # Ctrl-C or a closed generator: kill running commands before the pool waits on them
+                cancel_token.cancel()
+                raise
+    finally:
+        prefetcher.shutdown(wait=False)
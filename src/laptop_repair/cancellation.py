@@ -0,0 +1,64 @@
+import contextvars
+import threading
+from typing import Callable, List, Optional
+
+
+class DiagnosisCancelled(Exception):
+    """Raised when a diagnosis is stopped through its CancellationToken."""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag shared by everything working on one
+    diagnosis. Long-running pieces (subprocesses, LLM calls) register a
+    callback that stops them immediately; loops poll `cancelled`.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise DiagnosisCancelled("The diagnosis was cancelled.")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call callback on cancel (immediately if already cancelled). Returns a
+        function that unregisters it once the guarded work has finished.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        callback()
+        return lambda: None
+
+    def _unregister(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+# Token of the diagnosis running in the current context, read by the LLM wrapper
+current_token: contextvars.ContextVar = contextvars.ContextVar("laptop_repair_cancel_token", default=None)
@@ -1,82 +1,540 @@
+import asyncio
+import contextvars
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
 import yaml
-from crewai import Agent, Task, Crew, Process, LLM
-from src.laptop_repair.tools.custom_tool import SystemCommandTool
+from crewai import Agent, Task, Crew, Process
+from src.laptop_repair.cancellation import DiagnosisCancelled, current_token
+from src.laptop_repair.knowledge import KnowledgeBase, parse_verdict, verification_prompt
+from src.laptop_repair.llm import DiagnosticLLM
+from src.laptop_repair.llm_cache import LLMResponseCache
+from src.laptop_repair.planner import (DEFAULT_PLAN_WAIT, DOMAINS, NO_FACTS, DiagnosticPlan, domain_commands,
+                                       format_facts, plan_diagnostics, plan_domains)
+from src.laptop_repair.progress import STEP, current_listener, emit
+from src.laptop_repair.rate_limit import limits_for, rate_limiter
+from src.laptop_repair.report import DiagnosisReport, parse_report
+from src.laptop_repair.routing import ANALYSIS, PLANNING, ModelRouter, phase_models
+from src.laptop_repair.snapshot import SnapshotStore, SystemSnapshot, diff_snapshots, seed_cache
+from src.laptop_repair.tools.custom_tool import SystemCommandTool, _get_prefetch_commands
+from src.laptop_repair.tools.command_cache import command_cache
+from src.laptop_repair.tools.command_runner import normalize_command
+from src.laptop_repair.tools.prefetch import DiagnosticPrefetcher, aprefetch
+from src.laptop_repair.tools.script_templates import apply_fix_plan
+from src.laptop_repair.tracing import tracer
+
+DEFAULT_MODEL = "gemini/gemini-1.5-flash-latest"
+MODELS_CONFIG = os.path.join(os.path.dirname(__file__), 'config', 'models.yaml')
+# Heads the specialists' findings in the lead's prompt ({specialist_findings} in tasks.yaml)
+SPECIALIST_FINDINGS = "Findings of the specialist agents, who investigated in parallel before you started:"
+
+_config_cache = {}
+_llm_clients = {}
+_shared_lock = threading.Lock()
+
+class DiagnosisFailed(Exception):
+    """Raised by a crew built with fallback=False when the diagnosis fails, instead of the fallback report."""
+
 
 def load_yaml(file_path: str) -> dict:
     """Helper function to load a YAML file."""
     with open(file_path, 'r') as file:
         return yaml.safe_load(file)
 
+def load_config(file_path: str) -> dict:
+    """Load a YAML config once, re-parsing it only when the file's modification time changes."""
+    mtime = os.path.getmtime(file_path)
+    with _shared_lock:
+        cached = _config_cache.get(file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    config = load_yaml(file_path)
+    with _shared_lock:
+        _config_cache[file_path] = (mtime, config)
+    return config
+
+def get_llm(api_key: str, model: str = DEFAULT_MODEL, cache_llm: bool = True, stream: bool = False) -> DiagnosticLLM:
+    """
+    Return a process-wide LLM client so its HTTP connection pool stays warm
+    between runs. Clients of the same model and key share one rate limiter.
+    """
+    key = (model, api_key, cache_llm, stream)
+    limits = limits_for(model, load_config(MODELS_CONFIG))
+    with _shared_lock:
+        llm = _llm_clients.get(key)
+        if llm is None:
+            # Answer repeated prompts from the on-disk response cache
+            response_cache = LLMResponseCache() if cache_llm else None
+            llm = DiagnosticLLM(model=model, api_key=api_key, response_cache=response_cache, stream=stream,
+                                rate_limiter=rate_limiter(model, api_key, **limits))
+            _llm_clients[key] = llm
+        return llm
+
+class _CrewSet:
+    """The lead crew, the specialist crews and the command tool they share, checked out by one run at a time."""
+
+    def __init__(self, configs, tool: SystemCommandTool):
+        self.configs = configs
+        self.tool = tool
+        self.lead: Optional[Crew] = None
+        # Single-task crews by specialist domain, built the first time a plan calls for them
+        self.specialists: Dict[str, Crew] = {}
+
+
 class LaptopRepairCrew:
-    def __init__(self, problem_description: str):
+    """
+    Long-lived diagnosis crew. Configs are parsed once and the agents, tasks
+    and crews are reused across runs; only the run's inputs change. Runs on
+    one instance may overlap: each checks out its own crews and command tool
+    from a pool.
+
+    With specialists=True, the planned problem areas (network, storage,
+    memory/CPU, boot/services) are investigated concurrently by separate
+    command executor agents, each in its own single-task crew, before the
+    lead diagnostician merges their findings, so the investigation takes as
+    long as the slowest area.
+    """
+
+    def __init__(self, problem_description: str = "", prefetch: bool = True, prefetch_workers: int = 4,
+                 native: bool = True, progress_callback=None, cache_llm: bool = True,
+                 prefetcher: DiagnosticPrefetcher = None, llm=None, runner=None, snapshots=True,
+                 incremental: bool = True, event_callback=None, plan: bool = True,
+                 plan_wait: float = DEFAULT_PLAN_WAIT, specialists: bool = False, routing: bool = True,
+                 knowledge=True, fallback: bool = True):
         self.problem_description = problem_description
+        # Answer a failed diagnosis with manual steps; False raises DiagnosisFailed so callers can count it
+        self.fallback = fallback
+        # A prefetcher shared between crews (e.g. in batch mode) is used as-is and never shut down here
+        self.shared_prefetcher = prefetcher
+        # Optional callable receiving (command, line) while diagnostic commands stream output
+        self.progress_callback = progress_callback
+        # Optional callable receiving ProgressEvents (steps, commands, streamed LLM output) from the run
+        self.event_callback = event_callback
+        self.prefetch = prefetch
+        self.prefetch_workers = prefetch_workers
+        # Classify the problem and collect only the relevant commands before the first LLM call
+        self.plan = plan
+        self.plan_wait = plan_wait
+        # Investigate the planned problem areas in parallel, one agent per area
+        self.specialists = specialists
+        # Use in-process psutil collectors where available instead of spawning commands
+        self.native = native
         # Path to the config files (assuming they are in a 'config' subdirectory)
         self.config_path = os.path.join(os.path.dirname(__file__), 'config')
 
-        # Retrieve API key from environment variable
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set. Please provide the API key.")
-            
-        # Initialize the Gemini LLM with enhanced settings for better batch script generation
-        self.llm = LLM(model="gemini/gemini-1.5-flash-latest", api_key = api_key)
+        # Optional stand-in for real command execution (see benchmark.py)
+        self.runner = runner
 
-    def run(self):
+        # Each run's collected state is saved as a snapshot; True uses the default store
+        self.snapshot_store = SnapshotStore() if snapshots is True else (snapshots or None)
+        # Start from the last snapshot, recollecting only entries older than their cache TTL
+        self.incremental = incremental
+        # (baseline, snapshot) of the last finished run, for changes(); each run works on its own pair
+        self._last_snapshots = (None, None)
+
+        # Resolved cases answer similar problems after one verification call; True uses the default store
+        self.knowledge = KnowledgeBase() if knowledge is True else (knowledge or None)
+        # Case of the last run (recorded or recalled), for record_approval
+        self.last_case_id = None
+
+        if llm is not None:
+            # Injected LLM (e.g. the scripted stand-in used by benchmarks)
+            self.api_key = None
+            self.llm = llm
+            self.specialist_llm = llm
+        else:
+            # Retrieve API key from environment variable
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY environment variable not set. Please provide the API key.")
+            self.api_key = api_key
+
+            # Stream completions only when someone is listening for partial output
+            stream = event_callback is not None
+            if routing:
+                # Each phase uses the model configured for it in models.yaml
+                models_config = load_config(MODELS_CONFIG)
+                models = phase_models(models_config, DEFAULT_MODEL)
+                escalation = models_config.get('escalation')
+                self.llm = ModelRouter(models, lambda model: get_llm(api_key, model, cache_llm, stream), escalation)
+                # Only the lead's report is streamed; concurrent specialists would interleave their output
+                self.specialist_llm = ModelRouter(models, lambda model: get_llm(api_key, model, cache_llm),
+                                                  escalation, phase=ANALYSIS)
+            else:
+                self.llm = get_llm(api_key, cache_llm=cache_llm, stream=stream)
+                self.specialist_llm = get_llm(api_key, cache_llm=cache_llm)
+
+        # Guards the pool of idle crew sets and the configs they were built from
+        self._lock = threading.Lock()
+        self._idle_crews: List[_CrewSet] = []
+        self._crew_configs = None
+
+    def _checkout(self, domains=()) -> Tuple[_CrewSet, Dict[str, Crew]]:
         """
-        Initializes and runs the crew with configurations loaded from YAML files.
-        Returns a comprehensive diagnosis and batch script for fixing the system issue.
+        An idle crew set from the pool, or a new one, and its crews for these
+        specialist domains. Sets built from config files that have since
+        changed on disk are dropped.
         """
         # Load agent and task configurations from YAML
-        agents_config = load_yaml(os.path.join(self.config_path, 'agents.yaml'))
-        tasks_config = load_yaml(os.path.join(self.config_path, 'tasks.yaml'))
- 
-        # Instantiate the enhanced system diagnostic tool
-        system_tool = SystemCommandTool()
-
-        # --- Create the Lead Diagnostician Agent ---
-        lead_diagnostician = Agent(
-            **agents_config['lead_diagnostician_agent'],
-            tools=[system_tool],
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False
-        )
-
-        # --- Create the System Analysis Task ---
-        system_analysis_task = Task(
-            **tasks_config['system_analysis_task'],
-            agent=lead_diagnostician,
-        )
-
-        # --- Assemble the Crew ---
-        crew = Crew(
-            agents=[lead_diagnostician],
-            tasks=[system_analysis_task],
-            process=Process.sequential,
-            verbose=True
-        )
+        agents_config = load_config(os.path.join(self.config_path, 'agents.yaml'))
+        tasks_config = load_config(os.path.join(self.config_path, 'tasks.yaml'))
+        with self._lock:
+            if self._crew_configs is None or self._crew_configs[0] is not agents_config or self._crew_configs[1] is not tasks_config:
+                self._idle_crews = []
+                self._crew_configs = (agents_config, tasks_config)
+            configs = self._crew_configs
+            crews = self._idle_crews.pop() if self._idle_crews else None
+        if crews is None:
+            # Instantiate the enhanced system diagnostic tool
+            crews = _CrewSet(configs, SystemCommandTool(native=self.native, progress_callback=self.progress_callback,
+                                                        runner=self.runner))
+
+        if crews.lead is None:
+            # --- Create the Lead Diagnostician Agent ---
+            lead_diagnostician = Agent(
+                **agents_config['lead_diagnostician_agent'],
+                tools=[crews.tool],
+                llm=self.llm,
+                step_callback=self._on_step,
+                verbose=True,
+                allow_delegation=False
+            )
+
+            # --- Create the System Analysis Task ---
+            system_analysis_task = Task(
+                **tasks_config['system_analysis_task'],
+                agent=lead_diagnostician
+            )
+
+            # --- Assemble the Crew ---
+            crews.lead = Crew(
+                agents=[lead_diagnostician],
+                tasks=[system_analysis_task],
+                process=Process.sequential,
+                verbose=True
+            )
+
+        # --- Create one Command Executor Agent and crew per specialist domain ---
+        for domain in domains:
+            if domain in crews.specialists:
+                continue
+            specialist = Agent(
+                **agents_config['command_executor_agent'],
+                tools=[crews.tool],
+                llm=self.specialist_llm,
+                step_callback=lambda step, domain=domain: self._on_step(step, domain),
+                verbose=True,
+                allow_delegation=False
+            )
+            investigation_task = Task(
+                **tasks_config[f'{domain}_investigation_task'],
+                name=domain,
+                agent=specialist
+            )
+            crews.specialists[domain] = Crew(
+                agents=[specialist],
+                tasks=[investigation_task],
+                process=Process.sequential,
+                verbose=True
+            )
+        return crews, {domain: crews.specialists[domain] for domain in domains}
 
+    def _release(self, crews: Optional[_CrewSet]) -> None:
+        """Return a run's crew set to the pool, unless the configs changed while it ran."""
+        if crews is None:
+            return
+        crews.tool.prefetcher = None
+        crews.tool.snapshot = None
+        crews.tool.cancel_token = None
+        with self._lock:
+            if crews.configs is self._crew_configs:
+                self._idle_crews.append(crews)
+
+    def _investigate(self, crews: Dict[str, Crew], inputs: dict, cancel_token=None) -> str:
+        """
+        Run the specialist crews concurrently and return their findings for the
+        lead's prompt. Each thread runs in its own copy of the run's context, so
+        the cancel token, progress listener and trace span reach it. A
+        specialist that fails is reported as such instead of failing the run.
+        """
+        with ThreadPoolExecutor(max_workers=len(crews), thread_name_prefix="diag-specialist") as executor:
+            futures = {
+                domain: executor.submit(contextvars.copy_context().run, self._specialist, domain, crew, inputs)
+                for domain, crew in crews.items()
+            }
+        findings = []
+        for domain, future in futures.items():
+            try:
+                text = future.result()
+            except Exception as e:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise DiagnosisCancelled("The diagnosis was cancelled.") from e
+                print(f"⚠️ The {domain} specialist failed: {e}")
+                text = f"The investigation could not be completed ({e})."
+            findings.append(f"[{domain}]\n{text.strip()}")
+        return SPECIALIST_FINDINGS + "\n\n" + "\n\n".join(findings)
+
+    def _specialist(self, domain: str, crew: Crew, inputs: dict) -> str:
+        with tracer.span("crew.specialist", task=domain):
+            return str(crew.kickoff(inputs=inputs).raw)
+
+    def _on_step(self, step, domain: str = None) -> None:
+        # crewAI reports the agent's actions, its final answer and, separately, raw tool results
+        agent = f"{domain.capitalize()} specialist" if domain else None
+        if getattr(step, "tool", None):
+            emit(STEP, f"{agent} used {step.tool}" if agent else f"Used {step.tool}")
+        elif hasattr(step, "output") and hasattr(step, "thought"):
+            emit(STEP, f"{agent} finished" if agent else "Final answer ready")
+
+    def _listener(self, cancel_token=None):
+        """The event callback for one run, muted once the run is cancelled so abandoned LLM calls stay silent."""
+        if self.event_callback is None or cancel_token is None:
+            return self.event_callback
+
+        def listener(event):
+            if not cancel_token.cancelled:
+                self.event_callback(event)
+        return listener
+
+    def _plan(self, problem_description: str) -> Tuple[Optional[DiagnosticPlan], List[str]]:
+        """
+        The run's plan (None when planning is off) and the commands to collect
+        up front: the plan's, or the generic prefetch set. The plan belongs to
+        the run and is passed along explicitly, since runs may overlap.
+        """
+        if not self.plan:
+            return None, _get_prefetch_commands()
+        with tracer.span("plan") as span:
+            plan = plan_diagnostics(problem_description, fallback=_get_prefetch_commands())
+            span.set(categories=",".join(plan.categories), commands=len(plan.commands))
+        focus = ", ".join(plan.categories) or "general"
+        print(f"🧭 Planned diagnostics ({focus}): {', '.join(plan.commands)}")
+        return plan, plan.commands
+
+    def _system_facts(self, plan: Optional[DiagnosticPlan], prefetcher=None, collected=None) -> str:
+        """Wait up to plan_wait for the planned commands and render them for the task prompt."""
+        if plan is None:
+            return NO_FACTS
+        results = dict(collected or {})
+        futures = {}
+        for command in plan.commands:
+            key = normalize_command(command)
+            if key in results:
+                continue
+            cached = command_cache.get(command)
+            if cached is not None:
+                results[key] = cached
+            elif prefetcher is not None and prefetcher.future(command) is not None:
+                futures[key] = prefetcher.future(command)
+        if futures:
+            with tracer.span("plan.wait", commands=len(futures)):
+                wait(list(futures.values()), timeout=self.plan_wait)
+        for key, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                results[key] = future.result()
+        return format_facts(plan, results)
+
+    def _prepare_kickoff(self, problem_description: str, prefetcher, cancel_token, system_facts: str,
+                         plan: Optional[DiagnosticPlan], snapshot: Optional[SystemSnapshot]):
+        """Check out the run's crews, bind the run's state to their tool and build the task inputs."""
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        domains = plan_domains(plan) if self.specialists else []
+        inputs = {'problem_description': problem_description, 'system_facts': system_facts,
+                  'specialist_findings': ""}
+        if domains:
+            print(f"👥 Specialists investigating in parallel: {', '.join(domains)}")
+            inputs.update({f'{domain}_commands': ", ".join(domain_commands(domain)) or "none"
+                           for domain in DOMAINS})
+        with tracer.span("crew.setup"):
+            crews, specialist_crews = self._checkout(domains)
+        crews.tool.prefetcher = prefetcher
+        crews.tool.snapshot = snapshot
+        crews.tool.cancel_token = cancel_token
+        return crews, specialist_crews, inputs
+
+    def _finish_kickoff(self, problem_description: str, result, cancel_token) -> str:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return self._result_text(result, problem_description)
+
+    def _kickoff_failed(self, problem_description: str, e: Exception, cancel_token) -> str:
+        # crewAI wraps or retries on errors, so a cancelled token decides rather than the exception type
+        if cancel_token is not None and cancel_token.cancelled:
+            print("🛑 Laptop Repair Crew: Diagnosis cancelled.")
+            raise DiagnosisCancelled("The diagnosis was cancelled.") from e
+        if not self.fallback:
+            print(f"❌ Error during crew execution: {str(e)}")
+            raise DiagnosisFailed(f"The diagnosis failed: {e}") from e
+        return self._fallback_report(problem_description, e)
+
+    def _kickoff(self, problem_description: str, prefetcher=None, cancel_token=None,
+                 system_facts: str = NO_FACTS, plan: Optional[DiagnosticPlan] = None,
+                 snapshot: Optional[SystemSnapshot] = None) -> str:
         print("🔧 Laptop Repair Crew: Starting comprehensive system diagnosis...")
-        print(f"📋 Problem to investigate: {self.problem_description}")
-        
+        print(f"📋 Problem to investigate: {problem_description}")
+
+        # The LLM wrapper picks the token up from the context to abort in-flight calls
+        context_token = current_token.set(cancel_token)
+        listener_token = current_listener.set(self._listener(cancel_token))
+        crews = None
         try:
+            crews, specialist_crews, inputs = self._prepare_kickoff(problem_description, prefetcher, cancel_token,
+                                                                    system_facts, plan, snapshot)
             # Execute the crew with the problem description
-            result = crew.kickoff(inputs={'problem_description': self.problem_description})
-            
-            print("✅ Laptop Repair Crew: Diagnosis and batch script generation complete.")
-            
-            # Ensure the result is properly formatted
-            if hasattr(result, 'raw'):
-                return str(result.raw)
-            else:
-                return str(result)
-                
+            with tracer.span("crew.kickoff"):
+                if specialist_crews:
+                    inputs['specialist_findings'] = self._investigate(specialist_crews, inputs, cancel_token)
+                result = crews.lead.kickoff(inputs=inputs)
+            return self._finish_kickoff(problem_description, result, cancel_token)
         except Exception as e:
-            print(f"❌ Error during crew execution: {str(e)}")
-            # Return a fallback diagnostic report
-            return f"""
-**Problem Summary:** {self.problem_description}
+            return self._kickoff_failed(problem_description, e, cancel_token)
+        finally:
+            current_token.reset(context_token)
+            current_listener.reset(listener_token)
+            self._release(crews)
+
+    async def _akickoff(self, problem_description: str, prefetcher=None, cancel_token=None,
+                        system_facts: str = NO_FACTS, plan: Optional[DiagnosticPlan] = None,
+                        snapshot: Optional[SystemSnapshot] = None) -> str:
+        """_kickoff() awaiting the specialists and the crew's kickoff_async instead of blocking the caller."""
+        print("🔧 Laptop Repair Crew: Starting comprehensive system diagnosis...")
+        print(f"📋 Problem to investigate: {problem_description}")
+
+        context_token = current_token.set(cancel_token)
+        listener_token = current_listener.set(self._listener(cancel_token))
+        crews = None
+        try:
+            crews, specialist_crews, inputs = await asyncio.to_thread(
+                self._prepare_kickoff, problem_description, prefetcher, cancel_token, system_facts, plan, snapshot)
+            with tracer.span("crew.kickoff"):
+                if specialist_crews:
+                    inputs['specialist_findings'] = await asyncio.to_thread(self._investigate, specialist_crews,
+                                                                            inputs, cancel_token)
+                result = await crews.lead.kickoff_async(inputs=inputs)
+            return self._finish_kickoff(problem_description, result, cancel_token)
+        except Exception as e:
+            return self._kickoff_failed(problem_description, e, cancel_token)
+        finally:
+            current_token.reset(context_token)
+            current_listener.reset(listener_token)
+            self._release(crews)
+
+    def _match(self, problem_description: str, system_facts: str):
+        """A resolved case similar enough to be verified on this system, or None."""
+        if self.knowledge is None or system_facts == NO_FACTS:
+            return None
+        with tracer.span("knowledge.match") as span:
+            match = self.knowledge.match(problem_description)
+            span.set(matched=match is not None, score=match.score if match else 0.0)
+        if match is not None:
+            print(f"📚 Similar resolved case #{match.case.id} (similarity {match.score:.2f}); verifying it on this system...")
+        return match
+
+    def _verifier(self):
+        # A plain question, not an agent step, so it skips the router's step validation
+        return self.llm.client(PLANNING) if isinstance(self.llm, ModelRouter) else self.llm
+
+    def _verify_failed(self, e: Exception, cancel_token) -> Tuple[None, None]:
+        if cancel_token is not None and cancel_token.cancelled:
+            raise DiagnosisCancelled("The diagnosis was cancelled.") from e
+        print(f"⚠️ Could not verify the resolved case: {e}")
+        return None, None
+
+    def _recalled(self, match, answer) -> Tuple[Optional[str], Optional[int]]:
+        """The case's report and id if the model's answer confirms it, else (None, None)."""
+        confirmed, reason = parse_verdict(str(answer))
+        if not confirmed:
+            print(f"↪️ Resolved case #{match.case.id} does not fit this system ({reason}); running the full diagnosis.")
+            return None, None
+        print(f"✅ Resolved case #{match.case.id} confirmed: {reason}")
+        self.knowledge.mark_used(match.case.id)
+        note = (f"**Note:** This matches previously resolved case #{match.case.id} (similarity {match.score:.2f}) "
+                f"and was confirmed against this system's current state: {reason}\n\n")
+        return note + match.case.report, match.case.id
+
+    def _recall(self, problem_description: str, system_facts: str,
+                cancel_token=None) -> Tuple[Optional[str], Optional[int]]:
+        """
+        The report and id of a similar resolved case, if one exists and the
+        model confirms it against this system's facts in a single call; else
+        (None, None).
+        """
+        match = self._match(problem_description, system_facts)
+        if match is None:
+            return None, None
+
+        context_token = current_token.set(cancel_token)
+        listener_token = current_listener.set(self._listener(cancel_token))
+        try:
+            emit(STEP, f"Checking resolved case #{match.case.id}")
+            with tracer.span("knowledge.verify", case=match.case.id):
+                messages = [{"role": "user", "content": verification_prompt(match, problem_description, system_facts)}]
+                answer = self._verifier().call(messages)
+        except Exception as e:
+            return self._verify_failed(e, cancel_token)
+        finally:
+            current_token.reset(context_token)
+            current_listener.reset(listener_token)
+        return self._recalled(match, answer)
+
+    async def _arecall(self, problem_description: str, system_facts: str,
+                       cancel_token=None) -> Tuple[Optional[str], Optional[int]]:
+        """_recall() with the verification request awaited on the event loop."""
+        match = await asyncio.to_thread(self._match, problem_description, system_facts)
+        if match is None:
+            return None, None
+
+        context_token = current_token.set(cancel_token)
+        listener_token = current_listener.set(self._listener(cancel_token))
+        try:
+            emit(STEP, f"Checking resolved case #{match.case.id}")
+            with tracer.span("knowledge.verify", case=match.case.id):
+                messages = [{"role": "user", "content": verification_prompt(match, problem_description, system_facts)}]
+                llm = self._verifier()
+                # Injected stand-ins only implement the synchronous call()
+                if isinstance(llm, DiagnosticLLM):
+                    answer = await llm.acall(messages)
+                else:
+                    answer = await asyncio.to_thread(llm.call, messages)
+        except Exception as e:
+            return self._verify_failed(e, cancel_token)
+        finally:
+            current_token.reset(context_token)
+            current_listener.reset(listener_token)
+        return await asyncio.to_thread(self._recalled, match, answer)
+
+    def _remember(self, problem_description: str, report: str, system_facts: str) -> Optional[int]:
+        """Store the run as a resolved case; its id, or None."""
+        if self.knowledge is None:
+            return None
+        try:
+            return self.knowledge.record(problem_description, report, facts=system_facts)
+        except Exception as e:
+            print(f"⚠️ Could not store the resolved case: {e}")
+            return None
+
+    def record_approval(self, approved: bool = True, case_id: int = None) -> None:
+        """Record whether the user approved the fix script of the last run (or of case_id)."""
+        case_id = case_id or self.last_case_id
+        if self.knowledge is not None and case_id is not None:
+            self.knowledge.set_approval(case_id, approved)
+
+    def _result_text(self, result, problem_description: str) -> str:
+        print("✅ Laptop Repair Crew: Diagnosis and batch script generation complete.")
+        
+        # Ensure the result is properly formatted
+        text = str(result.raw) if hasattr(result, 'raw') else str(result)
+        # The model picks catalog fixes; the script itself is rendered from templates
+        with tracer.span("script.render"):
+            return apply_fix_plan(text, title=f"Fix for: {problem_description}")
+
+    def _fallback_report(self, problem_description: str, e: Exception) -> str:
+        print(f"❌ Error during crew execution: {str(e)}")
+        # Return a fallback diagnostic report
+        return f"""
+**Problem Summary:** {problem_description}
 
 **Diagnostic Results:** An error occurred during the automated diagnosis process.
 
@@ -98,10 +556,126 @@ chkdsk C: /f
 Note: The automated batch script generation failed. Please run these commands manually in an Administrator Command Prompt.
 """
 
+    def _begin_snapshot(self) -> Tuple[Optional[SystemSnapshot], Optional[SystemSnapshot]]:
+        """The baseline and the new, empty snapshot of a run; (None, None) without a snapshot store."""
+        if self.snapshot_store is None:
+            return None, None
+        baseline = self.snapshot_store.latest()
+        snapshot = SystemSnapshot()
+        if self.incremental:
+            seeded = seed_cache(baseline, command_cache)
+            snapshot.carry_forward(baseline, seeded)
+        return baseline, snapshot
+
+    def _save_snapshot(self, baseline: Optional[SystemSnapshot], snapshot: Optional[SystemSnapshot],
+                       collected=None) -> None:
+        if snapshot is None:
+            return
+        for result in (collected or {}).values():
+            snapshot.record(result)
+        try:
+            self.snapshot_store.save(snapshot)
+        except OSError as e:
+            print(f"⚠️ Could not save system snapshot: {e}")
+        self._last_snapshots = (baseline, snapshot)
+
+    @property
+    def baseline(self) -> Optional[SystemSnapshot]:
+        """The snapshot the last finished run started from."""
+        return self._last_snapshots[0]
+
+    @property
+    def snapshot(self) -> Optional[SystemSnapshot]:
+        """The snapshot saved by the last finished run."""
+        return self._last_snapshots[1]
+
+    def changes(self, since: SystemSnapshot = None):
+        """Differences between the last run's snapshot and `since` (default: the run's baseline)."""
+        baseline, snapshot = self._last_snapshots
+        older = since or baseline
+        if older is None or snapshot is None:
+            return []
+        return diff_snapshots(older, snapshot)
+
+    def run(self, problem_description: str = None, cancel_token=None):
+        """
+        Runs the crew for the given problem (or the one passed to the constructor).
+        Returns a comprehensive diagnosis and batch script for fixing the system issue.
+        Cancelling cancel_token from another thread kills running commands, stops
+        waiting on the LLM and raises DiagnosisCancelled.
+        """
+        problem_description = problem_description or self.problem_description
+
+        with tracer.span("crew.run", problem_chars=len(problem_description or "")):
+            baseline, snapshot = self._begin_snapshot()
+            # Collect the problem's planned commands in parallel before the first LLM call
+            plan, commands = self._plan(problem_description)
+            prefetcher = self.shared_prefetcher
+            if prefetcher is None and self.prefetch:
+                prefetcher = DiagnosticPrefetcher(
+                    max_workers=self.prefetch_workers,
+                    cache=command_cache,
+                    native=self.native,
+                    on_output=self.progress_callback,
+                    runner=self.runner,
+                    cancel_token=cancel_token
+                )
+            if prefetcher is not None:
+                prefetcher.start(commands)
+
+            try:
+                system_facts = self._system_facts(plan, prefetcher)
+                report, case_id = self._recall(problem_description, system_facts, cancel_token)
+                if report is None:
+                    report = self._kickoff(problem_description, prefetcher, cancel_token, system_facts, plan,
+                                           snapshot)
+                    case_id = self._remember(problem_description, report, system_facts)
+                # Set once the run is done, since runs on one instance may overlap
+                self.last_case_id = case_id
+                return report
+            finally:
+                self._save_snapshot(baseline, snapshot, prefetcher.collected() if prefetcher is not None else None)
+                if prefetcher is not None and prefetcher is not self.shared_prefetcher:
+                    prefetcher.shutdown(wait=False)
+
+    def run_report(self, problem_description: str = None, cancel_token=None) -> DiagnosisReport:
+        """run(), with the report split into its sections and script."""
+        return parse_report(self.run(problem_description, cancel_token=cancel_token))
+
+    async def run_async(self, problem_description: str = None, cancel_token=None):
+        """
+        Asyncio variant of run(). Diagnostics are prefetched concurrently on the
+        running event loop into the shared command cache, a resolved case is
+        verified with DiagnosticLLM.acall, and the crew runs through
+        kickoff_async. Concurrent runs on one instance overlap.
+        """
+        problem_description = problem_description or self.problem_description
+        with tracer.span("crew.run", problem_chars=len(problem_description or "")):
+            baseline, snapshot = await asyncio.to_thread(self._begin_snapshot)
+            plan, commands = self._plan(problem_description)
+            collected = {}
+            if self.prefetch:
+                with tracer.span("prefetch.wait"):
+                    collected = await aprefetch(commands, cache=command_cache, native=self.native,
+                                                concurrency=self.prefetch_workers, runner=self.runner,
+                                                cancel_token=cancel_token)
+
+            try:
+                system_facts = await asyncio.to_thread(self._system_facts, plan, self.shared_prefetcher, collected)
+                report, case_id = await self._arecall(problem_description, system_facts, cancel_token)
+                if report is None:
+                    report = await self._akickoff(problem_description, self.shared_prefetcher, cancel_token,
+                                                  system_facts, plan, snapshot)
+                    case_id = await asyncio.to_thread(self._remember, problem_description, report, system_facts)
+                self.last_case_id = case_id
+                return report
+            finally:
+                await asyncio.to_thread(self._save_snapshot, baseline, snapshot, collected)
+
     def get_system_info(self):
         """Helper method to get basic system information for debugging."""
         try:
             system_tool = SystemCommandTool()
             return system_tool._run("systeminfo")
         except Exception as e:
-            return f"Unable to retrieve system information: {str(e)}"
\ No newline at end of file
+            return f"Unable to retrieve system information: {str(e)}"
@@ -0,0 +1,227 @@
+import math
+import os
+import platform
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.laptop_repair.report import DiagnosisReport, parse_report
+
+DEFAULT_KNOWLEDGE_PATH = os.path.join(os.path.expanduser("~"), ".laptop_repair", "knowledge.sqlite3")
+DEFAULT_MAX_CASES = 1000
+# Cosine similarity of the problem descriptions' TF-IDF vectors needed before a case is verified
+DEFAULT_MIN_SCORE = 0.55
+# Stored facts are only context for the verification prompt, so very long ones are cut
+MAX_FACTS_CHARS = 8000
+
+VERIFY_HEADING = "PRIOR CASE VERIFICATION"
+
+_WORD = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can cannot could do does doing for from get gets got had has have i if in "
+    "into is it its it's just keep keeps me my of on or so still than that the then there this to too very was "
+    "when which while will with won't would you your always every few".split()
+)
+# 'crashes' loses 'es', 'drops' only 's'
+_ES_ENDINGS = ("shes", "ches", "xes", "sses")
+_SUFFIXES = ("ing", "ed", "s")
+
+
+def _stem(word: str) -> str:
+    if word.endswith(_ES_ENDINGS):
+        word = word[:-2]
+    elif not word.endswith("ss"):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                # 'dropping' -> 'dropp' -> 'drop'
+                if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiousl":
+                    word = word[:-1]
+                break
+    # 'charge' and 'charging' -> 'charg'
+    return word[:-1] if len(word) > 4 and word.endswith("e") else word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without stopwords, reduced to a rough stem ('dropping' and 'drops' -> 'drop')."""
+    return [_stem(word) for word in _WORD.findall((text or "").lower()) if word not in _STOPWORDS]
+
+
+@dataclass
+class ResolvedCase:
+    """A completed diagnosis kept for answering similar problems later."""
+    id: int
+    problem: str
+    report: str
+    diagnosis: str = ""
+    script: str = ""
+    script_kind: Optional[str] = None
+    facts: str = ""
+    platform: str = ""
+    created: float = 0.0
+    # None until the user decides; True once they approved the fix script
+    approved: Optional[bool] = None
+    uses: int = 0
+
+
+@dataclass
+class CaseMatch:
+    case: ResolvedCase
+    score: float
+
+
+class _Index:
+    """TF-IDF vectors of the stored problem descriptions."""
+
+    def __init__(self, documents: Dict[int, str]):
+        counts = {case_id: Counter(tokenize(text)) for case_id, text in documents.items()}
+        document_frequency = Counter(term for terms in counts.values() for term in terms)
+        total = len(counts)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self.vectors = {case_id: self.vector(terms) for case_id, terms in counts.items()}
+
+    def vector(self, terms: Counter) -> Dict[str, float]:
+        weights = {term: count * self.idf.get(term, 0.0) for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items() if weight} if norm else {}
+
+    def search(self, text: str) -> List[Tuple[int, float]]:
+        query = self.vector(Counter(tokenize(text)))
+        scores = []
+        for case_id, vector in self.vectors.items():
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            if score > 0:
+                scores.append((case_id, score))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+
+class KnowledgeBase:
+    """
+    SQLite store of resolved cases with an in-memory TF-IDF index over their
+    problem descriptions. The index is rebuilt when the store changes, also
+    when another process or crew added a case. A new connection is opened
+    per operation so the store can be shared between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_KNOWLEDGE_PATH, max_cases: int = DEFAULT_MAX_CASES):
+        self.path = path
+        self.max_cases = max_cases
+        self._lock = threading.Lock()
+        self._index: Optional[_Index] = None
+        self._index_version = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cases ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, problem TEXT, report TEXT, diagnosis TEXT, script TEXT, "
+                "script_kind TEXT, facts TEXT, platform TEXT, created REAL, approved INTEGER, uses INTEGER DEFAULT 0)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, problem: str, report, facts: str = "", system: Optional[str] = None) -> Optional[int]:
+        """Store a completed diagnosis; returns its case id, or None if the report has no complete script."""
+        parsed = report if isinstance(report, DiagnosisReport) else parse_report(report)
+        if not (parsed.has_script and parsed.script_complete):
+            return None
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO cases (problem, report, diagnosis, script, script_kind, facts, platform, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (problem, parsed.raw, parsed.diagnosis, parsed.script, parsed.script_kind,
+                 (facts or "")[:MAX_FACTS_CHARS], system or platform.system(), time.time())
+            )
+            # Approved cases are the last to go
+            conn.execute(
+                "DELETE FROM cases WHERE id NOT IN "
+                "(SELECT id FROM cases ORDER BY COALESCE(approved, 0) DESC, created DESC LIMIT ?)",
+                (self.max_cases,)
+            )
+            return cursor.lastrowid
+
+    def set_approval(self, case_id: int, approved: bool) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE cases SET approved = ? WHERE id = ?", (int(approved), case_id))
+
+    def mark_used(self, case_id: int) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE cases SET uses = uses + 1 WHERE id = ?", (case_id,))
+
+    def get(self, case_id: int) -> Optional[ResolvedCase]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, problem, report, diagnosis, script, script_kind, facts, platform, created, approved, uses "
+                "FROM cases WHERE id = ?", (case_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        case = ResolvedCase(*row)
+        case.approved = None if row[9] is None else bool(row[9])
+        return case
+
+    def _current_index(self) -> _Index:
+        with self._lock, self._connect() as conn:
+            version = conn.execute("SELECT COUNT(*), MAX(id) FROM cases").fetchone()
+            if self._index is None or version != self._index_version:
+                rows = conn.execute("SELECT id, problem FROM cases").fetchall()
+                self._index = _Index(dict(rows))
+                self._index_version = version
+            return self._index
+
+    def match(self, problem: str, system: Optional[str] = None,
+              min_score: float = DEFAULT_MIN_SCORE) -> Optional[CaseMatch]:
+        """
+        The most similar case from this platform, preferring approved ones
+        among close scores. Cases whose script the user declined are skipped.
+        """
+        system = system or platform.system()
+        best = None
+        for case_id, score in self._current_index().search(problem):
+            if score < min_score:
+                break
+            case = self.get(case_id)
+            if case is None or case.platform != system or case.approved is False:
+                continue
+            rank = score * (1.1 if case.approved else 1.0)
+            if best is None or rank > best[0]:
+                best = (rank, CaseMatch(case, round(score, 3)))
+        return best[1] if best else None
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM cases")
+
+
+def verification_prompt(match: CaseMatch, problem: str, facts: str) -> str:
+    case = match.case
+    return (
+        f"{VERIFY_HEADING}\n"
+        f"A user reports: \"{problem}\"\n"
+        f"A previously resolved case with a similar description (\"{case.problem}\") was diagnosed as:\n"
+        f"{case.diagnosis or case.report[:1500]}\n\n"
+        f"Current facts from the user's system:\n{facts}\n\n"
+        "Do the current facts support the same diagnosis for this user? Answer CONFIRMED or REJECTED on the "
+        "first line, followed by one sentence explaining why."
+    )
+
+
+def parse_verdict(response: str) -> Tuple[bool, str]:
+    """(confirmed, reason) from the answer to a verification prompt."""
+    text = (response or "").strip()
+    if text.lower().startswith("final answer:"):
+        text = text[len("final answer:"):].strip()
+    first, _, rest = text.partition("\n")
+    confirmed = first.strip(" *:.").upper().startswith("CONFIRMED")
+    return confirmed, (rest.strip() or first.strip())
@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+import litellm
+from crewai import LLM
+from crewai.events import LLMStreamChunkEvent, crewai_event_bus
+from src.laptop_repair.cancellation import DiagnosisCancelled, current_token
+from src.laptop_repair.llm_cache import LLMResponseCache, cache_key
+from src.laptop_repair.progress import LLM_TOKEN, emit
+from src.laptop_repair.rate_limit import RateLimiter
+from src.laptop_repair.tools.summarizer import estimate_tokens
+from src.laptop_repair.tracing import tracer
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _forward_chunk(source, event) -> None:
+    # The bus calls handlers on the streaming thread, so the chunk reaches that diagnosis' listener
+    if isinstance(source, DiagnosticLLM) and event.chunk:
+        emit(LLM_TOKEN, event.chunk)
+
+
+def _prompt_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content", "")) for message in messages)
+
+
+def _request_key(model: str, messages) -> str:
+    """Exact identity of a request, for sharing one in-flight completion between identical prompts."""
+    return hashlib.sha256(json.dumps([model, messages], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DiagnosticLLM(LLM):
+    """
+    crewAI LLM that answers repeated prompts from a persistent response cache.
+    Only plain text completions are cached; tool-call responses always go to the model.
+    With stream=True, partial output is reported to the running diagnosis'
+    progress listener as it arrives (cached and shared answers are reported
+    whole). Requests go through rate_limiter when one is given.
+    """
+
+    def __init__(self, model: str, response_cache: Optional[LLMResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+
+    def _cancellable(self, token, function, *args, **kwargs):
+        """
+        Run a blocking completion on its own thread and wait for it or for
+        cancellation, whichever comes first. A cancelled request is abandoned;
+        its thread finishes on its own and the late response is discarded.
+        A thread per request (rather than a shared pool) means concurrency is
+        limited only by the callers and the rate limiter.
+        """
+        future = Future()
+        context = contextvars.copy_context()
+
+        def target():
+            try:
+                future.set_result(context.run(function, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        finished = threading.Event()
+        future.add_done_callback(lambda _: finished.set())
+        threading.Thread(target=target, daemon=True, name="diag-llm").start()
+        unregister = token.register(finished.set)
+        try:
+            finished.wait()
+        finally:
+            unregister()
+        token.raise_if_cancelled()
+        return future.result()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        token = current_token.get()
+        if token is not None:
+            token.raise_if_cancelled()
+        with tracer.span("llm.call", model=self.model, prompt_tokens=estimate_tokens(_prompt_text(messages))) as span:
+            key = None
+            if self.response_cache is not None and not tools:
+                key = cache_key(self.model, messages)
+                cached = self.response_cache.get(key)
+                if cached is not None:
+                    span.set(cache_hit=True, completion_tokens=estimate_tokens(cached))
+                    if self.stream:
+                        emit(LLM_TOKEN, cached)
+                    return cached
+
+            complete = super().call
+            requested = []
+
+            def request():
+                requested.append(True)
+                if token is None:
+                    return complete(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                                    **kwargs)
+                return self._cancellable(token, complete, messages, tools=tools, callbacks=callbacks,
+                                         available_functions=available_functions, **kwargs)
+
+            if self.rate_limiter is None:
+                response = request()
+            else:
+                # Only plain completions are shared; tool-call responses are tied to the caller's functions
+                shared_key = None if tools else _request_key(self.model, messages)
+                response = self.rate_limiter.call(request, span.attributes["prompt_tokens"], shared_key, token)
+                if not requested:
+                    span.set(coalesced=True)
+                    if self.stream:
+                        emit(LLM_TOKEN, str(response))
+            span.set(cache_hit=False, completion_tokens=estimate_tokens(str(response)))
+
+            if key is not None and isinstance(response, str) and response.strip():
+                self.response_cache.put(key, self.model, response)
+            return response
+
+    async def acall(self, messages) -> str:
+        """
+        Plain text completion awaited on the event loop through litellm, sharing
+        the response cache with call(). Intended for async callers outside the
+        crewAI agent loop, which only uses the synchronous call(). Cancelling the
+        current diagnosis token cancels the request itself.
+        """
+        token = current_token.get()
+        if token is not None:
+            token.raise_if_cancelled()
+        with tracer.span("llm.call", model=self.model, prompt_tokens=estimate_tokens(_prompt_text(messages))) as span:
+            key = None
+            if self.response_cache is not None:
+                key = cache_key(self.model, messages)
+                cached = self.response_cache.get(key)
+                if cached is not None:
+                    span.set(cache_hit=True, completion_tokens=estimate_tokens(cached))
+                    return cached
+
+            params = self._prepare_completion_params(messages)
+            params["stream"] = False
+
+            async def request() -> str:
+                task = asyncio.ensure_future(litellm.acompletion(**params))
+                unregister = None
+                if token is not None:
+                    loop = asyncio.get_running_loop()
+                    unregister = token.register(lambda: loop.call_soon_threadsafe(task.cancel))
+                try:
+                    response = await task
+                except asyncio.CancelledError:
+                    if token is not None and token.cancelled:
+                        raise DiagnosisCancelled("The diagnosis was cancelled.")
+                    raise
+                finally:
+                    if unregister is not None:
+                        unregister()
+                return response.choices[0].message.content or ""
+
+            if self.rate_limiter is None:
+                text = await request()
+            else:
+                text = await self.rate_limiter.acall(request, span.attributes["prompt_tokens"],
+                                                     _request_key(self.model, messages), token)
+            span.set(cache_hit=False, completion_tokens=estimate_tokens(text))
+
+            if key is not None and text.strip():
+                self.response_cache.put(key, self.model, text)
+            return text
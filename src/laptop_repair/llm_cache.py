@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Union
+
+from src.laptop_repair.planner import FACTS_END, FACTS_START
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".laptop_repair", "llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+_OBSERVATION_RE = re.compile(r"Observation:(.*?)(?=\n(?:Thought|Action|Final Answer):|\Z)", re.DOTALL)
+# Values that change on every run without the system changing: clock times, dates and uptimes.
+# Every other number (free space, PIDs, ports, build numbers) is part of the system's state.
+_VOLATILE = [
+    (re.compile(r"\bup\s+(?:\d+\s+days?,\s*)?(?:\d+:\d{2}|\d+\s+min)\b"), "up <uptime>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<time>"),
+    (re.compile(r"\b\d{1,2}/\d{1,2}/\d{4}\b"), "<date>"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?(?:\s*[AP]M)?\b"), "<time>"),
+    # dmesg seconds since boot
+    (re.compile(r"\[\s*\d+\.\d+\]"), "[<time>]"),
+]
+# System facts collected before the run are command output too, injected into the task prompt
+_FACTS_RE = re.compile(re.escape(FACTS_START) + r"(.*?)" + re.escape(FACTS_END), re.DOTALL)
+
+Messages = Union[str, List[dict]]
+
+
+def _mask_volatile(text: str) -> str:
+    """Replace timestamps and uptimes, which differ between otherwise identical outputs."""
+    for pattern, replacement in _VOLATILE:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _normalize_messages(messages: Messages) -> List[dict]:
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return [
+        {"role": message.get("role", ""), "content": " ".join(str(message.get("content", "")).split())}
+        for message in messages
+    ]
+
+
+def observation_fingerprint(messages: Messages) -> str:
+    """Hash the tool observations and system facts in a conversation, with timestamps and uptimes masked."""
+    digest = hashlib.sha256()
+    for message in _normalize_messages(messages):
+        content = message["content"]
+        for observation in _FACTS_RE.findall(content) + _OBSERVATION_RE.findall(_FACTS_RE.sub("", content)):
+            digest.update(_mask_volatile(observation.strip()).encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_key(model: str, messages: Messages) -> str:
+    """Key on the model, the normalized prompt without observations, and the observation fingerprint."""
+    prompt = [
+        {"role": message["role"],
+         "content": _OBSERVATION_RE.sub("Observation:", _FACTS_RE.sub(FACTS_START, message["content"]))}
+        for message in _normalize_messages(messages)
+    ]
+    payload = json.dumps({"model": model, "prompt": prompt, "observations": observation_fingerprint(messages)},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent SQLite cache of LLM responses with age and size based eviction.
+    A new connection is opened per operation so the cache can be shared
+    between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?", (key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.max_age,))
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
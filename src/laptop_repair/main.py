@@ -1,10 +1,105 @@
+import time
+
+_START_TIME = time.perf_counter()
+
 import argparse
+import csv
 import sys
 import os
+import threading
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from src.laptop_repair.crew import LaptopRepairCrew
+# The crew stack (crewai, litellm, pydantic, ...) takes seconds to import, so it is
+# only loaded once arguments are parsed and a diagnosis is actually requested.
+
+def print_startup_time(stage):
+    print(f"[startup] {stage}: {(time.perf_counter() - _START_TIME) * 1000:.0f} ms", file=sys.stderr)
+
+def print_command_output(command, line):
+    print(f"  [{command}] {line}", flush=True)
+
+def finish_tracing(args):
+    from src.laptop_repair.rate_limit import format_metrics
+    from src.laptop_repair.tracing import format_breakdown, tracer
+
+    if args.profile:
+        print("\n================================================")
+        print("=              Time Breakdown                =")
+        print("================================================")
+        print(format_breakdown(tracer))
+        if format_metrics():
+            print("\nLLM rate limiting:\n" + format_metrics())
+    if args.trace:
+        tracer.export(args.trace)
+        print(f"Trace written to {args.trace}", file=sys.stderr)
+
+def run_cancellable(function, cancel_token):
+    """
+    Run function in a worker thread so that Ctrl-C on the main thread can
+    cancel the diagnosis cleanly (killing running commands) instead of leaving
+    them orphaned. A second Ctrl-C exits immediately.
+    """
+    outcome = {}
+    # An interrupted Thread.join() can return early afterwards, so completion is signalled explicitly
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome["result"] = function()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    try:
+        while not done.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        print("\n🛑 Cancelling diagnosis... (press Ctrl-C again to quit immediately)", file=sys.stderr)
+        cancel_token.cancel()
+        done.wait()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+def run_batch_mode(args):
+    from src.laptop_repair.batch import read_problems, run_batch
+    from src.laptop_repair.cancellation import CancellationToken
+
+    csv_format = args.csv or args.batch.lower().endswith(".csv")
+    try:
+        if args.batch == "-":
+            tickets = read_problems(sys.stdin, csv_format=csv_format)
+        else:
+            with open(args.batch, 'r', encoding='utf-8', newline='') as source:
+                tickets = read_problems(source, csv_format=csv_format)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Could not read the batch input: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    rejected = sum(1 for ticket in tickets if ticket.get("error"))
+    if rejected:
+        print(f"Skipping {rejected} unreadable tickets; they are reported with an error.", file=sys.stderr)
+    print(f"Diagnosing {len(tickets) - rejected} problems with concurrency {args.concurrency}...", file=sys.stderr)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    cancel_token = CancellationToken()
+    try:
+        failed = run_cancellable(
+            lambda: sum(1 for record in run_batch(tickets, output, args.concurrency, cancel_token) if record["error"]),
+            cancel_token
+        )
+    finally:
+        if args.output:
+            output.close()
+    if cancel_token.cancelled:
+        print(f"Batch cancelled: {failed} diagnoses failed or did not run.", file=sys.stderr)
+        return
+    print(f"Batch complete: {len(tickets) - failed} succeeded, {failed} failed.", file=sys.stderr)
+    from src.laptop_repair.rate_limit import format_metrics
+    if format_metrics():
+        print(format_metrics(), file=sys.stderr)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -13,25 +108,114 @@ def main():
     parser.add_argument(
         "problem",
         type=str,
+        nargs="?",
         help="A description of the laptop problem to be diagnosed."
     )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Diagnose every problem in a JSONL, CSV or plain-text file ('-' reads stdin)."
+    )
+    parser.add_argument(
+        "--csv",
+        action="store_true",
+        help="Read the batch input as CSV (files ending in .csv are read as CSV anyway; use this for stdin)."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of diagnoses to run at once in batch mode (default: 4)."
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write batch results as JSON lines to this file instead of stdout."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print diagnostic command output line by line as it is produced."
+    )
+    parser.add_argument(
+        "--specialists",
+        action="store_true",
+        help="Investigate the problem's areas (network, storage, memory/CPU, boot) with parallel specialist agents."
+    )
+    parser.add_argument(
+        "--no-knowledge",
+        action="store_true",
+        help="Always run the full diagnosis instead of reusing a confirmed similar resolved case."
+    )
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="Report how long argument parsing and loading the crew stack take."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-phase time breakdown (LLM, commands, agent loop) at the end."
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write timing spans to FILE: JSON lines for *.jsonl, OpenTelemetry (OTLP/JSON) otherwise."
+    )
     args = parser.parse_args()
 
+    if args.profile or args.trace:
+        from src.laptop_repair.tracing import tracer
+        tracer.enabled = True
+
+    if args.startup_time:
+        print_startup_time("arguments parsed")
+        from src.laptop_repair.crew import LaptopRepairCrew
+        print_startup_time("crew stack imported")
+        if not args.problem and not args.batch:
+            return
+
+    if args.batch:
+        run_batch_mode(args)
+        finish_tracing(args)
+        return
+    if not args.problem:
+        parser.error("a problem description or --batch FILE is required")
+
     print("================================================")
     print("=         Laptop Repair Crew Initialized       =")
     print("================================================")
     print(f"Analyzing problem: {args.problem}\n")
 
+    from src.laptop_repair.cancellation import CancellationToken, DiagnosisCancelled
+
     try:
-        repair_crew = LaptopRepairCrew(args.problem)
-        result = repair_crew.run()
+        from src.laptop_repair.crew import LaptopRepairCrew
+
+        progress_callback = print_command_output if args.stream else None
+        repair_crew = LaptopRepairCrew(args.problem, progress_callback=progress_callback,
+                                       specialists=args.specialists, knowledge=not args.no_knowledge)
+        cancel_token = CancellationToken()
+        report = run_cancellable(lambda: repair_crew.run_report(cancel_token=cancel_token), cancel_token)
         print("\n\n================================================")
         print("=              Diagnosis Report              =")
         print("================================================")
-        print(result)
+        print(report.body)
+        if report.has_script:
+            print("\n================================================")
+            print(f"=         Fix Script ({report.script_kind})".ljust(47) + "=")
+            print("================================================")
+            print(report.script)
+            if not report.script_complete:
+                print("\n(The script was not closed by an end marker and may be incomplete.)")
+
+    except DiagnosisCancelled:
+        print("\nDiagnosis cancelled; no commands are left running.")
 
     except Exception as e:
         print(f"\nAn error occurred during the diagnosis process: {e}")
 
+    finish_tracing(args)
+
 if __name__ == "__main__":
     main()
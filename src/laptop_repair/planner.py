@@ -0,0 +1,176 @@
+import platform
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.laptop_repair.tools.allowlist import diagnostic_index
+from src.laptop_repair.tools.command_runner import CommandResult, format_result, normalize_command
+from src.laptop_repair.tools.summarizer import summarize
+
+# Total token budget for the facts injected into the task prompt, shared by the planned commands
+DEFAULT_FACTS_TOKEN_BUDGET = 3000
+MIN_FACT_TOKENS = 200
+# Seconds to wait for planned commands before the agent starts; slower ones are left to the tool
+DEFAULT_PLAN_WAIT = 30.0
+
+# Wraps the facts in the prompt; the LLM response cache fingerprints this block like tool observations
+FACTS_START = "--- SYSTEM FACTS START ---"
+FACTS_END = "--- SYSTEM FACTS END ---"
+NO_FACTS = "No system facts were collected in advance; run the commands you need."
+
+# Keywords per problem category. Whole words (plurals included), or word prefixes when ending in '*'
+KEYWORDS = {
+    "network": ("wifi", "wi-fi", "wireless", "internet", "network*", "ethernet", "dns", "router", "connect*",
+                "disconnect*", "ip address", "ping", "vpn", "browser", "download*", "upload*", "offline", "lan",
+                "website", "hotspot"),
+    "disk": ("disk", "drive", "storage", "space", "ssd", "hdd", "full", "partition", "chkdsk", "file*",
+             "folder", "corrupt*"),
+    "memory": ("memory", "ram", "out of memory", "leak*", "paging", "swap*"),
+    "boot": ("boot*", "startup", "start up", "start-up", "bsod", "blue screen", "restart*", "reboot*", "shutdown",
+             "shut down", "login", "log in", "updat*", "won't start", "crash*"),
+    "battery": ("battery", "batteries", "charg*", "power", "drain*", "plugged", "adapter", "overheat*", "hot",
+                "temperature", "fan", "sleep", "hibernat*"),
+    "performance": ("slow*", "lag*", "sluggish", "freez*", "froze*", "hang*", "stutter*", "unresponsive", "cpu",
+                    "100%", "high usage", "performance", "speed", "takes forever", "not responding"),
+}
+
+
+def _keyword_pattern(keyword: str) -> "re.Pattern":
+    if keyword.endswith("*"):
+        return re.compile(r"(?<![a-z0-9])" + re.escape(keyword[:-1]))
+    return re.compile(r"(?<![a-z0-9])" + re.escape(keyword) + r"(?:s|es)?(?![a-z0-9])")
+
+
+# Specialist investigations run in parallel in specialist mode, and the plan categories each one covers
+DOMAINS = {
+    "network": ("network",),
+    "storage": ("disk",),
+    "performance": ("memory", "performance", "battery"),
+    "boot": ("boot",),
+}
+
+_PATTERNS = {category: [_keyword_pattern(keyword) for keyword in keywords] for category, keywords in KEYWORDS.items()}
+
+
+def _category_commands(system: str) -> Dict[str, List[str]]:
+    if system == "Windows":
+        return {
+            "base": ["systeminfo"],
+            "network": ["ipconfig /all", "netstat -an"],
+            "disk": ["wmic logicaldisk get size,freespace,caption", "wmic diskdrive get status,size,model",
+                     "dir %temp% /a"],
+            "memory": ["wmic memorychip get capacity,speed,manufacturer",
+                       "wmic computersystem get totalphysicalmemory", "tasklist"],
+            "boot": ["wmic startup get caption,command,location", "bcdedit /enum",
+                     "powershell Get-EventLog -LogName System -EntryType Error -Newest 10"],
+            "battery": ["powercfg /batteryreport", "wmic temperature get currenttemperature"],
+            "performance": ["tasklist", "wmic cpu get name,maxclockspeed,numberofcores",
+                            "wmic startup get caption,command,location", "wmic logicaldisk get size,freespace,caption"],
+        }
+    else:
+        return {
+            "base": ["uname -a"],
+            "network": ["ifconfig", "netstat -tuln"],
+            "disk": ["df -h", "lsblk", "dmesg | tail -20"],
+            "memory": ["free -h", "ps aux"],
+            "boot": ["systemctl --failed", "journalctl -xe --no-pager -n 10", "dmesg | tail -20"],
+            "battery": ["top -bn1 | head -20", "dmesg | tail -20"],
+            "performance": ["top -bn1 | head -20", "ps aux", "free -h", "lscpu"],
+        }
+
+
+@dataclass
+class DiagnosticPlan:
+    """Problem categories found in a description and the commands worth running up front."""
+    categories: List[str] = field(default_factory=list)
+    scores: Dict[str, int] = field(default_factory=dict)
+    commands: List[str] = field(default_factory=list)
+
+    @property
+    def general(self) -> bool:
+        """True when no category matched and the generic command set is used."""
+        return not self.categories
+
+
+def classify(problem_description: str) -> Dict[str, int]:
+    """Number of keyword hits per category, best first. Categories without hits are left out."""
+    text = " ".join((problem_description or "").lower().split())
+    scores = {}
+    for category, patterns in _PATTERNS.items():
+        hits = sum(1 for pattern in patterns if pattern.search(text))
+        if hits:
+            scores[category] = hits
+    return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+
+
+def plan_diagnostics(problem_description: str, system: Optional[str] = None,
+                     fallback: Optional[List[str]] = None) -> DiagnosticPlan:
+    """
+    Pick the commands for the categories the problem mentions, always including
+    the basic system overview. When nothing matches, fallback (e.g. the generic
+    prefetch set) is used instead.
+    """
+    system = system or platform.system()
+    table = _category_commands(system)
+    scores = classify(problem_description)
+    selected = list(table["base"])
+    for category in scores:
+        selected.extend(table[category])
+    if not scores and fallback:
+        selected.extend(fallback)
+
+    return DiagnosticPlan(categories=list(scores), scores=scores, commands=_runnable(selected, system))
+
+
+def _runnable(selected: List[str], system: str) -> List[str]:
+    commands, seen = [], set()
+    for command in selected:
+        key = normalize_command(command)
+        # Only allowlisted commands can be run, so the plan never asks for anything the tool would refuse
+        if key in seen or (system == platform.system() and command not in diagnostic_index):
+            continue
+        seen.add(key)
+        commands.append(command)
+    return commands
+
+
+def plan_domains(plan: Optional[DiagnosticPlan]) -> List[str]:
+    """Specialist domains the plan's categories call for; all of them when the problem is general."""
+    if plan is None or plan.general:
+        return list(DOMAINS)
+    return [domain for domain, categories in DOMAINS.items() if any(c in plan.categories for c in categories)]
+
+
+def domain_commands(domain: str, system: Optional[str] = None) -> List[str]:
+    """The commands suggested to a domain specialist."""
+    system = system or platform.system()
+    table = _category_commands(system)
+    return _runnable([command for category in DOMAINS[domain] for command in table[category]], system)
+
+
+def format_facts(plan: DiagnosticPlan, results: Dict[str, CommandResult],
+                 token_budget: int = DEFAULT_FACTS_TOKEN_BUDGET) -> str:
+    """
+    Render the collected plan commands as summarized tool output for the task
+    prompt. Commands that are still running are listed so the agent knows it
+    can request them.
+    """
+    if not plan.commands:
+        return NO_FACTS
+    per_command = max(MIN_FACT_TOKENS, token_budget // len(plan.commands))
+    focus = ", ".join(plan.categories) if plan.categories else "general"
+    blocks, pending = [], []
+    for command in plan.commands:
+        result = results.get(normalize_command(command))
+        if result is None:
+            pending.append(command)
+            continue
+        text = format_result(result, summarize(result, token_budget=per_command))
+        # Only successful output names its command, so label errors and failures
+        blocks.append(text if text.startswith("--- Command Output") else f"'{command}': {text}")
+    lines = [FACTS_START, f"Focus areas: {focus}", ""]
+    lines.extend(blocks)
+    if pending:
+        lines.append("Still running (request with the tool if needed): " + ", ".join(pending))
+    lines.append(FACTS_END)
+    return "\n".join(lines)
@@ -0,0 +1,49 @@
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Event kinds
+STEP = "step"
+LLM_TOKEN = "llm_token"
+COMMAND_STARTED = "command_started"
+COMMAND_FINISHED = "command_finished"
+
+
+@dataclass
+class ProgressEvent:
+    """One thing that happened during a diagnosis, for live display while the crew runs."""
+    kind: str
+    text: str = ""
+    command: Optional[str] = None
+    duration: Optional[float] = None
+    source: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+# Listener of the diagnosis running in the current context, set by the crew for each run.
+# The LLM wrapper, tool and agent step callback report through it.
+current_listener: contextvars.ContextVar = contextvars.ContextVar("laptop_repair_progress_listener", default=None)
+
+
+def emit(kind: str, text: str = "", **details) -> None:
+    listener = current_listener.get()
+    if listener is None:
+        return
+    try:
+        listener(ProgressEvent(kind, text, **details))
+    except Exception:
+        # A broken display must never fail the diagnosis
+        pass
+
+
+def format_event(event: ProgressEvent) -> str:
+    """Text appended to a live log for one event. LLM tokens are passed through unchanged."""
+    if event.kind == LLM_TOKEN:
+        return event.text
+    if event.kind == COMMAND_STARTED:
+        return f"\n▶ Running: {event.command}\n"
+    if event.kind == COMMAND_FINISHED:
+        origin = f", {event.source}" if event.source else ""
+        return f"✔ {event.command} ({event.duration:.2f} s{origin}){(' - ' + event.text) if event.text else ''}\n"
+    return f"\n— {event.text} —\n" if event.text else ""
@@ -0,0 +1,361 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional
+
+import litellm
+from src.laptop_repair.cancellation import CancellationToken, DiagnosisCancelled
+from src.laptop_repair.tools.summarizer import estimate_tokens
+from src.laptop_repair.tracing import tracer
+
+DEFAULT_RPM = 60
+DEFAULT_TPM = 1_000_000
+DEFAULT_MAX_RETRIES = 5
+# Exponential backoff for 429 responses: base * 2^attempt seconds, capped, with jitter
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+_STATUS_429 = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|rate limit", re.IGNORECASE)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an error, or one it was raised from, is the API rejecting a request for quota (HTTP 429)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, litellm.RateLimitError) or getattr(error, "status_code", None) == 429:
+            return True
+        if _STATUS_429.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units a minute up to one minute's worth. Takers
+    reserve their units immediately and are told how long to wait until the
+    bucket has covered them, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount (at most a full bucket) and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            self._level -= min(amount, self.capacity)
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._level = min(self.capacity, self._level + min(amount, self.capacity))
+
+    def charge(self, amount: float) -> None:
+        """Take amount without waiting, e.g. for completion tokens only known after the request."""
+        with self._lock:
+            self._level -= amount
+
+
+@dataclass
+class LimiterMetrics:
+    requests: int = 0
+    # Calls answered by an identical request that was already in flight
+    coalesced: int = 0
+    # Requests that had to wait for the rate limits, and for how long
+    queued: int = 0
+    queue_seconds: float = 0.0
+    max_queue_seconds: float = 0.0
+    rate_limited: int = 0
+    retries: int = 0
+
+    @property
+    def mean_queue_seconds(self) -> float:
+        return self.queue_seconds / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result["mean_queue_seconds"] = round(self.mean_queue_seconds, 4)
+        return result
+
+
+class RateLimiter:
+    """
+    Client-side quota for one model and API key, shared by every diagnosis
+    in the process. Requests wait for both a requests-per-minute and a
+    tokens-per-minute bucket, 429 responses are retried with jittered
+    exponential backoff (or the server's Retry-After), and identical prompts
+    already in flight are answered by that request instead of a new one.
+    It is the only client-side throttle on completions, so its queue metrics
+    cover all the time a request waited before it was sent.
+    """
+
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_cap: float = BACKOFF_CAP):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.metrics = LimiterMetrics()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Seconds to wait before retry number attempt + 1."""
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            return min(self.backoff_cap, retry_after)
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        # Half fixed, half random, so concurrent diagnoses that were limited together do not retry together
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _reserve(self, prompt_tokens: int) -> float:
+        delay = max(self.requests.reserve(1), self.tokens.reserve(prompt_tokens))
+        with self._lock:
+            self.metrics.requests += 1
+            if delay > 0:
+                self.metrics.queued += 1
+                self.metrics.queue_seconds += delay
+                self.metrics.max_queue_seconds = max(self.metrics.max_queue_seconds, delay)
+        return delay
+
+    def _refund(self, prompt_tokens: int) -> None:
+        self.requests.refund(1)
+        self.tokens.refund(prompt_tokens)
+
+    def _rate_limited(self, attempt: int, error: BaseException) -> float:
+        if attempt >= self.max_retries:
+            raise error
+        delay = self.backoff(attempt, error)
+        with self._lock:
+            self.metrics.rate_limited += 1
+            self.metrics.retries += 1
+        print(f"⏳ Model API rate limit reached; retrying in {delay:.1f} s ({attempt + 1}/{self.max_retries})")
+        return delay
+
+    def _done(self, result) -> None:
+        self.tokens.charge(estimate_tokens(str(result)))
+
+    def _join(self, key: Optional[str]):
+        """Register as the request for key, or return the in-flight request to wait on instead."""
+        if key is None:
+            return None, None
+        with self._lock:
+            leader = self._in_flight.get(key)
+            if leader is not None:
+                self.metrics.coalesced += 1
+                return leader, None
+            future = self._in_flight[key] = Future()
+            return None, future
+
+    def _leave(self, key: Optional[str], future: Optional[Future], result=None, error=None) -> None:
+        if future is None:
+            return
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if isinstance(error, asyncio.CancelledError):
+            # Followers retry on their own after a cancelled leader, sync or async
+            error = DiagnosisCancelled("The shared request was cancelled.")
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def call(self, function: Callable[[], object], prompt_tokens: int, key: Optional[str] = None,
+             cancel_token: Optional[CancellationToken] = None):
+        """Run function within the limits. Calls with the same key while one is in flight share its result."""
+        leader, future = self._join(key)
+        if leader is not None:
+            try:
+                return _wait(leader, cancel_token)
+            except DiagnosisCancelled:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise
+                # The diagnosis that made the request was cancelled, not this one
+                return self.call(function, prompt_tokens, key, cancel_token)
+        try:
+            result = self._call(function, prompt_tokens, cancel_token)
+        except BaseException as e:
+            self._leave(key, future, error=e)
+            raise
+        self._leave(key, future, result=result)
+        return result
+
+    def _call(self, function, prompt_tokens: int, cancel_token: Optional[CancellationToken]):
+        attempt = 0
+        while True:
+            delay = self._reserve(prompt_tokens)
+            if delay > 0:
+                with tracer.span("llm.queue", seconds=round(delay, 3)):
+                    if _sleep(delay, cancel_token):
+                        self._refund(prompt_tokens)
+                        raise DiagnosisCancelled("The diagnosis was cancelled.")
+            try:
+                result = function()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                delay = self._rate_limited(attempt, e)
+                attempt += 1
+                with tracer.span("llm.backoff", seconds=round(delay, 3), attempt=attempt):
+                    if _sleep(delay, cancel_token):
+                        raise DiagnosisCancelled("The diagnosis was cancelled.") from e
+                continue
+            self._done(result)
+            return result
+
+    async def acall(self, function: Callable[[], "asyncio.Future"], prompt_tokens: int, key: Optional[str] = None,
+                    cancel_token: Optional[CancellationToken] = None):
+        """Asyncio counterpart of call(); function returns a new awaitable for each attempt."""
+        leader, future = self._join(key)
+        if leader is not None:
+            try:
+                return await _await(leader, cancel_token)
+            except DiagnosisCancelled:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise
+                # The diagnosis that made the request was cancelled, not this one
+                return await self.acall(function, prompt_tokens, key, cancel_token)
+        try:
+            attempt = 0
+            while True:
+                delay = self._reserve(prompt_tokens)
+                if delay > 0:
+                    with tracer.span("llm.queue", seconds=round(delay, 3)):
+                        if await _asleep(delay, cancel_token):
+                            self._refund(prompt_tokens)
+                            raise DiagnosisCancelled("The diagnosis was cancelled.")
+                try:
+                    result = await function()
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    delay = self._rate_limited(attempt, e)
+                    attempt += 1
+                    with tracer.span("llm.backoff", seconds=round(delay, 3), attempt=attempt):
+                        if await _asleep(delay, cancel_token):
+                            raise DiagnosisCancelled("The diagnosis was cancelled.") from e
+                    continue
+                self._done(result)
+                break
+        except BaseException as e:
+            self._leave(key, future, error=e)
+            raise
+        self._leave(key, future, result=result)
+        return result
+
+
+def _sleep(seconds: float, cancel_token: Optional[CancellationToken]) -> bool:
+    """Sleep, returning True early if the diagnosis is cancelled."""
+    if cancel_token is None:
+        time.sleep(seconds)
+        return False
+    return cancel_token.wait(seconds)
+
+
+def _wait(future: Future, cancel_token: Optional[CancellationToken]):
+    if cancel_token is None:
+        return future.result()
+    finished = threading.Event()
+    future.add_done_callback(lambda _: finished.set())
+    unregister = cancel_token.register(finished.set)
+    try:
+        finished.wait()
+    finally:
+        unregister()
+    cancel_token.raise_if_cancelled()
+    return future.result()
+
+
+async def _until_cancelled(cancel_token: CancellationToken, awaitable) -> bool:
+    """Wait for awaitable or the token, whichever comes first; True if the token was cancelled."""
+    loop = asyncio.get_running_loop()
+    cancelled = loop.create_future()
+    unregister = cancel_token.register(
+        lambda: loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None)))
+    task = asyncio.ensure_future(awaitable)
+    try:
+        await asyncio.wait({task, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+        return not task.done()
+    finally:
+        unregister()
+        cancelled.cancel()
+        if not task.done():
+            task.cancel()
+
+
+async def _asleep(seconds: float, cancel_token: Optional[CancellationToken]) -> bool:
+    """Asyncio counterpart of _sleep()."""
+    if cancel_token is None:
+        await asyncio.sleep(seconds)
+        return False
+    return await _until_cancelled(cancel_token, asyncio.sleep(seconds))
+
+
+async def _await(future: Future, cancel_token: Optional[CancellationToken]):
+    """Asyncio counterpart of _wait(). Cancelling the waiter never cancels the shared request."""
+    waiter = asyncio.wrap_future(future)
+    if cancel_token is None:
+        await asyncio.wait({waiter})
+    elif await _until_cancelled(cancel_token, asyncio.shield(waiter)):
+        raise DiagnosisCancelled("The diagnosis was cancelled.")
+    return waiter.result()
+
+
+_limiters: Dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(model: str, api_key: Optional[str] = None, rpm: float = DEFAULT_RPM,
+                 tpm: float = DEFAULT_TPM) -> RateLimiter:
+    """The process-wide limiter for a model and API key; its limits are those given by the first caller."""
+    key = (model, api_key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(rpm=rpm, tpm=tpm)
+        return limiter
+
+
+def format_metrics() -> str:
+    """One line per model that was used: requests, time spent queueing and rate-limit retries."""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    lines = []
+    for (model, _), limiter in limiters:
+        m = limiter.metrics
+        if not m.requests and not m.coalesced:
+            continue
+        lines.append(f"{model}: {m.requests} requests, {m.coalesced} shared, {m.queued} queued "
+                     f"(mean {m.mean_queue_seconds:.2f} s, max {m.max_queue_seconds:.2f} s), "
+                     f"{m.rate_limited} rate-limited")
+    return "\n".join(lines)
+
+
+def limits_for(model: str, config: Optional[dict]) -> dict:
+    """rpm/tpm for a model from the rate_limits section of models.yaml."""
+    limits = (config or {}).get("rate_limits") or {}
+    merged = {"rpm": DEFAULT_RPM, "tpm": DEFAULT_TPM}
+    merged.update(limits.get("default") or {})
+    merged.update(limits.get(model) or {})
+    return merged
@@ -0,0 +1,193 @@
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Callable, List, Optional
+
+# Report sections in the order the task asks for them, with the headings the model uses for each
+SECTIONS = {
+    "problem_summary": ("problem summary", "summary"),
+    "analysis": ("investigation & analysis", "investigation and analysis", "investigation", "analysis",
+                 "diagnostic results"),
+    "diagnosis": ("final diagnosis", "diagnosis", "root cause", "root cause analysis"),
+    "solution": ("proposed solution", "solution", "recommended action", "recommended actions"),
+}
+_HEADING_NAMES = {name: section for section, names in SECTIONS.items() for name in names}
+# Headings that introduce the script itself rather than a text section
+_SCRIPT_HEADINGS = ("batch script", "powershell script", "fix script", "script")
+# Without bold or '#' markup, only unambiguous multi-word headings count as headings
+_PLAIN_HEADINGS = {name for name in list(_HEADING_NAMES) + list(_SCRIPT_HEADINGS) if " " in name}
+
+_FINAL_ANSWER = re.compile(r"^\s*final answer:\s*", re.IGNORECASE)
+_HEADING = re.compile(r"^\s*(?:[-*]\s+)?(#{1,6}\s*)?(\*\*|__)?\s*([A-Za-z][A-Za-z &/]*?)\s*"
+                      r"(?::\s*(?:\*\*|__)?|(?:\*\*|__)\s*:?)\s*(.*)$")
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s*([A-Za-z][A-Za-z &/]*?)\s*:?\s*$")
+_MARKER = re.compile(r"^\s*-{3,}\s*(BATCH\s+|POWERSHELL\s+|PS1\s+|SHELL\s+)?SCRIPT\s+(START|END)\s*-{3,}\s*$", re.IGNORECASE)
+_FENCE = re.compile(r"^\s*(```|~~~)\s*([A-Za-z0-9_+-]*)\s*$")
+_FENCE_KINDS = {"bat": "batch", "batch": "batch", "cmd": "batch", "powershell": "powershell", "ps1": "powershell",
+                "ps": "powershell", "pwsh": "powershell", "sh": "shell", "bash": "shell", "shell": "shell"}
+
+
+@dataclass
+class DiagnosisReport:
+    """The final report split into its sections. Filled in progressively by ReportParser."""
+    raw: str = ""
+    problem_summary: str = ""
+    analysis: str = ""
+    diagnosis: str = ""
+    solution: str = ""
+    # Everything except the script, as shown to the user before they approve it
+    body: str = ""
+    script: str = ""
+    script_kind: Optional[str] = None  # "batch", "powershell" or "shell"
+    # False while the script is still streaming, or if the model never closed it
+    script_complete: bool = False
+    # Sections whose text is final because a later section or the script has started
+    completed: List[str] = field(default_factory=list)
+
+    @property
+    def has_script(self) -> bool:
+        return bool(self.script.strip())
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result.pop("raw")
+        return result
+
+
+class ReportParser:
+    """
+    Single-pass parser for the crew's final report. Text can be fed in any
+    chunks as it streams in; complete lines are parsed immediately, so the
+    summary and diagnosis are available before the script is finished. Accepts
+    '--- BATCH SCRIPT START ---', '--- SCRIPT START ---' (PowerShell),
+    '--- SHELL SCRIPT START ---' and fenced ```bat / ```powershell / ```sh
+    blocks, with or without end markers.
+    """
+
+    def __init__(self, on_section: Optional[Callable[[str, DiagnosisReport], None]] = None):
+        # Called with (section, report) when a section is complete; section "script" once the script is
+        self.on_section = on_section
+        self.report = DiagnosisReport()
+        self._pending = ""
+        self._section: Optional[str] = None
+        self._sections = {name: [] for name in SECTIONS}
+        self._body: List[str] = []
+        self._script: List[str] = []
+        # None outside the script, otherwise how it was opened: "marker" or "fence"
+        self._script_mode: Optional[str] = None
+        self._in_fence = False
+
+    def feed(self, text: str) -> DiagnosisReport:
+        self.report.raw += text
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line.rstrip("\r"))
+        self._publish()
+        return self.report
+
+    def close(self) -> DiagnosisReport:
+        """Parse the last, unterminated line and mark every section as complete."""
+        if self._pending:
+            self._line(self._pending.rstrip("\r"))
+            self._pending = ""
+        self._finish_section()
+        if self._script_mode is not None:
+            self._finish_script(complete=False)
+        self._publish()
+        return self.report
+
+    def _line(self, line: str) -> None:
+        marker = _MARKER.match(line)
+        fence = _FENCE.match(line)
+        if self._script_mode is not None:
+            if marker and marker.group(2).upper() == "END":
+                self._finish_script(complete=True)
+            elif fence and self._script_mode == "fence":
+                self._finish_script(complete=True)
+            elif fence:
+                # Markdown fences inside the markers only wrap the script
+                pass
+            else:
+                self._script.append(line)
+            return
+
+        if marker and marker.group(2).upper() == "START":
+            kind = {"BATCH": "batch", "SHELL": "shell"}.get((marker.group(1) or "").strip().upper(), "powershell")
+            self._start_script("marker", kind)
+            return
+        if marker:
+            return
+        if fence:
+            kind = _FENCE_KINDS.get(fence.group(2).lower())
+            if kind is not None and not self._in_fence and not self.report.has_script:
+                self._start_script("fence", kind)
+                return
+            # Other code blocks (e.g. manual commands) are part of the text
+            self._in_fence = not self._in_fence
+        elif not self._in_fence and self._heading(line):
+            return
+        self._body.append(line)
+        if self._section is not None:
+            self._sections[self._section].append(line)
+
+    def _heading(self, line: str) -> bool:
+        """Switch section on a heading line; the rest of the line starts the section's text."""
+        line = _FINAL_ANSWER.sub("", line)
+        match = _HEADING.match(line)
+        if match is not None:
+            name, rest = match.group(3).strip().lower(), match.group(4).strip()
+            if not (match.group(1) or match.group(2)) and name not in _PLAIN_HEADINGS:
+                return False
+        else:
+            match = _MARKDOWN_HEADING.match(line)
+            if match is None:
+                return False
+            name, rest = match.group(1).strip().lower(), ""
+        if name in _SCRIPT_HEADINGS:
+            self._finish_section()
+            self._section = None
+            return True
+        section = _HEADING_NAMES.get(name)
+        if section is None:
+            return False
+        self._finish_section()
+        self._section = section
+        self._body.append(line)
+        if rest:
+            self._sections[section].append(rest)
+        return True
+
+    def _finish_section(self) -> None:
+        if self._section is not None and self._section not in self.report.completed:
+            self._publish()
+            self.report.completed.append(self._section)
+            if self.on_section is not None:
+                self.on_section(self._section, self.report)
+        self._section = None
+
+    def _start_script(self, mode: str, kind: str) -> None:
+        self._finish_section()
+        self._script_mode = mode
+        self.report.script_kind = kind
+
+    def _finish_script(self, complete: bool) -> None:
+        self._script_mode = None
+        self.report.script_complete = complete
+        self._publish()
+        if "script" not in self.report.completed:
+            self.report.completed.append("script")
+            if self.on_section is not None:
+                self.on_section("script", self.report)
+
+    def _publish(self) -> None:
+        for name, lines in self._sections.items():
+            setattr(self.report, name, "\n".join(lines).strip())
+        self.report.body = "\n".join(self._body).strip()
+        self.report.script = "\n".join(self._script).strip()
+
+
+def parse_report(text: str) -> DiagnosisReport:
+    """Parse a complete report in one go."""
+    parser = ReportParser()
+    parser.feed(text or "")
+    return parser.close()
@@ -0,0 +1,129 @@
+import re
+from typing import Callable, Dict, Optional
+
+from crewai import LLM
+from src.laptop_repair.progress import STEP, emit
+from src.laptop_repair.report import parse_report
+from src.laptop_repair.tools.fix_catalog import FIX_LIST_HEADING
+from src.laptop_repair.tools.script_templates import parse_fix_plan, select_fixes
+from src.laptop_repair.tracing import tracer
+
+# Phases of a diagnosis that can each use their own model (see config/models.yaml)
+PLANNING = "planning"
+TOOL_SELECTION = "tool_selection"
+ANALYSIS = "analysis"
+SCRIPT_GENERATION = "script_generation"
+PHASES = (PLANNING, TOOL_SELECTION, ANALYSIS, SCRIPT_GENERATION)
+
+_FINAL_ANSWER = re.compile(r"^\s*Final Answer\s*:", re.IGNORECASE | re.MULTILINE)
+_ACTION = re.compile(r"Action\s*:.*?Action Input\s*:", re.IGNORECASE | re.DOTALL)
+
+
+def phase_models(config: Optional[dict], default: str) -> Dict[str, str]:
+    """The model for every phase from a models.yaml config, falling back to its (or the given) default."""
+    config = config or {}
+    default = config.get("default") or default
+    phases = config.get("phases") or {}
+    return {phase: phases.get(phase) or default for phase in PHASES}
+
+
+def is_final_answer(response) -> bool:
+    return isinstance(response, str) and _FINAL_ANSWER.search(response) is not None
+
+
+def validate(phase: str, response) -> Optional[str]:
+    """What is wrong with a phase's output, or None if it is usable."""
+    if not isinstance(response, str):
+        # Native tool calls are checked by crewAI itself
+        return None
+    if phase == SCRIPT_GENERATION and is_final_answer(response):
+        answer = _FINAL_ANSWER.split(response, 1)[-1]
+        plan = parse_fix_plan(answer)
+        if plan is not None:
+            if not plan.complete:
+                return "has a fix plan without its end marker"
+            if not select_fixes(plan)[0]:
+                return "has a fix plan with no commands from the fix catalog"
+            return None
+        report = parse_report(answer)
+        if not report.has_script:
+            return "contains no fix script"
+        if not report.script_complete:
+            return "has a fix script without its end marker"
+        return None
+    if not is_final_answer(response) and _ACTION.search(response) is None:
+        return "is neither an action nor a final answer"
+    return None
+
+
+class ModelRouter(LLM):
+    """
+    crewAI LLM that sends each call to the model configured for its phase.
+    The lead's first step is planning and its later steps are tool selection;
+    once the lead has listed fix commands, its steps go to the script
+    generation model, which writes the report. A final answer given earlier by
+    the investigating model is kept if it passes the script generation checks
+    and is otherwise rewritten by the script generation model, so each report
+    is generated once unless it fails. A router for specialist agents uses a
+    fixed phase. Output that fails validation is retried once with the
+    escalation model.
+    """
+
+    def __init__(self, models: Dict[str, str], make_client: Callable[[str], LLM],
+                 escalation: Optional[str] = None, phase: Optional[str] = None):
+        self.phase = phase
+        self.models = dict(models)
+        # Clients are shared by model name, so phases using the same model share its cache and connections
+        self._make_client = make_client
+        self.escalation = escalation
+        first = self.models[phase or TOOL_SELECTION]
+        super().__init__(model=first)
+
+    def client(self, phase: str) -> LLM:
+        return self._make_client(self.models[phase])
+
+    def _call(self, client: LLM, messages, **kwargs):
+        # The agent sets its stop words on the router; the client making the request needs them
+        client.stop = self.stop
+        return client.call(messages, **kwargs)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        kwargs.update(tools=tools, callbacks=callbacks, available_functions=available_functions)
+        phase = self.phase or _lead_phase(messages)
+        client = self.client(phase)
+        with tracer.span("llm.route", phase=phase) as span:
+            response = self._call(client, messages, **kwargs)
+            if self.phase is None and phase != SCRIPT_GENERATION and is_final_answer(response):
+                # An early final answer is kept when it is already a usable report
+                phase = SCRIPT_GENERATION
+                problem = validate(phase, response)
+                if problem is not None and self.models[phase] != client.model:
+                    span.set(rewritten=True, reason=problem, first_model=client.model)
+                    client = self.client(phase)
+                    emit(STEP, f"Writing the report with {client.model}")
+                    response = self._call(client, messages, **kwargs)
+
+            problem = validate(phase, response)
+            if problem is not None and self.escalation and self.escalation != client.model:
+                print(f"⤴️ {phase} output from {client.model} {problem}; retrying with {self.escalation}")
+                span.set(escalated=True, reason=problem, first_model=client.model)
+                client = self._make_client(self.escalation)
+                emit(STEP, f"Retrying with {client.model}")
+                response = self._call(client, messages, **kwargs)
+            span.set(phase=phase, model=client.model)
+            return response
+
+
+def _lead_phase(messages) -> str:
+    """The lead's phase: script generation once it has listed fix commands, else planning or tool selection."""
+    if not _has_steps(messages):
+        return PLANNING
+    text = messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+    return SCRIPT_GENERATION if FIX_LIST_HEADING in text else TOOL_SELECTION
+
+
+def _has_steps(messages) -> bool:
+    """Whether the agent has already taken a step in this conversation."""
+    if isinstance(messages, str):
+        return "\nObservation:" in messages
+    return any(message.get("role") == "assistant" for message in messages)
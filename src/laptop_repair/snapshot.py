@@ -0,0 +1,244 @@
+import glob
+import gzip
+import json
+import os
+import platform
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.laptop_repair.tools.collectors import render_table
+from src.laptop_repair.tools.command_cache import CommandCache
+from src.laptop_repair.tools.command_runner import CommandResult, normalize_command
+from src.laptop_repair.tools.parsers import find_parser
+from src.laptop_repair.tools.summarizer import _LISTENING_STATES
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".laptop_repair", "snapshots")
+DEFAULT_KEEP = 30
+# Disk free space changes smaller than this are not reported by diff_snapshots
+DEFAULT_FREE_SPACE_DELTA_GB = 1.0
+
+
+@dataclass
+class SnapshotEntry:
+    """One collected command. Tabular output is kept column by column."""
+    command: str
+    collected: float
+    returncode: Optional[int] = 0
+    source: str = "shell"
+    kind: Optional[str] = None
+    stdout: Optional[str] = None
+    columns: Optional[List[str]] = None
+    data: Optional[List[list]] = None
+
+    @classmethod
+    def from_result(cls, result: CommandResult, collected: Optional[float] = None) -> "SnapshotEntry":
+        parser = find_parser(result.command)
+        records = result.records
+        if records is None and parser is not None:
+            try:
+                records = parser[1](result.stdout)
+            except Exception:
+                records = None
+        entry = cls(
+            command=result.command,
+            collected=collected if collected is not None else time.time(),
+            returncode=result.returncode,
+            source=result.source,
+            kind=parser[0] if parser else None,
+        )
+        if records:
+            entry.columns = []
+            for record in records:
+                entry.columns.extend(key for key in record if key not in entry.columns)
+            entry.data = [[record.get(column, "") for record in records] for column in entry.columns]
+        # Native output is just a rendering of its records, so it is rebuilt on load instead of stored
+        if not (records and result.source == "native"):
+            entry.stdout = result.stdout
+        return entry
+
+    def records(self) -> List[dict]:
+        if not self.columns:
+            return []
+        return [dict(zip(self.columns, row)) for row in zip(*self.data)]
+
+    def to_result(self) -> CommandResult:
+        """Rebuild a CommandResult, marked with source 'snapshot'."""
+        records = self.records() or None
+        stdout = self.stdout if self.stdout is not None else render_table(records or [], self.columns or [])
+        return CommandResult(command=self.command, stdout=stdout, returncode=self.returncode, records=records,
+                             source="snapshot")
+
+
+@dataclass
+class SystemSnapshot:
+    """The diagnostic state of one machine at one point in time, keyed by normalized command."""
+    created: float = field(default_factory=time.time)
+    host: str = field(default_factory=platform.node)
+    platform: str = field(default_factory=platform.system)
+    version: int = SNAPSHOT_VERSION
+    entries: Dict[str, SnapshotEntry] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, result: CommandResult) -> None:
+        """Store a freshly collected result. Failed results and ones replayed from a snapshot are ignored."""
+        if result.source == "snapshot" or result.error or result.timed_out or result.returncode != 0:
+            return
+        entry = SnapshotEntry.from_result(result)
+        with self._lock:
+            self.entries[normalize_command(result.command)] = entry
+
+    def carry_forward(self, baseline: "SystemSnapshot", commands) -> None:
+        """Copy the baseline entries for commands that were reused instead of recollected."""
+        with self._lock:
+            for command in commands:
+                key = normalize_command(command)
+                if key in baseline.entries and key not in self.entries:
+                    self.entries[key] = baseline.entries[key]
+
+    def get(self, command: str) -> Optional[SnapshotEntry]:
+        return self.entries.get(normalize_command(command))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            entries = [dict(vars(entry)) for entry in self.entries.values()]
+        return {"version": self.version, "created": self.created, "host": self.host, "platform": self.platform,
+                "entries": entries}
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "SystemSnapshot":
+        if payload.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {payload.get('version')}")
+        snapshot = cls(created=payload["created"], host=payload["host"], platform=payload["platform"])
+        for item in payload["entries"]:
+            entry = SnapshotEntry(**item)
+            snapshot.entries[normalize_command(entry.command)] = entry
+        return snapshot
+
+
+class SnapshotStore:
+    """Gzipped JSON snapshot files in one directory, newest last, pruned to the most recent `keep`."""
+
+    def __init__(self, directory: str = DEFAULT_SNAPSHOT_DIR, keep: int = DEFAULT_KEEP):
+        self.directory = directory
+        self.keep = keep
+
+    def paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "snapshot-*.json.gz")))
+
+    def save(self, snapshot: SystemSnapshot) -> Optional[str]:
+        if not snapshot.entries:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(snapshot.created))
+        # Concurrent runs can start in the same millisecond, so a random suffix keeps their files apart
+        micros = int(snapshot.created * 1_000_000) % 1_000_000
+        path = os.path.join(self.directory, f"snapshot-{stamp}-{micros:06d}-{os.urandom(3).hex()}.json.gz")
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot.to_dict(), f, separators=(",", ":"))
+        for old in self.paths()[:-self.keep] if self.keep else []:
+            os.remove(old)
+        return path
+
+    def load(self, path: str) -> SystemSnapshot:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return SystemSnapshot.from_dict(json.load(f))
+
+    def _load_many(self, paths: List[str]) -> Optional[SystemSnapshot]:
+        for path in paths:
+            try:
+                return self.load(path)
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return None
+
+    def latest(self) -> Optional[SystemSnapshot]:
+        return self._load_many(list(reversed(self.paths())))
+
+    def before(self, timestamp: float) -> Optional[SystemSnapshot]:
+        """Newest snapshot taken at or before timestamp, e.g. time.time() - 7 * 86400 for 'last week'."""
+        for path in reversed(self.paths()):
+            snapshot = self._load_many([path])
+            if snapshot is not None and snapshot.created <= timestamp:
+                return snapshot
+        return None
+
+
+def seed_cache(baseline: Optional[SystemSnapshot], cache: CommandCache) -> List[str]:
+    """
+    Incremental collection: put every baseline entry that is still within its
+    command's cache TTL into the cache, aged by the time since it was collected,
+    so the prefetcher and tool only recollect what may have changed. Returns the
+    commands that were seeded.
+    """
+    if baseline is None or baseline.platform != platform.system():
+        return []
+    now = time.time()
+    seeded = []
+    for entry in baseline.entries.values():
+        age = now - entry.collected
+        if age < cache.ttl_for(entry.command):
+            cache.put(entry.command, entry.to_result(), age=age)
+            seeded.append(entry.command)
+    return seeded
+
+
+@dataclass
+class Change:
+    """One difference between two snapshots."""
+    command: str
+    change: str  # "added", "removed" or "changed"
+    key: str
+    detail: str = ""
+
+    def __str__(self) -> str:
+        return f"[{self.command}] {self.change}: {self.key}" + (f" ({self.detail})" if self.detail else "")
+
+
+def _row_key(kind: Optional[str], record: dict) -> Optional[str]:
+    if kind == "processes":
+        return record.get("name") or None
+    if kind == "disks":
+        return record.get("device") or record.get("mount") or None
+    if kind == "connections":
+        listening = record.get("state", "").upper() in _LISTENING_STATES
+        return f"{record.get('proto', '')} {record.get('local', '')}" if listening else None
+    return " | ".join(str(value) for value in record.values())
+
+
+def diff_snapshots(old: SystemSnapshot, new: SystemSnapshot,
+                   free_space_delta_gb: float = DEFAULT_FREE_SPACE_DELTA_GB) -> List[Change]:
+    """
+    Compare two snapshots command by command. Tables are compared by row
+    identity (process names, listening ports, disk devices, or the whole row
+    for other tables such as startup entries); disks also report free space
+    changes of at least free_space_delta_gb. Untabulated output is reported as
+    changed when its text differs.
+    """
+    changes: List[Change] = []
+    for key, after in new.entries.items():
+        before = old.entries.get(key)
+        if before is None:
+            changes.append(Change(after.command, "added", after.command, "not in the older snapshot"))
+            continue
+        if not after.columns or not before.columns:
+            if (before.stdout or "") != (after.stdout or ""):
+                changes.append(Change(after.command, "changed", "output"))
+            continue
+
+        old_rows = {k: r for r in before.records() if (k := _row_key(after.kind, r)) is not None}
+        new_rows = {k: r for r in after.records() if (k := _row_key(after.kind, r)) is not None}
+        for row_key in new_rows.keys() - old_rows.keys():
+            changes.append(Change(after.command, "added", row_key))
+        for row_key in old_rows.keys() - new_rows.keys():
+            changes.append(Change(after.command, "removed", row_key))
+        if after.kind == "disks":
+            for row_key in new_rows.keys() & old_rows.keys():
+                delta = float(new_rows[row_key].get("free_gb") or 0) - float(old_rows[row_key].get("free_gb") or 0)
+                if abs(delta) >= free_space_delta_gb:
+                    direction = "dropped" if delta < 0 else "grew"
+                    changes.append(Change(after.command, "changed", row_key,
+                                          f"free space {direction} {abs(delta):.1f} GB"))
+    return changes
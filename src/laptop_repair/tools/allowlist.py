@@ -0,0 +1,83 @@
+import platform
+from typing import Dict, Iterable, List, Optional
+
+from src.laptop_repair.tools.command_runner import normalize_command
+
+
+def _diagnostic_commands(system: str) -> List[str]:
+    if system == "Windows":
+        return [
+            "systeminfo",
+            "tasklist",
+            "wmic process get name,commandline,processid",
+            "wmic logicaldisk get size,freespace,caption",
+            "wmic memorychip get capacity,speed,manufacturer",
+            "wmic cpu get name,maxclockspeed,numberofcores",
+            "netstat -an",
+            "ipconfig /all",
+            "sfc /verifyonly",
+            "dism /online /cleanup-image /checkhealth",
+            "powercfg /batteryreport",
+            "wmic startup get caption,command,location",
+            "wmic service where state='running' get name,displayname,processid",
+            "dir %temp% /a",
+            "wmic qfe list brief",
+            "bcdedit /enum",
+            "wmic diskdrive get status,size,model",
+            "wmic temperature get currenttemperature",
+            "wmic computersystem get totalphysicalmemory",
+            "powershell Get-EventLog -LogName System -EntryType Error -Newest 10",
+            "powershell Get-WmiObject -Class Win32_PhysicalMemory",
+            "powershell Get-WmiObject -Class Win32_LogicalDisk",
+        ]
+    else:
+        return [
+            "uname -a",
+            "lscpu",
+            "free -h",
+            "df -h",
+            "lsblk",
+            "ps aux",
+            "netstat -tuln",
+            "ifconfig",
+            "dmesg | tail -20",
+            "journalctl -xe --no-pager -n 10",
+            "systemctl --failed",
+            "top -bn1 | head -20",
+            "lsusb",
+            "lspci",
+        ]
+
+
+class CommandIndex:
+    """
+    Hash index of approved commands keyed on their normalized form (lowercase,
+    single spaces). A command matches only if its whole normalized text,
+    arguments included, is in the index, so 'wmic os get *' or
+    'tasklist & del ...' no longer pass on their first word.
+    """
+
+    def __init__(self, commands: Iterable[str] = ()):
+        self._entries: Dict[str, str] = {}
+        for command in commands:
+            self.add(command)
+
+    def add(self, command: str) -> None:
+        self._entries.setdefault(normalize_command(command), command)
+
+    def lookup(self, command: str) -> Optional[str]:
+        """Return the approved spelling of command, or None if it is not allowed."""
+        return self._entries.get(normalize_command(command))
+
+    def __contains__(self, command: str) -> bool:
+        return normalize_command(command) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def commands(self) -> List[str]:
+        return list(self._entries.values())
+
+
+# Built once at import for the running platform and shared by every tool instance
+diagnostic_index = CommandIndex(_diagnostic_commands(platform.system()))
@@ -0,0 +1,269 @@
+import asyncio
+import platform
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; every collector falls back to the shell command
+    psutil = None
+
+from src.laptop_repair.tools.command_runner import (
+    CommandResult,
+    DEFAULT_MAX_OUTPUT_BYTES,
+    DEFAULT_TIMEOUT,
+    OutputCallback,
+    arun_command,
+    normalize_command,
+    run_command,
+)
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.tracing import tracer
+
+_MB = 1024 * 1024
+_GB = 1024 * 1024 * 1024
+
+
+def render_table(records: List[dict], columns: List[str]) -> str:
+    """Render records as a left-aligned, fixed-width text table."""
+    if not records:
+        return ""
+    widths = {col: len(col) for col in columns}
+    for record in records:
+        for col in columns:
+            widths[col] = max(widths[col], len(str(record.get(col, ""))))
+    lines = ["  ".join(col.ljust(widths[col]) for col in columns).rstrip()]
+    lines.append("  ".join("-" * widths[col] for col in columns))
+    for record in records:
+        lines.append("  ".join(str(record.get(col, "")).ljust(widths[col]) for col in columns).rstrip())
+    return "\n".join(lines) + "\n"
+
+
+def _processes(with_cmdline: bool = False) -> List[dict]:
+    attrs = ['pid', 'name', 'username', 'memory_info', 'cpu_times']
+    if with_cmdline:
+        attrs.append('cmdline')
+    records = []
+    for proc in psutil.process_iter(attrs):
+        info = proc.info
+        memory = info.get('memory_info')
+        cpu_times = info.get('cpu_times')
+        record = {
+            "name": info.get('name') or "",
+            "pid": info.get('pid'),
+            "user": info.get('username') or "",
+            "mem_mb": round(memory.rss / _MB, 1) if memory else 0.0,
+            "cpu_s": round(cpu_times.user + cpu_times.system, 1) if cpu_times else 0.0,
+        }
+        if with_cmdline:
+            record["cmdline"] = " ".join(info.get('cmdline') or [])
+        records.append(record)
+    records.sort(key=lambda r: r["mem_mb"], reverse=True)
+    return records
+
+
+def collect_processes() -> CommandResult:
+    records = _processes()
+    return _result(records, ["name", "pid", "user", "mem_mb", "cpu_s"])
+
+
+def collect_process_commandlines() -> CommandResult:
+    records = _processes(with_cmdline=True)
+    return _result(records, ["name", "pid", "mem_mb", "cmdline"])
+
+
+def collect_memory() -> CommandResult:
+    vm = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    records = [
+        {"type": "physical", "total_gb": round(vm.total / _GB, 2), "used_gb": round((vm.total - vm.available) / _GB, 2),
+         "available_gb": round(vm.available / _GB, 2), "percent": vm.percent},
+        {"type": "swap", "total_gb": round(swap.total / _GB, 2), "used_gb": round(swap.used / _GB, 2),
+         "available_gb": round(swap.free / _GB, 2), "percent": swap.percent},
+    ]
+    return _result(records, ["type", "total_gb", "used_gb", "available_gb", "percent"])
+
+
+def collect_disks() -> CommandResult:
+    records = []
+    for part in psutil.disk_partitions(all=False):
+        try:
+            usage = psutil.disk_usage(part.mountpoint)
+        except (PermissionError, OSError):
+            continue
+        records.append({
+            "device": part.device,
+            "mount": part.mountpoint,
+            "fstype": part.fstype,
+            "size_gb": round(usage.total / _GB, 2),
+            "free_gb": round(usage.free / _GB, 2),
+            "percent_used": usage.percent,
+        })
+    return _result(records, ["device", "mount", "fstype", "size_gb", "free_gb", "percent_used"])
+
+
+def _connections(listening_only: bool) -> CommandResult:
+    records = []
+    for conn in psutil.net_connections(kind='inet'):
+        is_tcp = conn.type == socket.SOCK_STREAM
+        if listening_only and is_tcp and conn.status != psutil.CONN_LISTEN:
+            continue
+        records.append({
+            "proto": "TCP" if is_tcp else "UDP",
+            "local": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "",
+            "remote": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "",
+            "state": conn.status if conn.status != psutil.CONN_NONE else "",
+            "pid": conn.pid or "",
+        })
+    return _result(records, ["proto", "local", "remote", "state", "pid"])
+
+
+def collect_connections() -> CommandResult:
+    return _connections(listening_only=False)
+
+
+def collect_listening_ports() -> CommandResult:
+    return _connections(listening_only=True)
+
+
+def collect_cpu() -> CommandResult:
+    freq = psutil.cpu_freq()
+    records = [{
+        "name": platform.processor() or platform.machine(),
+        "physical_cores": psutil.cpu_count(logical=False),
+        "logical_cores": psutil.cpu_count(logical=True),
+        "max_mhz": round(freq.max) if freq and freq.max else "",
+        "percent": psutil.cpu_percent(interval=0.1),
+    }]
+    return _result(records, ["name", "physical_cores", "logical_cores", "max_mhz", "percent"])
+
+
+def collect_services() -> Optional[CommandResult]:
+    # psutil only enumerates services on Windows
+    if not hasattr(psutil, "win_service_iter"):
+        return None
+    records = []
+    for service in psutil.win_service_iter():
+        info = service.as_dict(attrs=['name', 'display_name', 'status', 'pid'])
+        if info.get('status') == 'running':
+            records.append({"name": info['name'], "display_name": info['display_name'], "pid": info['pid'] or ""})
+    return _result(records, ["name", "display_name", "pid"])
+
+
+def collect_total_memory() -> CommandResult:
+    records = [{"total_physical_memory": psutil.virtual_memory().total}]
+    return _result(records, ["total_physical_memory"])
+
+
+def collect_uname() -> CommandResult:
+    uname = platform.uname()
+    records = [{
+        "system": uname.system,
+        "node": uname.node,
+        "release": uname.release,
+        "version": uname.version,
+        "machine": uname.machine,
+    }]
+    return _result(records, ["system", "node", "release", "version", "machine"])
+
+
+def collect_top() -> CommandResult:
+    psutil.cpu_percent(interval=None)
+    procs = list(psutil.process_iter(['pid', 'name', 'memory_percent']))
+    for proc in procs:
+        try:
+            proc.cpu_percent(interval=None)
+        except psutil.Error:
+            pass
+    time.sleep(0.2)
+    records = []
+    for proc in procs:
+        try:
+            cpu = proc.cpu_percent(interval=None)
+        except psutil.Error:
+            continue
+        records.append({
+            "pid": proc.info['pid'],
+            "name": proc.info['name'] or "",
+            "cpu_percent": cpu,
+            "mem_percent": round(proc.info['memory_percent'] or 0.0, 1),
+        })
+    records.sort(key=lambda r: (r["cpu_percent"], r["mem_percent"]), reverse=True)
+    return _result(records[:20], ["pid", "name", "cpu_percent", "mem_percent"])
+
+
+def _result(records: List[dict], columns: List[str]) -> CommandResult:
+    return CommandResult(command="", stdout=render_table(records, columns), returncode=0, records=records, source="native")
+
+
+# Commands (normalized) that have an in-process equivalent.
+# A collector returns None when it cannot answer on this platform.
+NATIVE_COLLECTORS: Dict[str, Callable[[], Optional[CommandResult]]] = {
+    "tasklist": collect_processes,
+    "wmic process get name,commandline,processid": collect_process_commandlines,
+    "wmic logicaldisk get size,freespace,caption": collect_disks,
+    "powershell get-wmiobject -class win32_logicaldisk": collect_disks,
+    "wmic cpu get name,maxclockspeed,numberofcores": collect_cpu,
+    "wmic computersystem get totalphysicalmemory": collect_total_memory,
+    "wmic service where state='running' get name,displayname,processid": collect_services,
+    "netstat -an": collect_connections,
+    "uname -a": collect_uname,
+    "free -h": collect_memory,
+    "df -h": collect_disks,
+    "ps aux": collect_processes,
+    "netstat -tuln": collect_listening_ports,
+    "top -bn1 | head -20": collect_top,
+}
+
+
+def collect_native(command: str) -> Optional[CommandResult]:
+    """
+    Collect a command's information in-process with psutil. Returns None when
+    psutil is unavailable, the command has no native collector on this
+    platform, or psutil is denied the information, so the caller can fall back
+    to the shell command. Other errors are bugs and propagate.
+    """
+    if psutil is None:
+        return None
+    collector = NATIVE_COLLECTORS.get(normalize_command(command))
+    if collector is None:
+        return None
+    start = time.perf_counter()
+    try:
+        result = collector()
+    except (psutil.Error, OSError):
+        return None
+    if result is None:
+        return None
+    result.command = command
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def collect(command: str, timeout: int = DEFAULT_TIMEOUT, native: bool = True, on_output: Optional[OutputCallback] = None,
+            max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES, max_lines: Optional[int] = None,
+            cancel_token: Optional[CancellationToken] = None) -> CommandResult:
+    """Collect a command's output, preferring the native fast path when enabled."""
+    with tracer.span("command.exec", command=command) as span:
+        result = collect_native(command) if native else None
+        if result is None:
+            result = run_command(command, timeout, on_output=on_output, max_output_bytes=max_output_bytes,
+                                 max_lines=max_lines, cancel_token=cancel_token)
+        span.set(source=result.source, exit_code=result.returncode)
+        return result
+
+
+async def acollect(command: str, timeout: int = DEFAULT_TIMEOUT, native: bool = True,
+                   on_output: Optional[OutputCallback] = None, max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+                   max_lines: Optional[int] = None, cancel_token: Optional[CancellationToken] = None) -> CommandResult:
+    """Asyncio counterpart of collect(); native collectors run in a worker thread."""
+    with tracer.span("command.exec", command=command) as span:
+        result = None
+        if native and psutil is not None and normalize_command(command) in NATIVE_COLLECTORS:
+            result = await asyncio.to_thread(collect_native, command)
+        if result is None:
+            result = await arun_command(command, timeout, on_output=on_output, max_output_bytes=max_output_bytes,
+                                        max_lines=max_lines, cancel_token=cancel_token)
+        span.set(source=result.source, exit_code=result.returncode)
+        return result
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.laptop_repair.tools.command_runner import CommandResult, normalize_command
+
+DEFAULT_TTL = 60
+
+# Time-to-live in seconds, matched on the longest normalized command prefix.
+# Hardware facts practically never change while the app is open; process and
+# connection tables go stale within seconds.
+DEFAULT_TTLS = {
+    "wmic cpu": 86400,
+    "wmic memorychip": 86400,
+    "wmic diskdrive": 86400,
+    "wmic computersystem": 86400,
+    "powershell get-wmiobject -class win32_physicalmemory": 86400,
+    "lscpu": 86400,
+    "lspci": 86400,
+    "lsusb": 3600,
+    "uname": 86400,
+    "systeminfo": 600,
+    "bcdedit": 3600,
+    "wmic qfe": 3600,
+    "wmic startup": 600,
+    "sfc": 600,
+    "dism": 600,
+    "powercfg": 600,
+    "wmic logicaldisk": 60,
+    "powershell get-wmiobject -class win32_logicaldisk": 60,
+    "df": 60,
+    "lsblk": 300,
+    "tasklist": 15,
+    "wmic process": 15,
+    "ps aux": 15,
+    "top": 10,
+    "netstat": 15,
+    "free": 15,
+}
+
+
+class CommandCache:
+    """
+    Thread-safe, size-bounded LRU cache of diagnostic command results with
+    per-command time-to-live. Only successful results are stored.
+    """
+
+    def __init__(self, max_entries: int = 64, default_ttl: float = DEFAULT_TTL, ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, CommandResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, command: str) -> float:
+        key = normalize_command(command)
+        best = None
+        # set_ttl may add a prefix from another thread while this one searches
+        with self._lock:
+            for prefix in self.ttls:
+                if key.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                    best = prefix
+            return self.ttls[best] if best is not None else self.default_ttl
+
+    def set_ttl(self, prefix: str, seconds: float) -> None:
+        with self._lock:
+            self.ttls[normalize_command(prefix)] = seconds
+
+    def _lookup(self, key: str) -> Optional[CommandResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def get(self, command: str) -> Optional[CommandResult]:
+        with self._lock:
+            result = self._lookup(normalize_command(command))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def __contains__(self, command: str) -> bool:
+        with self._lock:
+            return self._lookup(normalize_command(command)) is not None
+
+    def put(self, command: str, result: CommandResult, age: float = 0.0) -> None:
+        """Store a successful result; age is how many seconds ago it was collected."""
+        if result.error or result.timed_out or result.truncated or result.returncode != 0:
+            return
+        ttl = self.ttl_for(command) - age
+        if ttl <= 0:
+            return
+        key = normalize_command(command)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, command: Optional[str] = None) -> None:
+        """Drop one command (matched by prefix) or, with no argument, everything."""
+        with self._lock:
+            if command is None:
+                self._entries.clear()
+                return
+            prefix = normalize_command(command)
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+# Shared by every SystemCommandTool in the process so that results survive
+# across diagnoses started from the GUI.
+command_cache = CommandCache()
@@ -0,0 +1,350 @@
+import asyncio
+import os
+import signal
+import subprocess
+import platform
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+try:
+    import psutil
+except ImportError:  # optional; process groups are used to kill command trees without it
+    psutil = None
+
+from src.laptop_repair.cancellation import CancellationToken
+
+DEFAULT_TIMEOUT = 180
+DEFAULT_MAX_OUTPUT_BYTES = 2 * 1024 * 1024
+# Seconds to read what a killed command left in its pipes
+DRAIN_TIMEOUT = 5
+
+# Receives (command, line) for every stdout line as it is produced.
+OutputCallback = Callable[[str, str], None]
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a single diagnostic command execution."""
+    command: str
+    stdout: str = ""
+    stderr: str = ""
+    returncode: Optional[int] = None
+    duration: float = 0.0
+    timed_out: bool = False
+    error: Optional[str] = None
+    records: Optional[List[dict]] = None
+    source: str = "shell"
+    truncated: bool = False
+
+
+# Replacement for collect() that produces a command's result without the real system,
+# e.g. replaying recorded fixtures in benchmarks.
+CommandRunner = Callable[[str], CommandResult]
+
+
+def normalize_command(command: str) -> str:
+    """Normalize a command string so equivalent spellings share one key."""
+    return " ".join(command.strip().lower().split())
+
+
+def _build_command(command: str):
+    if command.lower().startswith("powershell "):
+        if platform.system() == "Windows":
+            return ["powershell", "-Command", command[11:]]
+        return None
+    return command
+
+
+def _process_group_options() -> dict:
+    """Start each command in its own process group so the whole tree can be killed."""
+    if platform.system() == "Windows":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(pid: int) -> None:
+    """Kill a command and every process it started (shell pipelines, wmic/powershell children)."""
+    if psutil is not None:
+        try:
+            parent = psutil.Process(pid)
+            processes = parent.children(recursive=True) + [parent]
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.Error:
+                pass
+        return
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def _cancelled_result(command: str, stdout_parts: List[str], stderr_parts: List[str], start: float) -> CommandResult:
+    return CommandResult(
+        command=command,
+        stdout="".join(stdout_parts),
+        stderr="".join(stderr_parts),
+        duration=time.perf_counter() - start,
+        error=f"Error: The command '{command}' was cancelled."
+    )
+
+
+def _size(line: str) -> int:
+    """Bytes a captured line takes up, which is what max_output_bytes limits."""
+    return len(line.encode("utf-8"))
+
+
+def _pump(stream, name: str, lines: "queue.Queue") -> None:
+    for line in iter(stream.readline, ''):
+        lines.put((name, line))
+    stream.close()
+    lines.put((name, None))
+
+
+def run_command(command: str, timeout: int = DEFAULT_TIMEOUT, on_output: Optional[OutputCallback] = None,
+                max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES, max_lines: Optional[int] = None,
+                cancel_token: Optional[CancellationToken] = None) -> CommandResult:
+    """
+    Execute an already-validated diagnostic command, reading stdout and stderr
+    incrementally. Each stdout line is forwarded to on_output as it arrives.
+    The command is stopped early (and the result marked truncated) once
+    max_output_bytes of stdout or max_lines lines have been captured; stderr
+    beyond max_output_bytes is read but not kept.
+    Cancelling cancel_token kills the command's process tree at once.
+    FileNotFoundError and PermissionError are propagated to the caller.
+    """
+    full_command = _build_command(command)
+    if full_command is None:
+        return CommandResult(command=command, error="Error: PowerShell commands are only available on Windows systems.")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        full_command,
+        shell=isinstance(full_command, str),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='ignore',
+        bufsize=1,
+        **_process_group_options()
+    )
+    unregister = cancel_token.register(lambda: kill_process_tree(process.pid)) if cancel_token else None
+    try:
+        return _collect_output(command, process, start, timeout, on_output, max_output_bytes, max_lines, cancel_token)
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+def _collect_output(command, process, start, timeout, on_output, max_output_bytes, max_lines,
+                    cancel_token) -> CommandResult:
+    lines: "queue.Queue" = queue.Queue()
+    for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=_pump, args=(stream, name, lines), daemon=True).start()
+
+    stdout_parts: List[str] = []
+    stderr_parts: List[str] = []
+    stdout_bytes = 0
+    stderr_bytes = 0
+    line_count = 0
+    open_streams = 2
+    truncated = False
+    deadline = start + timeout
+
+    while open_streams:
+        if cancel_token is not None and cancel_token.cancelled:
+            kill_process_tree(process.pid)
+            process.wait()
+            return _cancelled_result(command, stdout_parts, stderr_parts, start)
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            kill_process_tree(process.pid)
+            process.wait()
+            return CommandResult(
+                command=command,
+                stdout="".join(stdout_parts),
+                stderr="".join(stderr_parts),
+                duration=time.perf_counter() - start,
+                timed_out=True,
+                error=f"Error: The command '{command}' timed out after {timeout} seconds."
+            )
+        try:
+            name, line = lines.get(timeout=min(remaining, 0.5))
+        except queue.Empty:
+            continue
+        if line is None:
+            open_streams -= 1
+            continue
+        if name == "stderr":
+            if stderr_bytes < max_output_bytes:
+                stderr_parts.append(line)
+                stderr_bytes += _size(line)
+            continue
+
+        stdout_parts.append(line)
+        stdout_bytes += _size(line)
+        line_count += 1
+        if on_output is not None:
+            on_output(command, line.rstrip("\n"))
+        if stdout_bytes >= max_output_bytes or (max_lines is not None and line_count >= max_lines):
+            truncated = True
+            kill_process_tree(process.pid)
+            break
+
+    returncode = process.wait()
+    if cancel_token is not None and cancel_token.cancelled:
+        return _cancelled_result(command, stdout_parts, stderr_parts, start)
+    return CommandResult(
+        command=command,
+        stdout="".join(stdout_parts),
+        stderr="".join(stderr_parts),
+        returncode=0 if truncated else returncode,
+        duration=time.perf_counter() - start,
+        truncated=truncated
+    )
+
+
+async def _read_lines(stream, on_line) -> None:
+    while True:
+        raw_line = await stream.readline()
+        if not raw_line:
+            break
+        if on_line(raw_line.decode('utf-8', errors='ignore')):
+            break
+
+
+async def _adrain(process) -> None:
+    """
+    Read a killed process's pipes to EOF, so their transports close on this
+    loop instead of at garbage collection, after the loop may be closed.
+    """
+    async def drain(stream) -> None:
+        while await stream.read(65536):
+            pass
+
+    try:
+        await asyncio.wait_for(asyncio.gather(drain(process.stdout), drain(process.stderr)), timeout=DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        # A detached grandchild still holds the pipe; stop reading rather than hang
+        pass
+    await process.wait()
+
+
+async def arun_command(command: str, timeout: int = DEFAULT_TIMEOUT, on_output: Optional[OutputCallback] = None,
+                       max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES, max_lines: Optional[int] = None,
+                       cancel_token: Optional[CancellationToken] = None) -> CommandResult:
+    """
+    Asyncio counterpart of run_command: the subprocess is driven by the event
+    loop, so many commands can run concurrently without a thread each.
+    """
+    full_command = _build_command(command)
+    if full_command is None:
+        return CommandResult(command=command, error="Error: PowerShell commands are only available on Windows systems.")
+
+    start = time.perf_counter()
+    if isinstance(full_command, str):
+        process = await asyncio.create_subprocess_shell(
+            full_command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **_process_group_options()
+        )
+    else:
+        process = await asyncio.create_subprocess_exec(
+            *full_command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **_process_group_options()
+        )
+    unregister = cancel_token.register(lambda: kill_process_tree(process.pid)) if cancel_token else None
+    try:
+        return await _acollect_output(command, process, start, timeout, on_output, max_output_bytes, max_lines,
+                                      cancel_token)
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+async def _acollect_output(command, process, start, timeout, on_output, max_output_bytes, max_lines,
+                           cancel_token) -> CommandResult:
+    stdout_parts: List[str] = []
+    stderr_parts: List[str] = []
+    state = {"bytes": 0, "stderr_bytes": 0, "lines": 0, "truncated": False}
+
+    def on_stdout(line: str) -> bool:
+        stdout_parts.append(line)
+        state["bytes"] += _size(line)
+        state["lines"] += 1
+        if on_output is not None:
+            on_output(command, line.rstrip("\n"))
+        if state["bytes"] >= max_output_bytes or (max_lines is not None and state["lines"] >= max_lines):
+            state["truncated"] = True
+            kill_process_tree(process.pid)
+            return True
+        return False
+
+    def on_stderr(line: str) -> bool:
+        # Keep draining the pipe so the command cannot block on a full stderr
+        if state["stderr_bytes"] < max_output_bytes:
+            stderr_parts.append(line)
+            state["stderr_bytes"] += _size(line)
+        return False
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(_read_lines(process.stdout, on_stdout), _read_lines(process.stderr, on_stderr)),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        kill_process_tree(process.pid)
+        await _adrain(process)
+        return CommandResult(
+            command=command,
+            stdout="".join(stdout_parts),
+            stderr="".join(stderr_parts),
+            duration=time.perf_counter() - start,
+            timed_out=True,
+            error=f"Error: The command '{command}' timed out after {timeout} seconds."
+        )
+
+    # After truncation or a cancel the process is killed with output left unread
+    await _adrain(process)
+    returncode = process.returncode
+    if cancel_token is not None and cancel_token.cancelled:
+        return _cancelled_result(command, stdout_parts, stderr_parts, start)
+    return CommandResult(
+        command=command,
+        stdout="".join(stdout_parts),
+        stderr="".join(stderr_parts),
+        returncode=0 if state["truncated"] else returncode,
+        duration=time.perf_counter() - start,
+        truncated=state["truncated"]
+    )
+
+
+def format_result(result: CommandResult, output: Optional[str] = None) -> str:
+    """
+    Render a CommandResult as the text handed back to the agent. When output
+    is given (e.g. a summary), it is shown in place of the raw stdout.
+    """
+    if result.error:
+        return result.error
+
+    stdout = result.stdout if output is None else output
+    if result.returncode != 0 and result.stderr:
+        if stdout:
+            return f"Command completed with warnings.\nWarnings: {result.stderr.strip()}\n\nOutput:\n{stdout}"
+        else:
+            return f"Command failed with error: {result.stderr.strip()}"
+
+    if result.truncated:
+        stdout += "\n[Output truncated: capture limit reached, command stopped early.]\n"
+
+    if stdout.strip():
+        return f"--- Command Output for '{result.command}' ---\nSystem: {platform.system()} {platform.release()}\n\n{stdout}"
+    else:
+        return f"Command '{result.command}' executed successfully but returned no output."
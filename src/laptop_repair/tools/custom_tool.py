@@ -1,36 +1,39 @@
-import subprocess
+import asyncio
 import platform
 import os
 import tempfile
-from typing import Type
+import time
+from typing import Callable, Optional, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
+from src.laptop_repair.tools.allowlist import diagnostic_index
+from src.laptop_repair.tools.collectors import acollect, collect
+from src.laptop_repair.tools.command_runner import CommandRunner, DEFAULT_MAX_OUTPUT_BYTES, format_result
+from src.laptop_repair.tools.command_cache import CommandCache, command_cache
+from src.laptop_repair.tools.fix_catalog import FIX_LIST_HEADING, fix_catalog, format_categories, format_fixes
+from src.laptop_repair.tools.prefetch import DiagnosticPrefetcher
+from src.laptop_repair.tools.summarizer import DEFAULT_TOKEN_BUDGET, summarize
+from src.laptop_repair.snapshot import SystemSnapshot
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.progress import COMMAND_FINISHED, COMMAND_STARTED, emit
+from src.laptop_repair.tracing import tracer
 
 def _get_allowed_commands():
+    return diagnostic_index.commands()
+
+def _get_prefetch_commands():
+    """Fast, read-only commands worth collecting before the agent asks for them."""
     if platform.system() == "Windows":
         return [
             "systeminfo",
             "tasklist",
-            "wmic process get name,commandline,processid",
             "wmic logicaldisk get size,freespace,caption",
             "wmic memorychip get capacity,speed,manufacturer",
             "wmic cpu get name,maxclockspeed,numberofcores",
             "netstat -an",
             "ipconfig /all",
-            "sfc /verifyonly",
-            "dism /online /cleanup-image /checkhealth",
-            "powercfg /batteryreport",
             "wmic startup get caption,command,location",
-            "wmic service where state='running' get name,displayname,processid",
-            "dir %temp% /a",
-            "wmic qfe list brief",
-            "bcdedit /enum",
             "wmic diskdrive get status,size,model",
-            "wmic temperature get currenttemperature",
-            "wmic computersystem get totalphysicalmemory",
-            "powershell Get-EventLog -LogName System -EntryType Error -Newest 10",
-            "powershell Get-WmiObject -Class Win32_PhysicalMemory",
-            "powershell Get-WmiObject -Class Win32_LogicalDisk",
         ]
     else:
         return [
@@ -38,81 +41,17 @@ def _get_allowed_commands():
             "lscpu",
             "free -h",
             "df -h",
-            "lsblk",
             "ps aux",
             "netstat -tuln",
-            "ifconfig",
-            "dmesg | tail -20",
-            "journalctl -xe --no-pager -n 10",
             "systemctl --failed",
-            "top -bn1 | head -20",
-            "lsusb",
-            "lspci",
         ]
 
 def _get_safe_fix_commands():
-    if platform.system() == "Windows":
-        return {
-            "disk_cleanup": [
-                "cleanmgr /sagerun:1",
-                "del /q /f %temp%\\*.*",
-                "rd /s /q %temp%",
-                "md %temp%",
-                "powershell Clear-RecycleBin -Force -ErrorAction SilentlyContinue"
-            ],
-            "system_files": [
-                "sfc /scannow",
-                "dism /online /cleanup-image /restorehealth"
-            ],
-            "restart_services": [
-                "net stop spooler & net start spooler",
-                "net stop bits & net start bits",
-                "net stop wuauserv & net start wuauserv",
-                "net stop cryptsvc & net start cryptsvc"
-            ],
-            "network_reset": [
-                "ipconfig /flushdns",
-                "netsh winsock reset",
-                "netsh int ip reset",
-                "netsh advfirewall reset"
-            ],
-            "performance_boost": [
-                "powercfg /setactive 8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c",
-                "defrag c: /o",
-                "powershell Optimize-Volume -DriveLetter C -ReTrim"
-            ],
-            "registry_cleanup": [
-                "reg delete HKEY_CURRENT_USER\\Software\\Microsoft\\Windows\\CurrentVersion\\Run /v tempentry /f",
-                "powershell Clear-Variable -Name * -ErrorAction SilentlyContinue"
-            ],
-            "windows_update": [
-                "powershell Install-Module PSWindowsUpdate -Force",
-                "powershell Get-WUInstall -AcceptAll -AutoReboot"
-            ]
-        }
-    else:
-        return {
-            "system_cleanup": [
-                "sudo apt-get clean",
-                "sudo apt-get autoremove",
-                "sudo journalctl --vacuum-time=3d"
-            ],
-            "system_update": [
-                "sudo apt-get update",
-                "sudo apt-get upgrade -y"
-            ],
-            "service_restart": [
-                "sudo systemctl restart networking",
-                "sudo systemctl restart NetworkManager"
-            ],
-            "disk_check": [
-                "sudo fsck -f /dev/sda1",
-                "sudo e2fsck -f /dev/sda1"
-            ]
-        }
+    return fix_catalog.as_dict(platform.system())
 
 class SystemCommandInput(BaseModel):
     command: str = Field(description=f"The specific, safe command to execute. Must be one of the approved diagnostic commands or 'get_fix_commands' to retrieve available fix commands.")
+    raw: bool = Field(default=False, description="Return the complete, unsummarized command output. Large outputs are summarized by default.")
 
 class SystemCommandTool(BaseTool):
     name: str = "System Diagnostic Command Executor"
@@ -120,94 +59,155 @@ class SystemCommandTool(BaseTool):
     Executes safe, read-only system diagnostic commands to gather system information for analysis.
     Supports Windows, Linux, and macOS. Can also provide safe fix commands for script generation.
     Use 'get_fix_commands' to retrieve available repair commands.
+    Large outputs are summarized (top processes, listening ports, fullest disks); set raw=true for the full output.
     """
     args_schema: Type[BaseModel] = SystemCommandInput
+    prefetcher: Optional[DiagnosticPrefetcher] = None
+    cache: Optional[CommandCache] = Field(default_factory=lambda: command_cache)
+    native: bool = True
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+    # Called with (command, line) as output streams in, e.g. to show progress in the CLI or GUI
+    progress_callback: Optional[Callable[[str, str], None]] = None
+    max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES
+    max_output_lines: Optional[int] = None
+    # Replaces real command execution when set (e.g. fixture replay in benchmarks)
+    runner: Optional[CommandRunner] = None
+    # Receives every result the tool returns during a run (see snapshot.py)
+    snapshot: Optional[SystemSnapshot] = None
+    # Set per run; cancelling it kills the running command and refuses new ones
+    cancel_token: Optional[CancellationToken] = None
 
-    def _run(self, command: str) -> str:
-        try:
-            if command.lower() == "get_fix_commands":
-                fix_commands = _get_safe_fix_commands()
-                result = f"Available safe fix command categories for {platform.system()}:\n\n"
-                for category, commands in fix_commands.items():
-                    result += f"{category.upper().replace('_', ' ')}:\n"
-                    for cmd in commands:
-                        result += f"  - {cmd}\n"
-                    result += "\n"
-                return result
+    def _precheck(self, command: str) -> Optional[str]:
+        """Answer special commands and reject disallowed ones; None means the command may run."""
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return "Error: The diagnosis was cancelled by the user. Stop and do not run further commands."
+        if command.lower().split()[:1] == ["get_fix_commands"]:
+            return self._fix_commands(command.split()[1:])
 
-            allowed_commands = _get_allowed_commands()
-            command_allowed = False
-            for allowed_cmd in allowed_commands:
-                if command.lower().startswith(allowed_cmd.lower().split()[0]):
-                    command_allowed = True
-                    break
-                    
-            if not command_allowed:
-                return f"Error: The command '{command}' is not permitted for security reasons.\n\nAllowed commands for {platform.system()}:\n" + "\n".join(f"  - {cmd}" for cmd in allowed_commands)
+        if command not in diagnostic_index:
+            allowed_commands = diagnostic_index.commands()
+            return f"Error: The command '{command}' is not permitted for security reasons.\n\nAllowed commands for {platform.system()}:\n" + "\n".join(f"  - {cmd}" for cmd in allowed_commands)
+        return None
 
-            if command.lower().startswith("powershell "):
-                if platform.system() == "Windows":
-                    ps_command = command[11:]
-                    full_command = ["powershell", "-Command", ps_command]
-                else:
-                    return "Error: PowerShell commands are only available on Windows systems."
+    def _fix_commands(self, terms) -> str:
+        """Answer 'get_fix_commands [<category>] [tag:<tag> ...]' from the fix catalog."""
+        if not terms:
+            return format_categories(fix_catalog)
+        category = None
+        tags = []
+        for term in terms:
+            if term.lower().startswith("tag:"):
+                tags.append(term[4:])
             else:
-                full_command = command
+                category = term
+        fixes = fix_catalog.query(category=category, tags=tags)
+        if not fixes:
+            return f"No fix commands match '{' '.join(terms)}'.\n\n" + format_categories(fix_catalog)
+        return f"{FIX_LIST_HEADING} {' '.join(terms)} on {platform.system()}:\n" + format_fixes(fixes)
 
-            if platform.system() == "Windows":
-                if isinstance(full_command, str):
-                    process = subprocess.Popen(
-                        full_command,
-                        shell=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        encoding='utf-8',
-                        errors='ignore'
-                    )
-                else:
-                    process = subprocess.Popen(
-                        full_command,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        encoding='utf-8',
-                        errors='ignore'
-                    )
-            else:
-                process = subprocess.Popen(
-                    full_command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    encoding='utf-8',
-                    errors='ignore'
-                )
+    def _render(self, command: str, result, raw: bool, source: str) -> str:
+        # Cached and prefetched results are already in the cache; re-storing them would extend their TTL
+        if self.cache and source not in ("cache", "prefetch"):
+            self.cache.put(command, result)
+        if self.snapshot is not None:
+            self.snapshot.record(result)
+        if raw:
+            return format_result(result)
+        return format_result(result, summarize(result, token_budget=self.token_budget))
+
+    def _error_message(self, command: str, error: Exception) -> str:
+        if isinstance(error, FileNotFoundError):
+            return f"Error: The command '{command}' was not found on this system. This may indicate the required tool is not installed."
+        if isinstance(error, PermissionError):
+            return f"Error: Permission denied executing '{command}'. This command may require administrator/root privileges."
+        return f"An unexpected error occurred while running '{command}': {str(error)}"
+
+    def _trace(self, span, source: str, result) -> None:
+        span.set(
+            source=source,
+            cache_hit=source in ("cache", "prefetch"),
+            exit_code=result.returncode,
+            output_bytes=len(result.stdout.encode("utf-8", "replace")),
+            command_seconds=round(result.duration, 4),
+            timed_out=result.timed_out,
+        )
 
+    def _report(self, command: str, source: str, result, started: float) -> None:
+        status = ""
+        if result.timed_out:
+            status = "timed out"
+        elif result.error or result.returncode != 0:
+            status = f"failed (exit code {result.returncode})"
+        emit(COMMAND_FINISHED, status, command=command, duration=time.perf_counter() - started, source=source)
+
+    def _run(self, command: str, raw: bool = False) -> str:
+        with tracer.span("tool.run", command=command, raw=raw) as span:
             try:
-                stdout, stderr = process.communicate(timeout=180)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                return f"Error: The command '{command}' timed out after 180 seconds."
+                message = self._precheck(command)
+                if message is not None:
+                    span.set(source="precheck")
+                    return message
+                # Run the approved spelling, which the index guarantees exists at this point
+                command = diagnostic_index.lookup(command)
+                started = time.perf_counter()
+                emit(COMMAND_STARTED, command=command)
 
-            if process.returncode != 0 and stderr:
-                if stdout:
-                    return f"Command completed with warnings.\nWarnings: {stderr.strip()}\n\nOutput:\n{stdout}"
-                else:
-                    return f"Command failed with error: {stderr.strip()}"
+                result, source = self.cache.get(command) if self.cache else None, "cache"
+                if result is None and self.prefetcher:
+                    result, source = self.prefetcher.get(command), "prefetch"
+                if result is None and self.runner:
+                    result, source = self.runner(command), "runner"
+                if result is None:
+                    result, source = collect(
+                        command,
+                        native=self.native,
+                        on_output=self.progress_callback,
+                        max_output_bytes=self.max_output_bytes,
+                        max_lines=self.max_output_lines,
+                        cancel_token=self.cancel_token
+                    ), "exec"
+                self._trace(span, source, result)
+                self._report(command, source, result, started)
+                return self._render(command, result, raw, source)
 
-            if stdout.strip():
-                return f"--- Command Output for '{command}' ---\nSystem: {platform.system()} {platform.release()}\n\n{stdout}"
-            else:
-                return f"Command '{command}' executed successfully but returned no output."
+            except Exception as e:
+                span.set(error=str(e))
+                return self._error_message(command, e)
 
-        except FileNotFoundError:
-            return f"Error: The command '{command}' was not found on this system. This may indicate the required tool is not installed."
-        except PermissionError:
-            return f"Error: Permission denied executing '{command}'. This command may require administrator/root privileges."
-        except Exception as e:
-            return f"An unexpected error occurred while running '{command}': {str(e)}"
+    async def arun(self, command: str, raw: bool = False) -> str:
+        """Asyncio counterpart of _run for callers embedding the tool in an event loop."""
+        with tracer.span("tool.run", command=command, raw=raw) as span:
+            try:
+                message = self._precheck(command)
+                if message is not None:
+                    span.set(source="precheck")
+                    return message
+                # Run the approved spelling, which the index guarantees exists at this point
+                command = diagnostic_index.lookup(command)
+                started = time.perf_counter()
+                emit(COMMAND_STARTED, command=command)
+
+                result, source = self.cache.get(command) if self.cache else None, "cache"
+                if result is None and self.prefetcher:
+                    result, source = await self.prefetcher.aget(command), "prefetch"
+                if result is None and self.runner:
+                    result, source = await asyncio.to_thread(self.runner, command), "runner"
+                if result is None:
+                    result, source = await acollect(
+                        command,
+                        native=self.native,
+                        on_output=self.progress_callback,
+                        max_output_bytes=self.max_output_bytes,
+                        max_lines=self.max_output_lines,
+                        cancel_token=self.cancel_token
+                    ), "exec"
+                self._trace(span, source, result)
+                self._report(command, source, result, started)
+                return self._render(command, result, raw, source)
+
+            except Exception as e:
+                span.set(error=str(e))
+                return self._error_message(command, e)
 
     def get_system_info(self) -> str:
         """Get basic system information for debugging purposes."""
@@ -232,9 +232,10 @@ class SystemCommandTool(BaseTool):
         return _get_safe_fix_commands()
 
     def validate_command_safety(self, command: str) -> bool:
-        allowed_commands = _get_allowed_commands()
-        return any(command.lower().startswith(allowed_cmd.lower().split()[0]) 
-                  for allowed_cmd in allowed_commands)
+        return command in diagnostic_index
+
+    def validate_fix_command(self, command: str) -> bool:
+        return fix_catalog.lookup(command) is not None
 
     def get_os_specific_diagnostics(self) -> str:
         os_name = platform.system()
@@ -0,0 +1,190 @@
+import platform
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.laptop_repair.tools.allowlist import CommandIndex
+
+WINDOWS = ("Windows",)
+LINUX = ("Linux",)
+# Starts the tool's answer to 'get_fix_commands <category>'; once the agent has seen it, the report comes next
+FIX_LIST_HEADING = "Safe fix commands for"
+
+
+@dataclass(frozen=True)
+class FixCommand:
+    """One approved repair command and the metadata used to select it."""
+    command: str
+    category: str
+    description: str
+    tags: Tuple[str, ...] = ()
+    requires_admin: bool = False
+    # False when the change cannot be undone (deleted files, reset configuration)
+    reversible: bool = True
+    platforms: Tuple[str, ...] = WINDOWS
+
+
+CATALOG: List[FixCommand] = [
+    # Windows
+    FixCommand("cleanmgr /sagerun:1", "disk_cleanup", "Run Disk Cleanup with saved profile 1",
+               ("disk", "cleanup", "space"), reversible=False),
+    FixCommand("del /q /f %temp%\\*.*", "disk_cleanup", "Delete files in the user temp folder",
+               ("disk", "cleanup", "temp", "space"), reversible=False),
+    FixCommand("rd /s /q %temp%", "disk_cleanup", "Remove the user temp folder tree",
+               ("disk", "cleanup", "temp", "space"), reversible=False),
+    FixCommand("md %temp%", "disk_cleanup", "Recreate the user temp folder",
+               ("disk", "temp")),
+    FixCommand("powershell Clear-RecycleBin -Force -ErrorAction SilentlyContinue", "disk_cleanup",
+               "Empty the Recycle Bin", ("disk", "cleanup", "space"), reversible=False),
+    FixCommand("sfc /scannow", "system_files", "Scan and repair protected system files",
+               ("integrity", "corruption", "crash"), requires_admin=True),
+    FixCommand("dism /online /cleanup-image /restorehealth", "system_files", "Repair the Windows component store",
+               ("integrity", "corruption", "updates"), requires_admin=True),
+    FixCommand("net stop spooler & net start spooler", "restart_services", "Restart the print spooler",
+               ("services", "printing"), requires_admin=True),
+    FixCommand("net stop bits & net start bits", "restart_services", "Restart Background Intelligent Transfer",
+               ("services", "updates"), requires_admin=True),
+    FixCommand("net stop wuauserv & net start wuauserv", "restart_services", "Restart Windows Update",
+               ("services", "updates"), requires_admin=True),
+    FixCommand("net stop cryptsvc & net start cryptsvc", "restart_services", "Restart Cryptographic Services",
+               ("services", "updates"), requires_admin=True),
+    FixCommand("ipconfig /flushdns", "network_reset", "Clear the DNS resolver cache",
+               ("network", "dns")),
+    FixCommand("netsh winsock reset", "network_reset", "Reset the Winsock catalog",
+               ("network", "connectivity"), requires_admin=True, reversible=False),
+    FixCommand("netsh int ip reset", "network_reset", "Reset TCP/IP settings",
+               ("network", "connectivity"), requires_admin=True, reversible=False),
+    FixCommand("netsh advfirewall reset", "network_reset", "Restore default firewall policy",
+               ("network", "firewall"), requires_admin=True, reversible=False),
+    FixCommand("powercfg /setactive 8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c", "performance_boost",
+               "Switch to the High Performance power plan", ("performance", "power")),
+    FixCommand("defrag c: /o", "performance_boost", "Optimize drive C: (trim or defragment)",
+               ("performance", "disk"), requires_admin=True),
+    FixCommand("powershell Optimize-Volume -DriveLetter C -ReTrim", "performance_boost", "Re-trim SSD drive C:",
+               ("performance", "disk", "ssd"), requires_admin=True),
+    FixCommand("reg delete HKEY_CURRENT_USER\\Software\\Microsoft\\Windows\\CurrentVersion\\Run /v tempentry /f",
+               "registry_cleanup", "Remove the 'tempentry' startup entry", ("registry", "startup", "boot"),
+               reversible=False),
+    FixCommand("powershell Clear-Variable -Name * -ErrorAction SilentlyContinue", "registry_cleanup",
+               "Clear PowerShell session variables", ("registry",)),
+    FixCommand("powershell Install-Module PSWindowsUpdate -Force", "windows_update",
+               "Install the PSWindowsUpdate module", ("updates",), requires_admin=True),
+    FixCommand("powershell Get-WUInstall -AcceptAll -AutoReboot", "windows_update",
+               "Install all pending updates and reboot", ("updates",), requires_admin=True, reversible=False),
+    # Linux
+    FixCommand("sudo apt-get clean", "system_cleanup", "Clear the apt package cache",
+               ("disk", "cleanup", "space"), requires_admin=True, reversible=False, platforms=LINUX),
+    FixCommand("sudo apt-get autoremove", "system_cleanup", "Remove unused packages",
+               ("disk", "cleanup", "space"), requires_admin=True, reversible=False, platforms=LINUX),
+    FixCommand("sudo journalctl --vacuum-time=3d", "system_cleanup", "Drop journal logs older than 3 days",
+               ("disk", "cleanup", "logs"), requires_admin=True, reversible=False, platforms=LINUX),
+    FixCommand("sudo apt-get update", "system_update", "Refresh package lists",
+               ("updates",), requires_admin=True, platforms=LINUX),
+    FixCommand("sudo apt-get upgrade -y", "system_update", "Upgrade installed packages",
+               ("updates",), requires_admin=True, reversible=False, platforms=LINUX),
+    FixCommand("sudo systemctl restart networking", "service_restart", "Restart the networking service",
+               ("services", "network"), requires_admin=True, platforms=LINUX),
+    FixCommand("sudo systemctl restart NetworkManager", "service_restart", "Restart NetworkManager",
+               ("services", "network", "connectivity"), requires_admin=True, platforms=LINUX),
+    FixCommand("sudo fsck -f /dev/sda1", "disk_check", "Check and repair the /dev/sda1 file system",
+               ("disk", "integrity", "corruption"), requires_admin=True, platforms=LINUX),
+    FixCommand("sudo e2fsck -f /dev/sda1", "disk_check", "Check and repair the ext file system on /dev/sda1",
+               ("disk", "integrity", "corruption"), requires_admin=True, platforms=LINUX),
+]
+
+
+class FixCatalog:
+    """
+    Fix commands indexed by category, tag and platform, built once so that a
+    query only intersects a few precomputed sets instead of scanning and
+    formatting the whole catalog.
+    """
+
+    def __init__(self, entries: Iterable[FixCommand]):
+        self.entries: List[FixCommand] = list(entries)
+        self._by_category: Dict[str, Set[int]] = {}
+        self._by_tag: Dict[str, Set[int]] = {}
+        self._by_platform: Dict[str, Set[int]] = {}
+        # Per-platform exact command indexes, matched like the diagnostic allowlist
+        self._indexes: Dict[str, CommandIndex] = {}
+        self._by_command: Dict[Tuple[str, str], int] = {}
+        for position, entry in enumerate(self.entries):
+            self._by_category.setdefault(entry.category, set()).add(position)
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(position)
+            for system in entry.platforms:
+                self._by_platform.setdefault(system, set()).add(position)
+                self._indexes.setdefault(system, CommandIndex()).add(entry.command)
+                self._by_command[(system, entry.command)] = position
+
+    def categories(self, system: Optional[str] = None) -> Dict[str, int]:
+        """Category name -> number of entries, in catalog order."""
+        allowed = self._by_platform.get(system or platform.system(), set())
+        counts: Dict[str, int] = {}
+        for position, entry in enumerate(self.entries):
+            if position in allowed:
+                counts[entry.category] = counts.get(entry.category, 0) + 1
+        return counts
+
+    def tags(self, system: Optional[str] = None) -> List[str]:
+        allowed = self._by_platform.get(system or platform.system(), set())
+        return sorted(tag for tag, positions in self._by_tag.items() if positions & allowed)
+
+    def query(self, category: Optional[str] = None, tags: Iterable[str] = (), system: Optional[str] = None,
+              requires_admin: Optional[bool] = None, reversible: Optional[bool] = None) -> List[FixCommand]:
+        """Entries for the platform matching the category and every given tag, in catalog order."""
+        selected = set(self._by_platform.get(system or platform.system(), set()))
+        if category:
+            selected &= self._by_category.get(category.lower(), set())
+        for tag in tags:
+            selected &= self._by_tag.get(tag.lower(), set())
+        entries = [self.entries[position] for position in sorted(selected)]
+        if requires_admin is not None:
+            entries = [entry for entry in entries if entry.requires_admin == requires_admin]
+        if reversible is not None:
+            entries = [entry for entry in entries if entry.reversible == reversible]
+        return entries
+
+    def lookup(self, command: str, system: Optional[str] = None) -> Optional[FixCommand]:
+        """The catalog entry for an exact (normalized) command on the platform, if any."""
+        system = system or platform.system()
+        index = self._indexes.get(system)
+        approved = index.lookup(command) if index is not None else None
+        return self.entries[self._by_command[(system, approved)]] if approved is not None else None
+
+    def as_dict(self, system: Optional[str] = None) -> Dict[str, List[str]]:
+        """{category: [command, ...]} for the platform, the shape of the original fix command table."""
+        result: Dict[str, List[str]] = {}
+        for entry in self.query(system=system):
+            result.setdefault(entry.category, []).append(entry.command)
+        return result
+
+
+def format_fixes(entries: List[FixCommand]) -> str:
+    """One line per fix with the flags the agent needs to write a safe script."""
+    lines = []
+    for entry in entries:
+        flags = []
+        if entry.requires_admin:
+            flags.append("admin")
+        if not entry.reversible:
+            flags.append("irreversible")
+        suffix = f" [{', '.join(flags)}]" if flags else ""
+        lines.append(f"  - {entry.command}  # {entry.description}{suffix}")
+    return "\n".join(lines)
+
+
+def format_categories(catalog: FixCatalog, system: Optional[str] = None) -> str:
+    """Compact overview shown for a bare 'get_fix_commands' request."""
+    system = system or platform.system()
+    lines = [f"Safe fix command categories for {system}:"]
+    for category, count in catalog.categories(system).items():
+        lines.append(f"  - {category} ({count} commands)")
+    lines.append(f"Tags: {', '.join(catalog.tags(system))}")
+    lines.append("")
+    lines.append("Request the commands you need with 'get_fix_commands <category>' or "
+                 "'get_fix_commands tag:<tag>' (several terms narrow the selection).")
+    return "\n".join(lines)
+
+
+# Built once at import and shared by the tool and script validation
+fix_catalog = FixCatalog(CATALOG)
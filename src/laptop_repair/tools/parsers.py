@@ -0,0 +1,162 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.laptop_repair.tools.command_runner import normalize_command
+
+_KB_PER_MB = 1024
+
+
+def _number(value: str) -> float:
+    """Parse '12,345 K', '1.5', '87%' and similar into a float (0.0 if unparseable)."""
+    cleaned = re.sub(r"[^\d.]", "", value or "")
+    try:
+        return float(cleaned) if cleaned else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _size_gb(value: str) -> float:
+    """Parse human readable sizes from `df -h` ('512M', '1.8T', '20G') into gigabytes."""
+    match = re.match(r"^([\d.]+)([KMGTP]?)", (value or "").strip(), re.IGNORECASE)
+    if not match:
+        return 0.0
+    factor = {"": 1 / (1024 ** 3), "K": 1 / (1024 ** 2), "M": 1 / 1024, "G": 1, "T": 1024, "P": 1024 ** 2}
+    return round(float(match.group(1)) * factor[match.group(2).upper()], 2)
+
+
+def parse_tasklist(output: str) -> List[dict]:
+    records = []
+    started = False
+    for line in output.splitlines():
+        if line.startswith("="):
+            started = True
+            continue
+        if not started or not line.strip():
+            continue
+        match = re.match(r"^(.+?)\s+(\d+)\s+(\S+)\s+(\d+)\s+([\d,.]+)\s*K", line)
+        if match:
+            records.append({
+                "name": match.group(1).strip(),
+                "pid": int(match.group(2)),
+                "session": match.group(3),
+                "mem_mb": round(_number(match.group(5)) / _KB_PER_MB, 1),
+            })
+    return records
+
+
+def parse_ps_aux(output: str) -> List[dict]:
+    records = []
+    for line in output.splitlines()[1:]:
+        parts = line.split(None, 10)
+        if len(parts) < 11:
+            continue
+        records.append({
+            "name": parts[10].split()[0].rsplit("/", 1)[-1] if parts[10] else "",
+            "pid": int(_number(parts[1])),
+            "user": parts[0],
+            "cpu_percent": _number(parts[2]),
+            "mem_percent": _number(parts[3]),
+            "mem_mb": round(_number(parts[5]) / _KB_PER_MB, 1),
+            "cmdline": parts[10],
+        })
+    return records
+
+
+def parse_netstat(output: str) -> List[dict]:
+    records = []
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts or not parts[0].upper().startswith(("TCP", "UDP")):
+            continue
+        proto = parts[0].upper()
+        if proto.startswith("TCP"):
+            # Windows: Proto Local Foreign State / Linux: Proto Recv-Q Send-Q Local Foreign State
+            fields = parts[1:] if len(parts) <= 4 else parts[3:]
+            local, remote = fields[0], fields[1] if len(fields) > 1 else ""
+            state = fields[2] if len(fields) > 2 else ""
+        else:
+            fields = parts[1:] if len(parts) <= 3 else parts[3:]
+            local, remote, state = fields[0], fields[1] if len(fields) > 1 else "", ""
+        records.append({"proto": proto, "local": local, "remote": remote, "state": state})
+    return records
+
+
+def parse_wmic_table(output: str) -> List[dict]:
+    """Parse wmic's fixed-width table output, using header positions as column boundaries."""
+    lines = [line.rstrip() for line in output.splitlines() if line.strip()]
+    if not lines:
+        return []
+    header = lines[0]
+    starts = [match.start() for match in re.finditer(r"\S+", header)]
+    names = header.split()
+    records = []
+    for line in lines[1:]:
+        record = {}
+        for index, name in enumerate(names):
+            end = starts[index + 1] if index + 1 < len(starts) else None
+            record[name.lower()] = line[starts[index]:end].strip()
+        records.append(record)
+    return records
+
+
+def parse_wmic_process(output: str) -> List[dict]:
+    records = []
+    for row in parse_wmic_table(output):
+        records.append({
+            "name": row.get("name", ""),
+            "pid": int(_number(row.get("processid", ""))),
+            "cmdline": row.get("commandline", ""),
+        })
+    return records
+
+
+def parse_wmic_logicaldisk(output: str) -> List[dict]:
+    records = []
+    for row in parse_wmic_table(output):
+        size = _number(row.get("size", ""))
+        free = _number(row.get("freespace", ""))
+        records.append({
+            "device": row.get("caption", ""),
+            "size_gb": round(size / 1024 ** 3, 2),
+            "free_gb": round(free / 1024 ** 3, 2),
+            "percent_used": round(100 * (size - free) / size, 1) if size else 0.0,
+        })
+    return records
+
+
+def parse_df(output: str) -> List[dict]:
+    records = []
+    for line in output.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        records.append({
+            "device": parts[0],
+            "mount": " ".join(parts[5:]),
+            "size_gb": _size_gb(parts[1]),
+            "free_gb": _size_gb(parts[3]),
+            "percent_used": _number(parts[4]),
+        })
+    return records
+
+
+# Parsers keyed on normalized command prefix, with the kind of records they produce.
+PARSERS: Dict[str, Tuple[str, Callable[[str], List[dict]]]] = {
+    "tasklist": ("processes", parse_tasklist),
+    "ps aux": ("processes", parse_ps_aux),
+    "wmic process": ("processes", parse_wmic_process),
+    "netstat": ("connections", parse_netstat),
+    "wmic logicaldisk": ("disks", parse_wmic_logicaldisk),
+    "df": ("disks", parse_df),
+    "wmic": ("table", parse_wmic_table),
+}
+
+
+def find_parser(command: str) -> Optional[Tuple[str, Callable[[str], List[dict]]]]:
+    """Return (kind, parser) for the longest matching command prefix, if any."""
+    key = normalize_command(command)
+    best = None
+    for prefix in PARSERS:
+        if key.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return PARSERS[best] if best is not None else None
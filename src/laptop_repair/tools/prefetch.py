@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Optional
+
+from src.laptop_repair.tools.collectors import acollect, collect
+from src.laptop_repair.tools.command_cache import CommandCache
+from src.laptop_repair.tools.command_runner import (
+    CommandResult,
+    CommandRunner,
+    DEFAULT_TIMEOUT,
+    OutputCallback,
+    normalize_command,
+)
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.tracing import tracer
+
+
+class DiagnosticPrefetcher:
+    """
+    Runs a batch of diagnostic commands on a bounded thread pool ahead of time
+    so that later tool calls can be answered from the collected snapshot.
+    When a cache is given, commands with a fresh cached result are skipped and
+    new results are stored in it as soon as they complete.
+    """
+
+    def __init__(self, max_workers: int = 4, timeout: int = DEFAULT_TIMEOUT, cache: Optional[CommandCache] = None,
+                 native: bool = True, on_output: Optional[OutputCallback] = None, runner: Optional[CommandRunner] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        self.timeout = timeout
+        self.cache = cache
+        self.native = native
+        self.on_output = on_output
+        self.runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diag-prefetch")
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # Cancelling drops queued commands; running ones are killed through the token in collect()
+        self.cancel_token = cancel_token
+        self._unregister_cancel = None
+        if cancel_token is not None:
+            self._unregister_cancel = cancel_token.register(lambda: self.shutdown(wait=False))
+
+    def start(self, commands: Iterable[str]) -> None:
+        """Schedule every command that is not already running or collected."""
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return
+        with self._lock:
+            for command in commands:
+                key = normalize_command(command)
+                if key in self._futures or (self.cache is not None and command in self.cache):
+                    continue
+                self._futures[key] = self._executor.submit(self._collect, command)
+
+    def _collect(self, command: str) -> CommandResult:
+        with tracer.span("prefetch.collect", command=command) as span:
+            if self.runner is not None:
+                result = self.runner(command)
+            else:
+                result = collect(command, self.timeout, native=self.native, on_output=self.on_output,
+                                 cancel_token=self.cancel_token)
+            span.set(exit_code=result.returncode)
+        if self.cache is not None:
+            self.cache.put(command, result)
+        return result
+
+    def __contains__(self, command: str) -> bool:
+        with self._lock:
+            return normalize_command(command) in self._futures
+
+    def future(self, command: str) -> Optional[Future]:
+        """Return the future for a scheduled, not cancelled command."""
+        with self._lock:
+            future = self._futures.get(normalize_command(command))
+        if future is None or future.cancelled():
+            return None
+        return future
+
+    def get(self, command: str) -> Optional[CommandResult]:
+        """
+        Return the prefetched result for a command, waiting for it if it is still
+        running. Returns None when the command was never scheduled or was cancelled.
+        Errors raised while running the command are re-raised here.
+        """
+        future = self.future(command)
+        return future.result() if future is not None else None
+
+    async def aget(self, command: str) -> Optional[CommandResult]:
+        """Awaitable get() that does not block the event loop."""
+        future = self.future(command)
+        return await asyncio.wrap_future(future) if future is not None else None
+
+    def collected(self) -> Dict[str, CommandResult]:
+        """Return the results that have finished successfully so far."""
+        with self._lock:
+            futures = dict(self._futures)
+        return {
+            key: future.result()
+            for key, future in futures.items()
+            if future.done() and not future.cancelled() and future.exception() is None
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the pool, dropping commands that have not started yet."""
+        # A long-lived token (e.g. in batch mode) would otherwise keep every finished prefetcher alive
+        unregister, self._unregister_cancel = self._unregister_cancel, None
+        if unregister is not None:
+            unregister()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def aprefetch(commands: Iterable[str], cache: Optional[CommandCache] = None, native: bool = True,
+                    concurrency: int = 4, timeout: int = DEFAULT_TIMEOUT, runner: Optional[CommandRunner] = None,
+                    cancel_token: Optional[CancellationToken] = None) -> Dict[str, CommandResult]:
+    """
+    Collect commands concurrently on the running event loop, storing results in
+    the cache. Commands with a fresh cached result are skipped. Returns the
+    newly collected results keyed by normalized command.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = {normalize_command(c): c for c in commands if cache is None or c not in cache}
+
+    async def run_one(command: str) -> CommandResult:
+        async with semaphore:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if runner is not None:
+                result = await asyncio.to_thread(runner, command)
+            else:
+                result = await acollect(command, timeout, native=native, cancel_token=cancel_token)
+        if cache is not None:
+            cache.put(command, result)
+        return result
+
+    results = await asyncio.gather(*(run_one(c) for c in pending.values()), return_exceptions=True)
+    return {
+        key: result
+        for key, result in zip(pending, results)
+        if not isinstance(result, BaseException)
+    }
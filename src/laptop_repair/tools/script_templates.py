@@ -0,0 +1,200 @@
+import platform
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from src.laptop_repair.tools.fix_catalog import FixCatalog, FixCommand, fix_catalog
+
+# The model lists the catalog commands it chose between these markers instead of writing the script
+FIX_PLAN_START = "--- FIX PLAN START ---"
+FIX_PLAN_END = "--- FIX PLAN END ---"
+SCRIPT_KINDS = ("batch", "powershell", "shell")
+
+_PLAN_BLOCK = re.compile(re.escape(FIX_PLAN_START) + r"[ \t]*\n?(.*?)(?:" + re.escape(FIX_PLAN_END) + r"|\Z)",
+                         re.DOTALL)
+# Optional first line choosing the script type, e.g. 'script: powershell'
+_PLAN_KIND = re.compile(r"^\s*script\s*(?:type|kind)?\s*[:=]\s*([a-z0-9]+)\s*$", re.IGNORECASE)
+_PLAN_KIND_ALIASES = {"bat": "batch", "cmd": "batch", "ps1": "powershell", "ps": "powershell", "sh": "shell",
+                      "bash": "shell"}
+_MARKERS = {"batch": "BATCH SCRIPT", "powershell": "POWERSHELL SCRIPT", "shell": "SHELL SCRIPT"}
+
+
+@dataclass(frozen=True)
+class FixPlan:
+    """The fix commands a model chose, in order, and the script type it asked for."""
+    commands: Tuple[str, ...]
+    kind: Optional[str] = None
+    # False when the end marker is missing
+    complete: bool = True
+
+
+def default_kind(system: Optional[str] = None) -> str:
+    return "batch" if (system or platform.system()) == "Windows" else "shell"
+
+
+def parse_fix_plan(text: str) -> Optional[FixPlan]:
+    """The fix plan in a report, or None if it has none."""
+    match = _PLAN_BLOCK.search(text or "")
+    if match is None:
+        return None
+    kind, commands = None, []
+    for line in match.group(1).splitlines():
+        line = line.strip()
+        if not line or line.startswith("```"):
+            continue
+        kind_match = _PLAN_KIND.match(line)
+        if kind_match and not commands:
+            name = kind_match.group(1).lower()
+            name = _PLAN_KIND_ALIASES.get(name, name)
+            kind = name if name in SCRIPT_KINDS else None
+            continue
+        # Tolerate list markup and trailing comments copied from get_fix_commands
+        line = re.sub(r"^(?:[-*]|\d+[.)])\s+", "", line).split("  #", 1)[0].strip().strip("`").strip()
+        if line:
+            commands.append(line)
+    return FixPlan(tuple(commands), kind, complete=FIX_PLAN_END in match.group(0))
+
+
+def select_fixes(plan: FixPlan, system: Optional[str] = None,
+                 catalog: FixCatalog = fix_catalog) -> Tuple[List[FixCommand], List[str]]:
+    """Catalog entries for the plan's commands, and the commands that are not in the catalog."""
+    entries, unknown = [], []
+    for command in plan.commands:
+        entry = catalog.lookup(command, system)
+        if entry is None:
+            unknown.append(command)
+        elif entry not in entries:
+            entries.append(entry)
+    return entries, unknown
+
+
+def _batch_text(text: str) -> str:
+    return re.sub(r"([&|<>^])", r"^\1", text).replace("%", "%%")
+
+
+def _single_quoted(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _shell_quoted(text: str) -> str:
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+def _batch(entries: Tuple[FixCommand, ...], title: str) -> List[str]:
+    # cmd can still act on some special characters in a REM line
+    lines = ["@echo off", "setlocal EnableDelayedExpansion", f"REM {re.sub(r'[&|<>^%]', '', title)}",
+             f"REM Generated from the approved fix catalog: {len(entries)} steps."]
+    if any(entry.requires_admin for entry in entries):
+        lines += ["", "net session >nul 2>&1", "if errorlevel 1 (",
+                  '    echo This script must be run as Administrator. Right-click it and choose "Run as administrator".',
+                  "    pause", "    exit /b 1", ")"]
+    lines += ["", "echo This script will:"]
+    lines += [f"echo   {number}. {_batch_text(entry.description)}" for number, entry in enumerate(entries, 1)]
+    lines += ["echo.", "echo Press any key to start, or close this window to cancel.", "pause >nul", "set FAILED=0"]
+    for number, entry in enumerate(entries, 1):
+        lines += ["", "echo.", f"echo [{number}/{len(entries)}] {_batch_text(entry.description)}"]
+        if not entry.reversible:
+            lines += ['choice /c YN /m "This step cannot be undone. Run it"',
+                      "if errorlevel 2 (", "    echo     Skipped.", f"    goto step{number}_done", ")"]
+        lines += [entry.command, "if errorlevel 1 (",
+                  f"    echo     Step {number} failed with exit code !errorlevel!.", "    set /a FAILED+=1",
+                  ") else (", "    echo     Done.", ")", f":step{number}_done"]
+    lines += ["", "echo.", "if !FAILED! GTR 0 (", "    echo !FAILED! steps failed. Review the messages above.",
+              ") else (", "    echo All steps completed successfully.", ")", "pause", "endlocal"]
+    return lines
+
+
+def _powershell(entries: Tuple[FixCommand, ...], title: str) -> List[str]:
+    lines = [f"# {title}", f"# Generated from the approved fix catalog: {len(entries)} steps."]
+    if any(entry.requires_admin for entry in entries):
+        lines.append("#Requires -RunAsAdministrator")
+    lines += ["", "Write-Host 'This script will:'"]
+    lines += [f"Write-Host {_single_quoted(f'  {number}. {entry.description}')}"
+              for number, entry in enumerate(entries, 1)]
+    lines += ["Read-Host 'Press Enter to start, or close this window to cancel' | Out-Null", "$failed = 0"]
+    for number, entry in enumerate(entries, 1):
+        lines += ["", "Write-Host ''", f"Write-Host {_single_quoted(f'[{number}/{len(entries)}] {entry.description}')}"]
+        # Catalog commands use cmd syntax (&, %temp%), so they run through cmd
+        run = [f"cmd /c {_single_quoted(entry.command)}",
+               "if ($LASTEXITCODE -ne 0) {",
+               f"    Write-Host \"    Step {number} failed with exit code $LASTEXITCODE.\"",
+               "    $failed++",
+               "} else {",
+               "    Write-Host '    Done.'",
+               "}"]
+        if entry.reversible:
+            lines += run
+        else:
+            lines += ["$answer = Read-Host 'This step cannot be undone. Run it? (y/n)'",
+                      "if ($answer -match '^[Yy]') {"]
+            lines += ["    " + line for line in run]
+            lines += ["} else {", "    Write-Host '    Skipped.'", "}"]
+    lines += ["", "Write-Host ''", "if ($failed -gt 0) {",
+              "    Write-Host \"$failed steps failed. Review the messages above.\"",
+              "} else {", "    Write-Host 'All steps completed successfully.'", "}",
+              "Read-Host 'Press Enter to close' | Out-Null"]
+    return lines
+
+
+def _shell(entries: Tuple[FixCommand, ...], title: str) -> List[str]:
+    lines = ["#!/bin/sh", f"# {title}", f"# Generated from the approved fix catalog: {len(entries)} steps.",
+             "", "echo 'This script will:'"]
+    lines += [f"echo {_shell_quoted(f'  {number}. {entry.description}')}" for number, entry in enumerate(entries, 1)]
+    lines += ["printf 'Press Enter to start, or Ctrl-C to cancel. '", "read _", "failed=0"]
+    for number, entry in enumerate(entries, 1):
+        lines += ["", "echo", f"echo {_shell_quoted(f'[{number}/{len(entries)}] {entry.description}')}"]
+        run = [f"if {entry.command}; then",
+               "    echo '    Done.'",
+               "else",
+               f"    echo \"    Step {number} failed with exit code $?.\"",
+               "    failed=$((failed + 1))",
+               "fi"]
+        if entry.reversible:
+            lines += run
+        else:
+            lines += ["printf 'This step cannot be undone. Run it? [y/N] '", "read answer",
+                      'case "$answer" in', "    [Yy]*)"]
+            lines += ["        " + line for line in run]
+            lines += ["        ;;", "    *)", "        echo '    Skipped.'", "        ;;", "esac"]
+    lines += ["", "echo", 'if [ "$failed" -gt 0 ]; then', "    echo \"$failed steps failed. Review the messages above.\"",
+              "else", "    echo 'All steps completed successfully.'", "fi"]
+    return lines
+
+
+_RENDERERS = {"batch": _batch, "powershell": _powershell, "shell": _shell}
+
+
+@lru_cache(maxsize=256)
+def render_script(entries: Tuple[FixCommand, ...], kind: str = "batch", title: str = "System fix script") -> str:
+    """
+    A complete script running the entries in order. Each step is announced,
+    irreversible steps ask for confirmation, failures are counted from the
+    exit code, and the script pauses before starting and at the end.
+    """
+    title = " ".join(title.split()) or "System fix script"
+    return "\n".join(_RENDERERS[kind](tuple(entries), title))
+
+
+def apply_fix_plan(report: str, system: Optional[str] = None, title: Optional[str] = None) -> str:
+    """
+    Replace the fix plan in a report with the rendered script between the
+    usual script markers. A plan that selects no catalog commands is removed
+    and leaves no script. Reports without a plan are returned unchanged.
+    """
+    plan = parse_fix_plan(report)
+    if plan is None:
+        return report
+    entries, unknown = select_fixes(plan, system)
+    block = []
+    if entries:
+        kind = plan.kind or default_kind(system)
+        if kind != "shell" and (system or platform.system()) != "Windows":
+            kind = "shell"
+        marker = _MARKERS[kind]
+        block = [f"--- {marker} START ---", render_script(tuple(entries), kind, title or "System fix script"),
+                 f"--- {marker} END ---"]
+    if unknown:
+        block.append("Not included (not in the approved fix catalog): " + ", ".join(unknown))
+    match = _PLAN_BLOCK.search(report)
+    return report[:match.start()] + "\n".join(block) + report[match.end():]
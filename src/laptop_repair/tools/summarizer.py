@@ -0,0 +1,115 @@
+from typing import List, Optional
+
+from src.laptop_repair.tools.collectors import render_table
+from src.laptop_repair.tools.command_runner import CommandResult
+from src.laptop_repair.tools.parsers import find_parser
+
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_TOP_N = 15
+DEFAULT_DISK_THRESHOLD = 80.0
+MAX_CELL_WIDTH = 60
+
+_LISTENING_STATES = {"LISTEN", "LISTENING"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def _columns(records: List[dict]) -> List[str]:
+    columns = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+    return columns
+
+
+def _clip(records: List[dict]) -> List[dict]:
+    """Shorten long cell values (e.g. command lines) so one row cannot eat the budget."""
+    return [
+        {key: (value[:MAX_CELL_WIDTH - 3] + "..." if isinstance(value, str) and len(value) > MAX_CELL_WIDTH else value)
+         for key, value in record.items()}
+        for record in records
+    ]
+
+
+def _rank(kind: str, records: List[dict], top_n: int, disk_threshold: float):
+    """Return (selected records, description of the selection)."""
+    if kind == "processes":
+        ranked = sorted(
+            records,
+            key=lambda r: (r.get("mem_mb", 0.0), r.get("cpu_percent", r.get("cpu_s", 0.0))),
+            reverse=True,
+        )
+        return ranked[:top_n], f"top {min(top_n, len(ranked))} of {len(records)} processes by memory/CPU"
+    if kind == "connections":
+        listening = [
+            r for r in records
+            if r.get("state", "").upper() in _LISTENING_STATES or r.get("proto", "").upper().startswith("UDP")
+        ]
+        established = sum(1 for r in records if r.get("state", "").upper() == "ESTABLISHED")
+        return listening, f"{len(listening)} listening ports of {len(records)} sockets ({established} established)"
+    if kind == "disks":
+        flagged = [dict(r, over_threshold="YES" if r.get("percent_used", 0.0) >= disk_threshold else "") for r in records]
+        flagged.sort(key=lambda r: r.get("percent_used", 0.0), reverse=True)
+        over = sum(1 for r in flagged if r["over_threshold"])
+        return flagged, f"{over} of {len(records)} disks at or above {disk_threshold:g}% used"
+    return records, f"{len(records)} rows"
+
+
+def _fit_lines(text: str, token_budget: int) -> str:
+    """Keep the head and tail of a text so that it fits within the token budget."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    lines = text.splitlines()
+    half_chars = token_budget * 4 // 2
+    head, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > half_chars:
+            break
+        head.append(line)
+        used += len(line) + 1
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        if used + len(line) + 1 > half_chars:
+            break
+        tail.append(line)
+        used += len(line) + 1
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join(head + [f"... [{omitted} lines omitted] ..."] + list(reversed(tail))) + "\n"
+
+
+def summarize(result: CommandResult, token_budget: int = DEFAULT_TOKEN_BUDGET, top_n: int = DEFAULT_TOP_N,
+              disk_threshold: float = DEFAULT_DISK_THRESHOLD) -> Optional[str]:
+    """
+    Condense a command's output to fit within token_budget. Known tables
+    (processes, connections, disks) are parsed into records and ranked;
+    anything else is trimmed to its head and tail. Returns None when the
+    output already fits and needs no summarizing.
+    """
+    if estimate_tokens(result.stdout) <= token_budget:
+        return None
+
+    parser = find_parser(result.command)
+    records = result.records
+    kind = parser[0] if parser else None
+    if records is None and parser is not None:
+        try:
+            records = parser[1](result.stdout)
+        except Exception:
+            records = None
+
+    if not records:
+        return _fit_lines(result.stdout, token_budget)
+
+    selected, description = _rank(kind, records, top_n, disk_threshold)
+    selected = _clip(selected)
+    columns = _columns(selected)
+    body = render_table(selected, columns)
+    while len(selected) > 1 and estimate_tokens(body) > token_budget - 40:
+        selected = selected[:len(selected) * 3 // 4]
+        body = render_table(selected, columns)
+    note = f"[Summary: {description}; showing {len(selected)} rows. Re-run with raw=true for the full output.]\n"
+    return note + _fit_lines(body, token_budget)
@@ -0,0 +1,195 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("laptop_repair_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+@dataclass
+class Span:
+    """One timed operation, e.g. a crew run, an LLM call or a tool invocation."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    end: float = 0.0
+    attributes: Dict[str, object] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """
+    Collects spans in memory while enabled. Nesting follows the calling
+    context, so spans opened inside a crew run become its children; work
+    started on other threads (the prefetch pool) is recorded as separate roots.
+    Disabled tracers still hand out spans but keep nothing, so instrumentation
+    can stay in place at negligible cost.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else _new_id(16),
+            span_id=_new_id(8),
+            parent_id=parent.span_id if parent else None,
+            attributes=dict(attributes),
+        )
+        token = _current_span.set(span)
+        span.start = time.time()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(token)
+            if self.enabled:
+                with self._lock:
+                    self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def export_jsonl(self, path: str) -> None:
+        """Append one JSON object per finished span."""
+        with open(path, 'a', encoding='utf-8') as f:
+            for span in self.spans():
+                record = asdict(span)
+                record["duration"] = round(span.duration, 6)
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def export_otlp(self, path: str, service_name: str = "laptop-repair") -> None:
+        """Write the spans as an OTLP/JSON trace export, loadable by OpenTelemetry tooling."""
+        spans = []
+        for span in self.spans():
+            otlp = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(span.start * 1e9)),
+                "endTimeUnixNano": str(int(span.end * 1e9)),
+                "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp["parentSpanId"] = span.parent_id
+            spans.append(otlp)
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                "scopeSpans": [{"scope": {"name": "laptop_repair"}, "spans": spans}],
+            }]
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+
+    def export(self, path: str) -> None:
+        """Export by file name: '*.jsonl' as JSON lines, anything else as OTLP/JSON."""
+        if path.lower().endswith(".jsonl"):
+            self.export_jsonl(path)
+        else:
+            self.export_otlp(path)
+
+    def breakdown(self) -> "OrderedDict[str, dict]":
+        """Total time and call count per span name, largest first."""
+        totals: Dict[str, dict] = {}
+        for span in self.spans():
+            entry = totals.setdefault(span.name, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += span.duration
+        return OrderedDict(sorted(totals.items(), key=lambda item: item[1]["seconds"], reverse=True))
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": "" if value is None else str(value)}
+    return {"key": key, "value": typed}
+
+
+def _merge(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Union of time intervals as sorted, non-overlapping intervals."""
+    merged: List[Tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _overlap(a: List[Tuple[float, float]], b: List[Tuple[float, float]]) -> float:
+    """Seconds covered by both of two merged interval lists."""
+    total, i, j = 0.0, 0, 0
+    while i < len(a) and j < len(b):
+        total += max(0.0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def format_breakdown(tracer: "Tracer", root: str = "crew.run") -> str:
+    """
+    Per-phase time table. Wall time inside the root spans during which no LLM
+    call or tool invocation was running is reported as crewAI/agent overhead.
+    Concurrent spans (specialists, batch runs) are merged first, so time is
+    counted once however many of them overlap.
+    """
+    breakdown = tracer.breakdown()
+    total = breakdown.get(root, {}).get("seconds", 0.0)
+    lines = [f"{'phase':<22}{'calls':>7}{'seconds':>10}{'share':>8}"]
+    for name, entry in breakdown.items():
+        share = f"{100 * entry['seconds'] / total:.0f}%" if total and name != root else ""
+        lines.append(f"{name:<22}{entry['count']:>7}{entry['seconds']:>10.2f}{share:>8}")
+    if total:
+        spans = tracer.spans()
+        roots = _merge([(span.start, span.end) for span in spans if span.name == root])
+        busy = _merge([(span.start, span.end) for span in spans if span.name in ("llm.call", "tool.run")])
+        wall = sum(end - start for start, end in roots)
+        other = max(0.0, wall - _overlap(roots, busy))
+        share = f"{100 * other / wall:.0f}%" if wall else ""
+        lines.append(f"{'other (agent loop)':<22}{'':>7}{other:>10.2f}{share:>8}")
+    return "\n".join(lines)
+
+
+# Process-wide tracer used by the crew, the LLM wrapper and the tool
+tracer = Tracer(enabled=os.getenv("DIAG_TRACE") is not None)
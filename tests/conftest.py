@@ -0,0 +1,5 @@
+import os
+
+# Tests run offline and must not export telemetry
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
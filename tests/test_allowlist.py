@@ -0,0 +1,26 @@
+from src.laptop_repair.tools.allowlist import CommandIndex, _diagnostic_commands
+
+INDEX = CommandIndex(_diagnostic_commands("Windows"))
+
+
+def test_commands_match_after_normalizing_case_and_spaces():
+    assert "systeminfo" in INDEX
+    assert INDEX.lookup("  IPCONFIG   /ALL ") == "ipconfig /all"
+
+
+def test_arguments_are_part_of_the_match():
+    assert "ipconfig" not in INDEX
+    assert "wmic os get *" not in INDEX
+    assert INDEX.lookup("tasklist & del /q C:\\Windows\\*") is None
+
+
+def test_first_spelling_wins_for_duplicates():
+    index = CommandIndex(["Df -H", "df -h"])
+    assert len(index) == 1
+    assert index.commands() == ["Df -H"]
+
+
+def test_each_platform_has_its_own_list():
+    linux = CommandIndex(_diagnostic_commands("Linux"))
+    assert "df -h" in linux and "df -h" not in INDEX
+    assert "systeminfo" not in linux
@@ -0,0 +1,66 @@
+import io
+import json
+import os
+
+from src.laptop_repair import batch
+from src.laptop_repair.batch import read_problems, run_batch
+from src.laptop_repair.benchmark import BENCHMARK_DIR, FixtureRunner, ScriptedLLM, fixture_platform
+from src.laptop_repair.crew import LaptopRepairCrew
+
+
+def test_jsonl_csv_and_text_tickets():
+    jsonl = io.StringIO('{"id": "a", "problem": " Wi-Fi drops "}\n\nDisk is full\n{"description": "Slow boot"}\n')
+    assert read_problems(jsonl) == [
+        {"id": "a", "problem": "Wi-Fi drops"},
+        {"id": "3", "problem": "Disk is full"},
+        {"id": "4", "problem": "Slow boot"},
+    ]
+    rows = io.StringIO("id,problem\nt1,Fan is loud\nt2,\n")
+    assert read_problems(rows, csv_format=True) == [{"id": "t1", "problem": "Fan is loud"}]
+
+
+def test_bad_lines_become_error_tickets():
+    source = io.StringIO('{"problem": "Wi-Fi drops"\n{"problem": 42}\n{"problem": ["a"]}\nBattery drains\n')
+    tickets = read_problems(source)
+    assert [ticket["id"] for ticket in tickets] == ["1", "2", "3", "4"]
+    assert "invalid JSON" in tickets[0]["error"]
+    assert "must be a string, not int" in tickets[1]["error"]
+    assert "must be a string, not list" in tickets[2]["error"]
+    assert tickets[3] == {"id": "4", "problem": "Battery drains"}
+
+
+def test_short_csv_rows_are_skipped():
+    rows = io.StringIO("id,problem\nt1\n")
+    assert read_problems(rows, csv_format=True) == []
+
+
+def test_rejected_tickets_are_reported_without_a_diagnosis():
+    tickets = read_problems(io.StringIO('{"problem": \n'))
+    output = io.StringIO()
+    records = list(run_batch(tickets, output))
+    assert len(records) == 1
+    assert records[0]["result"] is None
+    assert "invalid JSON" in records[0]["error"]
+    assert json.loads(output.getvalue()) == records[0]
+
+
+class QuotaExhaustedLLM(ScriptedLLM):
+    def call(self, messages, *args, **kwargs):
+        raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+
+
+def test_failed_diagnoses_are_reported_as_errors(monkeypatch):
+    plat = fixture_platform()
+    runner = FixtureRunner(os.path.join(BENCHMARK_DIR, "fixtures", plat))
+
+    def crew(**options):
+        return LaptopRepairCrew(llm=QuotaExhaustedLLM({}), runner=runner, native=False, snapshots=False,
+                                knowledge=False, **options)
+
+    monkeypatch.setattr(batch, "LaptopRepairCrew", crew)
+    tickets = read_problems(io.StringIO("Wi-Fi drops\nDisk is full\n"))
+    records = list(run_batch(tickets, io.StringIO(), concurrency=2))
+    assert len(records) == 2
+    for record in records:
+        assert record["result"] is None
+        assert "The diagnosis failed" in record["error"] and "429" in record["error"]
@@ -0,0 +1,39 @@
+import platform
+
+import psutil
+import pytest
+
+from src.laptop_repair.tools import collectors
+from src.laptop_repair.tools.collectors import collect_native
+
+SERVICES = "wmic service where state='running' get name,displayname,processid"
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="services are collected natively on Windows")
+def test_services_are_unsupported_off_windows():
+    assert collectors.collect_services() is None
+    assert collect_native(SERVICES) is None
+
+
+def test_access_denied_falls_back_to_the_command(monkeypatch):
+    def denied():
+        raise psutil.AccessDenied()
+
+    monkeypatch.setitem(collectors.NATIVE_COLLECTORS, "df -h", denied)
+    assert collect_native("df -h") is None
+
+
+def test_collector_bugs_propagate(monkeypatch):
+    def broken():
+        raise KeyError("cpu_times")
+
+    monkeypatch.setitem(collectors.NATIVE_COLLECTORS, "df -h", broken)
+    with pytest.raises(KeyError):
+        collect_native("df -h")
+
+
+def test_native_result_keeps_the_requested_spelling():
+    result = collect_native("DF  -h")
+    assert result.command == "DF  -h"
+    assert result.source == "native"
+    assert result.records
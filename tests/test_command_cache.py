@@ -0,0 +1,106 @@
+import sys
+import threading
+
+import pytest
+
+from src.laptop_repair.tools import command_cache as cache_module
+from src.laptop_repair.tools.command_cache import CommandCache
+from src.laptop_repair.tools.command_runner import CommandResult
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def ok(command, stdout="output"):
+    return CommandResult(command, stdout=stdout, returncode=0)
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = CommandCache(ttls={"ps aux": 15, "lscpu": 86400})
+    cache.put("ps aux", ok("ps aux"))
+    cache.put("LSCPU", ok("lscpu"))
+    clock.now += 14
+    assert cache.get("ps   aux") is not None
+    clock.now += 1
+    assert cache.get("ps aux") is None
+    assert "lscpu" in cache
+
+
+def test_ttl_uses_the_longest_prefix_and_age():
+    cache = CommandCache(default_ttl=30, ttls={"wmic": 60, "wmic cpu": 86400})
+    assert cache.ttl_for("WMIC cpu get name") == 86400
+    assert cache.ttl_for("wmic os get caption") == 60
+    assert cache.ttl_for("uptime") == 30
+    cache.put("wmic os get caption", ok("wmic os get caption"), age=60)
+    assert "wmic os get caption" not in cache
+
+
+def test_failed_results_are_not_cached():
+    cache = CommandCache()
+    cache.put("df -h", CommandResult("df -h", returncode=1))
+    cache.put("free -h", CommandResult("free -h", returncode=0, truncated=True))
+    cache.put("lsblk", CommandResult("lsblk", returncode=0, timed_out=True))
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = CommandCache(max_entries=2)
+    cache.put("df -h", ok("df -h"))
+    cache.put("free -h", ok("free -h"))
+    cache.get("df -h")
+    cache.put("lsblk", ok("lsblk"))
+    assert "df -h" in cache and "lsblk" in cache
+    assert "free -h" not in cache
+    assert cache.evictions == 1
+
+
+def test_counters_and_invalidation():
+    cache = CommandCache()
+    cache.put("wmic cpu get name", ok("wmic cpu get name"))
+    cache.put("wmic process get name", ok("wmic process get name"))
+    cache.put("df -h", ok("df -h"))
+    cache.get("df -h")
+    cache.get("lsusb")
+    cache.invalidate("wmic")
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+    cache.invalidate()
+    assert cache.get("df -h") is None
+
+
+def test_ttl_lookups_and_updates_can_run_concurrently():
+    cache = CommandCache(ttls={})
+    done = threading.Event()
+    errors = []
+
+    def lookups():
+        try:
+            while not done.is_set():
+                cache.ttl_for("netstat -an")
+        except RuntimeError as e:
+            errors.append(e)
+
+    # Switch threads often so lookups overlap the updates
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        reader = threading.Thread(target=lookups)
+        reader.start()
+        for number in range(10000):
+            cache.set_ttl(f"prefix{number}", 1)
+        done.set()
+        reader.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -0,0 +1,86 @@
+import asyncio
+import gc
+import shlex
+import sys
+
+import pytest
+
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.tools.command_runner import arun_command, run_command
+
+
+def _python(code: str) -> str:
+    return f"{shlex.quote(sys.executable)} -c {shlex.quote(code)}"
+
+
+# Three lines of 60 two-byte characters: 121 bytes but only 61 characters each
+WIDE_STDOUT = _python("import sys\nfor _ in range(3): sys.stdout.write('\\u00e9' * 60 + '\\n')")
+ENDLESS = _python("import sys, time\nwhile True:\n    sys.stdout.write('x' * 99 + '\\n')\n"
+                  "    sys.stderr.write('y' * 99 + '\\n')\n    sys.stdout.flush()\n    time.sleep(0.001)")
+NOISY_STDERR = _python("import sys\nfor _ in range(2000): sys.stderr.write('x' * 99 + '\\n')\nprint('ok')")
+
+
+def test_stdout_limit_counts_bytes():
+    result = run_command(WIDE_STDOUT, max_output_bytes=100)
+    assert result.truncated
+    assert result.stdout.count("\n") == 1
+
+
+def test_stdout_limit_counts_bytes_async():
+    result = asyncio.run(arun_command(WIDE_STDOUT, max_output_bytes=100))
+    assert result.truncated
+    assert result.stdout.count("\n") == 1
+
+
+def test_stderr_is_capped():
+    result = run_command(NOISY_STDERR, max_output_bytes=1000)
+    assert result.returncode == 0
+    assert result.stdout == "ok\n"
+    assert 1000 <= len(result.stderr.encode("utf-8")) <= 1100
+
+
+def test_stderr_is_capped_async():
+    result = asyncio.run(arun_command(NOISY_STDERR, max_output_bytes=1000))
+    assert result.returncode == 0
+    assert result.stdout == "ok\n"
+    assert 1000 <= len(result.stderr.encode("utf-8")) <= 1100
+
+
+@pytest.fixture
+def unraisable(monkeypatch):
+    """Errors raised while objects are garbage-collected, e.g. transports closed after their loop."""
+    errors = []
+    monkeypatch.setattr(sys, "unraisablehook", lambda info: errors.append(info.exc_value))
+    yield errors
+
+
+def _run_and_collect(coroutine):
+    result = asyncio.run(coroutine)
+    gc.collect()
+    return result
+
+
+def test_truncated_async_command_leaves_no_open_pipes(unraisable):
+    # Whether output is left in the pipe depends on timing, so try a few times
+    for _ in range(5):
+        result = _run_and_collect(arun_command(WIDE_STDOUT, max_output_bytes=100))
+        assert result.truncated
+    assert unraisable == []
+
+
+def test_timed_out_async_command_leaves_no_open_pipes(unraisable):
+    result = _run_and_collect(arun_command(ENDLESS, timeout=0.3))
+    assert result.timed_out
+    assert unraisable == []
+
+
+def test_cancelled_async_command_leaves_no_open_pipes(unraisable):
+    token = CancellationToken()
+
+    async def cancel_soon():
+        asyncio.get_running_loop().call_later(0.3, token.cancel)
+        return await arun_command(ENDLESS, cancel_token=token)
+
+    result = _run_and_collect(cancel_soon())
+    assert result.error
+    assert unraisable == []
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import re
+import threading
+
+import pytest
+
+from src.laptop_repair.benchmark import BENCHMARK_DIR, FixtureRunner, ScriptedLLM, fixture_platform, load_corpus
+from src.laptop_repair.cancellation import CancellationToken, current_token
+from src.laptop_repair.crew import SPECIALIST_FINDINGS, LaptopRepairCrew
+from src.laptop_repair.snapshot import SnapshotStore
+from src.laptop_repair.tools.command_cache import command_cache
+
+CORPUS = {item["id"]: item for item in load_corpus(os.path.join(BENCHMARK_DIR, "problems.jsonl"))}
+WIFI = CORPUS["wifi-drops"]["problem"]
+DISK = CORPUS["disk-full"]["problem"]
+_FOCUS = re.compile(r"^Focus areas: (.*)$", re.MULTILINE)
+
+
+class RecordingLLM(ScriptedLLM):
+    """ScriptedLLM that remembers the focus areas of the facts each problem's prompts carried."""
+
+    def call(self, messages, *args, **kwargs):
+        prompt = messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+        focus = _FOCUS.search(prompt)
+        for problem in self.plans:
+            if problem in prompt and focus:
+                with self._lock:
+                    self.seen.append((problem, focus.group(1)))
+        return super().call(messages, *args, **kwargs)
+
+    def reset(self) -> None:
+        super().reset()
+        self.seen = []
+
+
+class ContextLLM(ScriptedLLM):
+    """ScriptedLLM that remembers the thread and cancel token each call ran with."""
+
+    def call(self, messages, *args, **kwargs):
+        prompt = messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+        with self._lock:
+            self.seen.append((threading.current_thread().name, current_token.get(), SPECIALIST_FINDINGS in prompt))
+        return super().call(messages, *args, **kwargs)
+
+    def reset(self) -> None:
+        super().reset()
+        self.seen = []
+
+
+class OverlapLLM(ScriptedLLM):
+    """ScriptedLLM that remembers how many calls were in flight at once."""
+
+    def call(self, messages, *args, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().call(messages, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def reset(self) -> None:
+        super().reset()
+        self.active = self.peak = 0
+
+
+@pytest.fixture
+def crew_factory():
+    plat = fixture_platform()
+    runner = FixtureRunner(os.path.join(BENCHMARK_DIR, "fixtures", plat), latency=0.05)
+
+    def build(llm_class=RecordingLLM, latency=0.0, **options):
+        llm = llm_class({item["problem"]: item.get(plat, []) for item in CORPUS.values()}, latency=latency)
+        options = {"snapshots": False, "knowledge": False, **options}
+        return LaptopRepairCrew(llm=llm, runner=runner, native=False, **options)
+
+    command_cache.invalidate()
+    yield build
+    command_cache.invalidate()
+
+
+def test_concurrent_async_runs_keep_their_own_plan(crew_factory):
+    crew = crew_factory()
+
+    async def both():
+        return await asyncio.gather(crew.run_async(WIFI), crew.run_async(DISK))
+
+    reports = asyncio.run(both())
+    assert all("Final Diagnosis" in report for report in reports)
+    assert {problem for problem, _ in crew.llm.seen} == {WIFI, DISK}
+    for problem, focus in crew.llm.seen:
+        expected, other = ("network", "disk") if problem == WIFI else ("disk", "network")
+        assert expected in focus and other not in focus
+
+
+def test_concurrent_async_runs_overlap(crew_factory):
+    crew = crew_factory(llm_class=OverlapLLM, latency=0.2)
+
+    async def both():
+        return await asyncio.gather(crew.run_async(WIFI), crew.run_async(DISK))
+
+    reports = asyncio.run(both())
+    assert all("Final Diagnosis" in report for report in reports)
+    # Each run checks out its own crew, so the two agent loops wait on the model at the same time
+    assert crew.llm.peak == 2
+
+
+def test_concurrent_runs_save_their_own_snapshots(crew_factory, tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    crew = crew_factory(snapshots=store)
+
+    async def both():
+        return await asyncio.gather(crew.run_async(WIFI), crew.run_async(DISK))
+
+    asyncio.run(both())
+    saved = [set(store.load(path).entries) for path in store.paths()]
+    assert len(saved) == 2
+    wifi = next(keys for keys in saved if "netstat -tuln" in keys)
+    disk = next(keys for keys in saved if "df -h" in keys)
+    assert "df -h" not in wifi and "netstat -tuln" not in disk
+    assert crew.snapshot is not None and set(crew.snapshot.entries) in saved
+
+
+def test_specialists_run_in_the_runs_context(crew_factory):
+    crew = crew_factory(llm_class=ContextLLM, specialists=True)
+    token = CancellationToken()
+
+    report = crew.run(WIFI, cancel_token=token)
+    assert "Final Diagnosis" in report
+    specialists = [seen for seen in crew.llm.seen if seen[0].startswith("diag-specialist")]
+    assert specialists and all(cancel is token for _, cancel, _ in specialists)
+    # The lead runs after the specialists and gets their findings in its prompt
+    lead = [seen for seen in crew.llm.seen if not seen[0].startswith("diag-specialist")]
+    assert lead and all(cancel is token for _, cancel, _ in lead)
+    assert any(findings for _, _, findings in lead)
@@ -0,0 +1,42 @@
+from src.laptop_repair.tools.fix_catalog import CATALOG, FixCatalog, fix_catalog, format_categories, format_fixes
+
+
+def test_query_by_category_and_tags_keeps_catalog_order():
+    fixes = fix_catalog.query(category="SYSTEM_CLEANUP", tags=["space"], system="Linux")
+    assert [fix.command for fix in fixes] == ["sudo apt-get clean", "sudo apt-get autoremove"]
+    assert fix_catalog.query(tags=["space", "logs"], system="Linux") == []
+
+
+def test_query_filters_by_platform_and_flags():
+    windows = fix_catalog.query(category="disk_cleanup", system="Windows")
+    assert windows and all("Windows" in fix.platforms for fix in windows)
+    assert fix_catalog.query(category="disk_cleanup", system="Linux") == []
+    reversible = fix_catalog.query(category="service_restart", system="Linux", reversible=True)
+    assert len(reversible) == 2
+
+
+def test_lookup_matches_whole_commands_on_their_platform():
+    assert fix_catalog.lookup("SFC   /SCANNOW", "Windows").category == "system_files"
+    assert fix_catalog.lookup("sfc /scannow", "Linux") is None
+    assert fix_catalog.lookup("sfc /scannow & del /q *", "Windows") is None
+
+
+def test_categories_and_tags_only_list_the_platforms_entries():
+    linux = fix_catalog.categories("Linux")
+    assert linux["system_cleanup"] == 3
+    assert "disk_cleanup" not in linux
+    assert "updates" in fix_catalog.tags("Linux")
+
+
+def test_as_dict_groups_commands_by_category():
+    catalog = FixCatalog(entry for entry in CATALOG if entry.category == "disk_check")
+    assert catalog.as_dict("Linux") == {"disk_check": ["sudo fsck -f /dev/sda1", "sudo e2fsck -f /dev/sda1"]}
+
+
+def test_formatting_shows_flags_and_categories():
+    text = format_fixes(fix_catalog.query(category="system_update", system="Linux"))
+    assert "sudo apt-get update  # Refresh package lists [admin]" in text
+    assert "[admin, irreversible]" in text
+    overview = format_categories(fix_catalog, "Linux")
+    assert "  - system_cleanup (3 commands)" in overview
+    assert "get_fix_commands tag:<tag>" in overview
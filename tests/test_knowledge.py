@@ -0,0 +1,53 @@
+from src.laptop_repair.knowledge import KnowledgeBase, parse_verdict, tokenize
+
+REPORT = ("**Problem Summary:** Wi-Fi keeps dropping.\n**Final Diagnosis:** The adapter is power-saving.\n"
+          "--- SHELL SCRIPT START ---\nnmcli radio wifi off\nnmcli radio wifi on\n--- SHELL SCRIPT END ---")
+PROBLEM = "My wifi connection keeps dropping every few minutes"
+
+
+def test_declined_case_is_not_returned(tmp_path):
+    knowledge = KnowledgeBase(str(tmp_path / "knowledge.sqlite3"))
+    case_id = knowledge.record(PROBLEM, REPORT, system="Linux")
+    assert knowledge.match(PROBLEM, system="Linux").case.id == case_id
+
+    knowledge.set_approval(case_id, False)
+    assert knowledge.match(PROBLEM, system="Linux") is None
+
+
+def test_declined_case_does_not_hide_an_undecided_one(tmp_path):
+    knowledge = KnowledgeBase(str(tmp_path / "knowledge.sqlite3"))
+    declined = knowledge.record(PROBLEM, REPORT, system="Linux")
+    undecided = knowledge.record("Wifi connection keeps dropping on my laptop", REPORT, system="Linux")
+    knowledge.set_approval(declined, False)
+    assert knowledge.match(PROBLEM, system="Linux").case.id == undecided
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("My Wi-Fi keeps dropping and the drops are frequent") == ["wi-fi", "drop", "drop", "frequent"]
+    assert tokenize("charging the charger") == tokenize("charge the charger")
+    assert tokenize("Laptop crashes") == ["laptop", "crash"]
+
+
+def test_only_complete_scripts_on_the_same_platform_are_recorded_and_matched(tmp_path):
+    knowledge = KnowledgeBase(str(tmp_path / "knowledge.sqlite3"))
+    assert knowledge.record(PROBLEM, "**Final Diagnosis:** Unknown.", system="Linux") is None
+    case_id = knowledge.record(PROBLEM, REPORT, facts="x" * 10000, system="Linux")
+    case = knowledge.get(case_id)
+    assert case.script_kind == "shell" and case.diagnosis == "The adapter is power-saving."
+    assert len(case.facts) == 8000 and case.approved is None
+    assert knowledge.match(PROBLEM, system="Windows") is None
+    assert knowledge.match("The screen flickers when I open the lid", system="Linux") is None
+
+
+def test_approved_case_wins_a_close_match(tmp_path):
+    knowledge = KnowledgeBase(str(tmp_path / "knowledge.sqlite3"))
+    undecided = knowledge.record(PROBLEM + " at home", REPORT, system="Linux")
+    approved = knowledge.record(PROBLEM + " at work", REPORT, system="Linux")
+    assert knowledge.match(PROBLEM, system="Linux").case.id == undecided
+    knowledge.set_approval(approved, True)
+    assert knowledge.match(PROBLEM, system="Linux").case.id == approved
+
+
+def test_parse_verdict():
+    assert parse_verdict("CONFIRMED\nThe same adapter errors appear.") == (True, "The same adapter errors appear.")
+    assert parse_verdict("REJECTED\nDifferent adapter.")[0] is False
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from src.laptop_repair.cancellation import CancellationToken, DiagnosisCancelled
+from src.laptop_repair.llm import DiagnosticLLM
+
+
+@pytest.fixture
+def llm():
+    return DiagnosticLLM(model="gemini/gemini-1.5-flash-latest", api_key="test")
+
+
+def test_cancellable_calls_are_not_capped(llm):
+    # Every call waits for all the others, so this only finishes if all run at once
+    calls = 16
+    barrier = threading.Barrier(calls, timeout=5)
+    results = []
+
+    def complete(number):
+        barrier.wait()
+        return number
+
+    def diagnose(number):
+        results.append(llm._cancellable(CancellationToken(), complete, number))
+
+    threads = [threading.Thread(target=diagnose, args=(number,)) for number in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert sorted(results) == list(range(calls))
+
+
+def test_cancelling_abandons_the_request(llm):
+    token = CancellationToken()
+    release = threading.Event()
+    threading.Timer(0.1, token.cancel).start()
+    started = time.perf_counter()
+    with pytest.raises(DiagnosisCancelled):
+        llm._cancellable(token, release.wait, 5)
+    assert time.perf_counter() - started < 2
+    release.set()
+
+
+def test_errors_reach_the_caller(llm):
+    def fail():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        llm._cancellable(CancellationToken(), fail)
@@ -0,0 +1,53 @@
+import time
+
+from src.laptop_repair.llm_cache import LLMResponseCache, cache_key
+from src.laptop_repair.planner import FACTS_END, FACTS_START
+
+MODEL = "gemini/gemini-1.5-flash-latest"
+
+
+def conversation(observation, facts="Focus areas: disk\nFilesystem Size Avail\n/dev/sda1 100G 1.04G"):
+    return [{"role": "user", "content": f"Diagnose: disk full\n{FACTS_START}\n{facts}\n{FACTS_END}"},
+            {"role": "assistant", "content": f"Thought: check\nAction: run\nAction Input: top\n"
+                                             f"Observation: {observation}"}]
+
+
+TOP = "top - {time} up {uptime}, 1 user\nPID USER %CPU COMMAND\n4242 root 97.0 miner"
+
+
+def test_key_ignores_clock_times_uptimes_and_whitespace():
+    first = conversation(TOP.format(time="10:01:02", uptime="3 days, 4:05"))
+    later = conversation(TOP.format(time="11:59:59", uptime="3 days, 5:58") + "   \n")
+    assert cache_key(MODEL, first) == cache_key(MODEL, later)
+    dmesg = "[ 1234.567890] usb 1-1: disconnect"
+    assert cache_key(MODEL, conversation(dmesg)) == cache_key(MODEL, conversation(dmesg.replace("1234.5", "9876.5")))
+    stamped = "2026-10-18T09:12:03Z Service failed"
+    assert (cache_key(MODEL, conversation(stamped))
+            == cache_key(MODEL, conversation(stamped.replace("2026-10-18T09:12:03Z", "2026-10-19 17:00:00"))))
+
+
+def test_key_changes_with_the_system_state():
+    observation = TOP.format(time="10:01:02", uptime="3 days, 4:05")
+    key = cache_key(MODEL, conversation(observation))
+    # A different process, free space or build number is a different system state
+    assert key != cache_key(MODEL, conversation(observation.replace("4242", "4243")))
+    assert key != cache_key(MODEL, conversation(observation, facts="Focus areas: disk\n/dev/sda1 100G 1.0G"))
+    assert key != cache_key(MODEL, conversation(observation + "\nOS Build 19045.3693"))
+    assert key != cache_key("gemini/gemini-1.5-pro-latest", conversation(observation))
+
+
+def test_responses_expire_and_least_recently_used_are_dropped(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_entries=2, max_age=60)
+    cache.put("a", MODEL, "answer a")
+    cache.put("b", MODEL, "answer b")
+    time.sleep(0.01)
+    assert cache.get("a") == "answer a"
+    cache.put("c", MODEL, "answer c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer a" and cache.get("c") == "answer c"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    expired = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_age=0)
+    assert expired.get("a") is None
+    cache.clear()
+    assert cache.get("c") is None
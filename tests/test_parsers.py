@@ -0,0 +1,90 @@
+import os
+
+from src.laptop_repair.benchmark import BENCHMARK_DIR
+from src.laptop_repair.tools.parsers import (find_parser, parse_df, parse_netstat, parse_ps_aux, parse_tasklist,
+                                             parse_wmic_logicaldisk, parse_wmic_process, parse_wmic_table)
+
+WMIC_PROCESS = ("CommandLine                                  Name          ProcessId\n"
+                "\n"
+                "C:\\Windows\\system32\\svchost.exe -k netsvcs   svchost.exe   2534\n"
+                "                                             System        4\n")
+
+
+def fixture(plat, name):
+    with open(os.path.join(BENCHMARK_DIR, "fixtures", plat, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_tasklist():
+    records = parse_tasklist(fixture("windows", "tasklist.txt"))
+    assert len(records) == 40
+    assert records[0] == {"name": "System Idle Process", "pid": 0, "session": "Services", "mem_mb": 0.0}
+    assert records[3] == {"name": "smss.exe", "pid": 821, "session": "Services", "mem_mb": 605.5}
+    assert records[-2] == {"name": "SearchIndexer.exe", "pid": 14861, "session": "Console", "mem_mb": 1416.0}
+
+
+def test_ps_aux():
+    records = parse_ps_aux(fixture("linux", "ps_aux.txt"))
+    assert len(records) == 28
+    assert records[3] == {"name": "NetworkManager", "pid": 689, "user": "root", "cpu_percent": 1.2,
+                          "mem_percent": 3.8, "mem_mb": 595.7, "cmdline": "/usr/sbin/NetworkManager --no-daemon"}
+    assert records[20]["name"] == "bash"
+    assert records[26]["mem_mb"] == 1171.9
+
+
+def test_netstat_on_windows():
+    records = parse_netstat(fixture("windows", "netstat_an.txt"))
+    assert len(records) == 38
+    assert records[0] == {"proto": "TCP", "local": "0.0.0.0:135", "remote": "0.0.0.0:0", "state": "LISTENING"}
+    assert records[-1] == {"proto": "UDP", "local": "0.0.0.0:5355", "remote": "*:*", "state": ""}
+    assert sum(r["state"] == "ESTABLISHED" for r in records) == 8
+
+
+def test_netstat_on_linux():
+    records = parse_netstat(fixture("linux", "netstat_tuln.txt"))
+    assert [r["proto"] for r in records] == ["TCP", "TCP", "TCP", "TCP6", "UDP", "UDP", "UDP"]
+    assert records[3] == {"proto": "TCP6", "local": ":::22", "remote": ":::*", "state": "LISTEN"}
+    assert records[4] == {"proto": "UDP", "local": "127.0.0.53:53", "remote": "0.0.0.0:*", "state": ""}
+
+
+def test_wmic_table():
+    records = parse_wmic_table(fixture("windows", "wmic_diskdrive_get_status_size_model.txt"))
+    assert len(records) == 2
+    assert set(records[0]) == {"model", "size", "status"}
+    assert all(record["status"] for record in records)
+
+
+def test_wmic_process():
+    assert parse_wmic_process(WMIC_PROCESS) == [
+        {"name": "svchost.exe", "pid": 2534, "cmdline": "C:\\Windows\\system32\\svchost.exe -k netsvcs"},
+        {"name": "System", "pid": 4, "cmdline": ""},
+    ]
+
+
+def test_wmic_logicaldisk():
+    assert parse_wmic_logicaldisk(fixture("windows", "wmic_logicaldisk_get_size_freespace_caption.txt")) == [
+        {"device": "C:", "size_gb": 237.83, "free_gb": 9.0, "percent_used": 96.2},
+        {"device": "D:", "size_gb": 931.51, "free_gb": 375.0, "percent_used": 59.7},
+    ]
+
+
+def test_df():
+    records = parse_df(fixture("linux", "df_h.txt"))
+    assert [r["mount"] for r in records] == ["/run", "/", "/dev/shm", "/boot/efi", "/media/backup"]
+    assert records[1] == {"device": "/dev/nvme0n1p2", "mount": "/", "size_gb": 234.0, "free_gb": 1.2,
+                          "percent_used": 100.0}
+    assert records[3]["size_gb"] == 0.5
+
+
+def test_unparseable_output_yields_no_records():
+    for parser in (parse_tasklist, parse_ps_aux, parse_netstat, parse_wmic_table, parse_df):
+        assert parser("") == []
+        assert parser("Access is denied.") == []
+
+
+def test_find_parser_takes_the_longest_prefix():
+    assert find_parser("wmic logicaldisk get size,freespace,caption") == ("disks", parse_wmic_logicaldisk)
+    assert find_parser("WMIC   process list brief") == ("processes", parse_wmic_process)
+    assert find_parser("wmic cpu get name") == ("table", parse_wmic_table)
+    assert find_parser("df -h") == ("disks", parse_df)
+    assert find_parser("uname -a") is None
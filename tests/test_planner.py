@@ -0,0 +1,82 @@
+from src.laptop_repair.planner import (DOMAINS, FACTS_END, FACTS_START, NO_FACTS, DiagnosticPlan, classify,
+                                      domain_commands, format_facts, plan_diagnostics, plan_domains)
+from src.laptop_repair.tools.command_runner import CommandResult
+
+GENERIC = ["free -h", "df -h"]
+
+
+def test_classify_matches_whole_words_and_prefixes():
+    assert classify("My WiFi keeps disconnecting") == {"network": 2}
+    assert classify("The laptop is sluggish and freezes") == {"performance": 2}
+    assert classify("Disks are full") == {"disk": 2}
+    # "ram" is a whole word, so "program" is not a memory problem
+    assert classify("A program shows a dialog") == {}
+
+
+def test_classify_orders_categories_by_hits():
+    assert list(classify("Slow internet: pages lag and downloads freeze, and the disk is full")) == [
+        "performance", "network", "disk"]
+
+
+def test_windows_problems_map_to_windows_commands():
+    plan = plan_diagnostics("Blue screen after the latest update", system="Windows")
+    assert plan.categories == ["boot"]
+    assert plan.commands == ["systeminfo", "wmic startup get caption,command,location", "bcdedit /enum",
+                             "powershell Get-EventLog -LogName System -EntryType Error -Newest 10"]
+
+
+def test_linux_problems_map_to_linux_commands():
+    plan = plan_diagnostics("No wifi and the disk is full", system="Linux")
+    assert plan.scores == {"disk": 2, "network": 1}
+    assert plan.commands == ["uname -a", "df -h", "lsblk", "dmesg | tail -20", "ifconfig", "netstat -tuln"]
+
+
+def test_commands_shared_by_categories_are_planned_once():
+    plan = plan_diagnostics("Slow and out of memory", system="Linux")
+    assert plan.categories == ["memory", "performance"]
+    assert plan.commands == ["uname -a", "free -h", "ps aux", "top -bn1 | head -20", "lscpu"]
+
+
+def test_no_match_falls_back_to_the_generic_set():
+    plan = plan_diagnostics("Something is wrong with it", system="Linux", fallback=GENERIC)
+    assert plan.general
+    assert plan.commands == ["uname -a"] + GENERIC
+    assert plan_diagnostics("Something is wrong with it", system="Windows").commands == ["systeminfo"]
+    # The fallback is only for problems that match nothing
+    assert "free -h" not in plan_diagnostics("No wifi", system="Linux", fallback=GENERIC).commands
+
+
+def test_plan_domains():
+    assert plan_domains(plan_diagnostics("No wifi", system="Linux")) == ["network"]
+    assert plan_domains(plan_diagnostics("Battery drains and it will not boot", system="Linux")) == [
+        "performance", "boot"]
+    assert plan_domains(plan_diagnostics("Something is wrong", system="Linux")) == list(DOMAINS)
+    assert plan_domains(None) == list(DOMAINS)
+
+
+def test_domain_commands():
+    assert domain_commands("storage", system="Windows") == [
+        "wmic logicaldisk get size,freespace,caption", "wmic diskdrive get status,size,model", "dir %temp% /a"]
+    assert domain_commands("performance", system="Linux") == [
+        "free -h", "ps aux", "top -bn1 | head -20", "lscpu", "dmesg | tail -20"]
+
+
+def test_format_facts():
+    plan = plan_diagnostics("The disk is full", system="Linux")
+    results = {
+        "uname -a": CommandResult(command="uname -a", stdout="Linux laptop 6.5.0", returncode=0),
+        "df -h": CommandResult(command="df -h", error="Error: 'df' was not found."),
+    }
+    facts = format_facts(plan, results).splitlines()
+    assert facts[0] == FACTS_START
+    assert facts[1] == "Focus areas: disk"
+    assert facts[-1] == FACTS_END
+    assert "--- Command Output for 'uname -a' ---" in facts
+    assert "'df -h': Error: 'df' was not found." in facts
+    assert facts[-2] == "Still running (request with the tool if needed): lsblk, dmesg | tail -20"
+
+
+def test_format_facts_without_commands():
+    assert format_facts(DiagnosticPlan(), {}) == NO_FACTS
+    general = format_facts(DiagnosticPlan(commands=["uname -a"]), {})
+    assert "Focus areas: general" in general.splitlines()
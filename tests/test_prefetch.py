@@ -0,0 +1,92 @@
+import threading
+
+from src.laptop_repair.cancellation import CancellationToken
+from src.laptop_repair.tools.command_cache import CommandCache
+from src.laptop_repair.tools.command_runner import CommandResult
+from src.laptop_repair.tools.custom_tool import SystemCommandTool
+from src.laptop_repair.tools.prefetch import DiagnosticPrefetcher
+
+
+class Runner:
+    """Fake command runner that counts calls and can hold commands until released."""
+
+    def __init__(self, hold=()):
+        self.hold = set(hold)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, command):
+        with self._lock:
+            self.calls.append(command)
+        if command in self.hold:
+            self.started.set()
+            self.release.wait(5)
+        return CommandResult(command, stdout=f"output of {command}", returncode=0)
+
+
+def test_tool_calls_are_served_from_the_prefetch():
+    runner = Runner()
+    prefetcher = DiagnosticPrefetcher(max_workers=2, runner=runner)
+    prefetcher.start(["df -h", "free -h"])
+    tool = SystemCommandTool(native=False, cache=None, runner=runner, prefetcher=prefetcher)
+    try:
+        assert "output of df -h" in tool._run("DF   -h")
+        assert sorted(runner.calls) == ["df -h", "free -h"]
+        assert set(prefetcher.collected()) == {"df -h", "free -h"}
+    finally:
+        prefetcher.shutdown(wait=True)
+
+
+def test_get_waits_for_a_command_in_flight():
+    runner = Runner(hold={"lsblk"})
+    prefetcher = DiagnosticPrefetcher(runner=runner)
+    prefetcher.start(["lsblk"])
+    assert runner.started.wait(5)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(prefetcher.get("lsblk")))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and "lsblk" not in prefetcher.collected()
+    runner.release.set()
+    waiter.join(5)
+    assert results[0].stdout == "output of lsblk"
+    assert runner.calls == ["lsblk"]
+    prefetcher.shutdown(wait=True)
+
+
+def test_cached_and_scheduled_commands_are_not_collected_again():
+    cache = CommandCache()
+    cache.put("uname -a", CommandResult("uname -a", stdout="Linux", returncode=0))
+    runner = Runner()
+    prefetcher = DiagnosticPrefetcher(runner=runner, cache=cache)
+    prefetcher.start(["uname -a", "df -h"])
+    prefetcher.start(["df   -h"])
+    prefetcher.shutdown(wait=True)
+    assert runner.calls == ["df -h"]
+    assert cache.get("df -h").stdout == "output of df -h"
+
+
+def test_cancel_shuts_down_and_drops_queued_commands():
+    token = CancellationToken()
+    runner = Runner(hold={"ps aux"})
+    prefetcher = DiagnosticPrefetcher(max_workers=1, runner=runner, cancel_token=token)
+    prefetcher.start(["ps aux", "lsusb"])
+    assert runner.started.wait(5)
+    token.cancel()
+    runner.release.set()
+    assert prefetcher.get("lsusb") is None
+    assert prefetcher.get("ps aux").stdout == "output of ps aux"
+    prefetcher.start(["lspci"])
+    assert "lspci" not in prefetcher
+    assert runner.calls == ["ps aux"]
+
+
+def test_shutdown_releases_the_cancel_token():
+    token = CancellationToken()
+    for _ in range(3):
+        prefetcher = DiagnosticPrefetcher(runner=Runner(), cancel_token=token)
+        prefetcher.start(["df -h"])
+        prefetcher.shutdown(wait=True)
+    assert token._callbacks == []
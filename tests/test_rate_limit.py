@@ -0,0 +1,251 @@
+import asyncio
+import threading
+
+import crewai
+import litellm
+import pytest
+
+from src.laptop_repair.cancellation import CancellationToken, DiagnosisCancelled, current_token
+from src.laptop_repair.llm import DiagnosticLLM
+from src.laptop_repair.rate_limit import DEFAULT_TPM, RateLimiter, is_rate_limited, limits_for
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_is_rate_limited_follows_status_messages_and_causes():
+    assert is_rate_limited(QuotaError())
+    assert is_rate_limited(RuntimeError("429 RESOURCE_EXHAUSTED"))
+    assert not is_rate_limited(RuntimeError("500 internal error"))
+    try:
+        try:
+            raise QuotaError()
+        except QuotaError as e:
+            raise RuntimeError("The agent step failed") from e
+    except RuntimeError as wrapped:
+        assert is_rate_limited(wrapped)
+    assert is_rate_limited(litellm.RateLimitError("quota", llm_provider="gemini", model="gemini/x"))
+
+
+def test_backoff_grows_is_capped_and_honours_retry_after():
+    limiter = RateLimiter(backoff_base=1.0, backoff_cap=8.0)
+    for attempt, full in ((0, 1.0), (2, 4.0), (10, 8.0)):
+        assert full / 2 <= limiter.backoff(attempt) <= full
+    error = QuotaError()
+    error.response = Response({"retry-after": "3"})
+    assert limiter.backoff(0, error) == 3.0
+    error.response = Response({"retry-after": "600"})
+    assert limiter.backoff(0, error) == 8.0
+
+
+def test_rate_limited_requests_are_retried_until_they_succeed():
+    limiter = RateLimiter(backoff_base=0.01)
+    attempts = []
+
+    def request():
+        attempts.append(True)
+        if len(attempts) < 3:
+            raise QuotaError()
+        return "ok"
+
+    assert limiter.call(request, prompt_tokens=10) == "ok"
+    assert len(attempts) == 3
+    assert limiter.metrics.rate_limited == limiter.metrics.retries == 2
+
+
+def test_retries_give_up_and_other_errors_pass_through():
+    limiter = RateLimiter(max_retries=1, backoff_base=0.01)
+
+    def limited():
+        raise QuotaError()
+
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(QuotaError):
+        limiter.call(limited, prompt_tokens=10)
+    with pytest.raises(ValueError):
+        limiter.call(broken, prompt_tokens=10)
+    assert limiter.metrics.retries == 1
+
+
+def test_identical_requests_in_flight_share_one_answer():
+    limiter = RateLimiter()
+    started, release = threading.Event(), threading.Event()
+    requests = []
+
+    def request():
+        requests.append(True)
+        started.set()
+        release.wait(5)
+        return "shared"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(limiter.call(request, 10, key="same")))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(limiter.call(request, 10, key="same")))
+    follower.start()
+    while limiter.metrics.coalesced == 0:
+        follower.join(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ["shared", "shared"]
+    assert len(requests) == 1
+    assert limiter.metrics.requests == 1 and limiter.metrics.coalesced == 1
+
+
+def test_async_requests_retry_and_share():
+    limiter = RateLimiter(backoff_base=0.01)
+    attempts = []
+
+    async def request():
+        attempts.append(True)
+        await asyncio.sleep(0.05)
+        if len(attempts) == 1:
+            raise QuotaError()
+        return "ok"
+
+    async def both():
+        return await asyncio.gather(limiter.acall(request, 10, key="same"), limiter.acall(request, 10, key="same"))
+
+    assert asyncio.run(both()) == ["ok", "ok"]
+    assert len(attempts) == 2
+    assert limiter.metrics.coalesced == 1 and limiter.metrics.retries == 1
+
+
+def test_limits_for_merges_default_and_model_entries():
+    config = {"rate_limits": {"default": {"rpm": 10}, "gemini/pro": {"rpm": 2, "tpm": 5000}}}
+    assert limits_for("gemini/pro", config) == {"rpm": 2, "tpm": 5000}
+    assert limits_for("gemini/flash", config) == {"rpm": 10, "tpm": DEFAULT_TPM}
+    assert limits_for("gemini/flash", None)["tpm"] == DEFAULT_TPM
+
+
+def test_waiting_for_the_buckets_is_reported_as_queue_time():
+    limiter = RateLimiter(rpm=600)
+    # Use up the burst so the next request waits for one refill (0.1 s at 600 rpm)
+    limiter.requests.reserve(600)
+    assert limiter.call(lambda: "ok", prompt_tokens=10) == "ok"
+    assert limiter.metrics.requests == 1
+    assert limiter.metrics.queued == 1
+    assert 0.05 < limiter.metrics.queue_seconds < 0.5
+
+
+def test_limiter_is_the_only_throttle_for_concurrent_diagnoses(monkeypatch):
+    # Each completion waits for all the others, so any fixed pool below `calls` would deadlock
+    calls = 12
+    barrier = threading.Barrier(calls, timeout=5)
+
+    def complete(self, messages, **kwargs):
+        barrier.wait()
+        return "Final Answer: done"
+
+    monkeypatch.setattr(crewai.LLM, "call", complete)
+    limiter = RateLimiter(rpm=600)
+    llm = DiagnosticLLM(model="gemini/gemini-1.5-flash-latest", api_key="test", rate_limiter=limiter)
+    results = []
+
+    def diagnose(number):
+        current_token.set(CancellationToken())
+        results.append(llm.call([{"role": "user", "content": f"problem {number}"}]))
+
+    threads = [threading.Thread(target=diagnose, args=(number,)) for number in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert results == ["Final Answer: done"] * calls
+    assert limiter.metrics.requests == calls
+    assert limiter.metrics.queued == 0
+
+
+def test_async_follower_retries_when_the_leader_is_cancelled():
+    limiter = RateLimiter()
+    leader_token, follower_token = CancellationToken(), CancellationToken()
+    requests = []
+
+    def request(token):
+        async def run():
+            requests.append(token)
+            await asyncio.sleep(0.2)
+            token.raise_if_cancelled()
+            return "answer"
+        return run
+
+    async def scenario():
+        leader = asyncio.ensure_future(limiter.acall(request(leader_token), 10, "same", leader_token))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(limiter.acall(request(follower_token), 10, "same", follower_token))
+        await asyncio.sleep(0.05)
+        leader_token.cancel()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "answer"
+    assert requests == [leader_token, follower_token]
+    assert limiter.metrics.coalesced == 1
+
+
+def test_async_follower_stops_on_its_own_cancel():
+    limiter = RateLimiter()
+    token = CancellationToken()
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return "answer"
+
+    async def scenario():
+        leader = asyncio.ensure_future(limiter.acall(slow, 10, "same"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(limiter.acall(slow, 10, "same", token))
+        await asyncio.sleep(0.05)
+        token.cancel()
+        with pytest.raises(DiagnosisCancelled):
+            await follower
+        # The shared request itself keeps running for the leader
+        return await leader
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_sync_follower_retries_when_an_async_leader_is_cancelled():
+    limiter = RateLimiter()
+    started = threading.Event()
+    loop_ready = []
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(5)
+        return "leader"
+
+    async def lead():
+        task = asyncio.ensure_future(limiter.acall(slow, 10, "same"))
+        loop_ready.append((asyncio.get_running_loop(), task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=lambda: asyncio.run(lead()))
+    thread.start()
+    assert started.wait(5)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(limiter.call(lambda: "follower", 10, "same",
+                                                                           CancellationToken())))
+    follower.start()
+    while limiter.metrics.coalesced == 0:
+        follower.join(0.01)
+    loop, task = loop_ready[0]
+    loop.call_soon_threadsafe(task.cancel)
+    follower.join(5)
+    thread.join(5)
+    assert results == ["follower"]
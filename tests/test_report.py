@@ -0,0 +1,49 @@
+from src.laptop_repair.report import ReportParser, parse_report
+
+REPORT = """Final Answer: **Problem Summary:** Wi-Fi drops every few minutes.
+**Investigation & Analysis:**
+The adapter resets in dmesg.
+**Final Diagnosis:** Power saving turns the adapter off.
+**Proposed Solution:** Restart NetworkManager.
+--- SHELL SCRIPT START ---
+```sh
+sudo systemctl restart NetworkManager
+```
+--- SHELL SCRIPT END ---
+Run it as root."""
+
+
+def test_sections_and_script_are_split():
+    report = parse_report(REPORT)
+    assert report.problem_summary == "Wi-Fi drops every few minutes."
+    assert report.analysis == "The adapter resets in dmesg."
+    assert report.diagnosis == "Power saving turns the adapter off."
+    assert report.solution == "Restart NetworkManager."
+    assert report.script == "sudo systemctl restart NetworkManager"
+    assert report.script_kind == "shell" and report.script_complete
+    assert "sudo systemctl" not in report.body and "Run it as root." in report.body
+
+
+def test_sections_are_reported_while_streaming():
+    seen = []
+    parser = ReportParser(on_section=lambda section, report: seen.append(section))
+    for start in range(0, len(REPORT), 7):
+        parser.feed(REPORT[start:start + 7])
+    assert seen == ["problem_summary", "analysis", "diagnosis", "solution", "script"]
+    assert parser.close().script_complete
+
+
+def test_fenced_and_unterminated_scripts():
+    report = parse_report("## Final Diagnosis\nDisk full.\n```bat\ncleanmgr /sagerun:1\n```\n")
+    assert report.diagnosis == "Disk full."
+    assert report.script_kind == "batch" and report.script == "cleanmgr /sagerun:1" and report.script_complete
+
+    report = parse_report("**Diagnosis:** Disk full.\n--- SCRIPT START ---\nClear-RecycleBin -Force")
+    assert report.script_kind == "powershell"
+    assert report.script == "Clear-RecycleBin -Force" and not report.script_complete
+
+
+def test_other_code_blocks_stay_in_the_text():
+    report = parse_report("**Proposed Solution:** Run:\n```\nsfc /scannow\n```\n")
+    assert not report.has_script
+    assert "sfc /scannow" in report.solution
@@ -0,0 +1,82 @@
+from crewai import LLM
+
+from src.laptop_repair.routing import (PLANNING, SCRIPT_GENERATION, TOOL_SELECTION, ModelRouter, phase_models,
+                                       validate)
+from src.laptop_repair.tools.fix_catalog import FIX_LIST_HEADING
+
+FLASH = "fake/flash"
+PRO = "fake/pro"
+ACTION = "Thought: check the disk\nAction: run_system_command\nAction Input: {\"command\": \"df -h\"}"
+REPORT = ("Final Answer: **Problem Summary:** The disk is full.\n"
+          "--- SHELL SCRIPT START ---\nrm -rf /tmp/cache\n--- SHELL SCRIPT END ---")
+UNFINISHED = "Final Answer: **Problem Summary:** The disk is full.\n--- SHELL SCRIPT START ---\nrm -rf /tmp/cache"
+FIX_LIST = f"{FIX_LIST_HEADING} disk_cleanup on Linux:\n- rm -rf /tmp/cache"
+
+
+class FakeClient(LLM):
+    """Answers with whatever the test scripted for its model and logs each call."""
+
+    def __init__(self, model, answers, log):
+        super().__init__(model=model)
+        self.answers = answers
+        self.log = log
+
+    def call(self, messages, **kwargs):
+        self.log.append(self.model)
+        return self.answers[self.model]
+
+
+def make_router(answers, escalation=PRO):
+    log = []
+    clients = {}
+
+    def make_client(model):
+        return clients.setdefault(model, FakeClient(model, answers, log))
+
+    models = phase_models({"default": FLASH, "phases": {SCRIPT_GENERATION: PRO}}, FLASH)
+    return ModelRouter(models, make_client, escalation), log
+
+
+def conversation(observation):
+    return [{"role": "system", "content": "You are the lead diagnostician."},
+            {"role": "user", "content": "Diagnose: my disk is full"},
+            {"role": "assistant", "content": f"{ACTION}\nObservation: {observation}"}]
+
+
+def test_first_step_is_planning_and_later_ones_tool_selection():
+    router, log = make_router({FLASH: ACTION, PRO: REPORT})
+    router.call(conversation("")[:2])
+    router.call(conversation("Filesystem  Use%\n/dev/sda1  99%"))
+    assert log == [FLASH, FLASH]
+    assert router.models[PLANNING] == router.models[TOOL_SELECTION] == FLASH
+
+
+def test_steps_after_the_fix_list_go_to_the_script_model_once():
+    router, log = make_router({FLASH: REPORT, PRO: REPORT})
+    assert router.call(conversation(FIX_LIST)) == REPORT
+    assert log == [PRO]
+
+
+def test_valid_early_report_is_kept():
+    router, log = make_router({FLASH: REPORT, PRO: REPORT})
+    assert router.call(conversation("Filesystem  Use%\n/dev/sda1  99%")) == REPORT
+    assert log == [FLASH]
+
+
+def test_failing_early_report_is_rewritten_by_the_script_model():
+    router, log = make_router({FLASH: UNFINISHED, PRO: REPORT})
+    assert router.call(conversation("Filesystem  Use%\n/dev/sda1  99%")) == REPORT
+    assert log == [FLASH, PRO]
+
+
+def test_failing_step_is_escalated_once():
+    router, log = make_router({FLASH: "I am not sure.", PRO: ACTION})
+    assert router.call(conversation("Filesystem  Use%\n/dev/sda1  99%")) == ACTION
+    assert log == [FLASH, PRO]
+
+
+def test_validate():
+    assert validate(TOOL_SELECTION, ACTION) is None
+    assert validate(TOOL_SELECTION, "I am not sure.") is not None
+    assert validate(SCRIPT_GENERATION, REPORT) is None
+    assert validate(SCRIPT_GENERATION, UNFINISHED) == "has a fix script without its end marker"
@@ -0,0 +1,61 @@
+from src.laptop_repair.tools.script_templates import (FIX_PLAN_END, FIX_PLAN_START, apply_fix_plan, parse_fix_plan,
+                                                      render_script, select_fixes)
+from src.laptop_repair.tools.fix_catalog import fix_catalog
+
+PLAN = f"""**Final Diagnosis:** The disk is full.
+{FIX_PLAN_START}
+script: bash
+1. sudo apt-get clean  # Clear the apt package cache
+- `sudo journalctl --vacuum-time=3d`
+rm -rf /
+{FIX_PLAN_END}
+Reboot afterwards."""
+
+
+def test_parse_fix_plan_strips_markup_and_reads_the_kind():
+    plan = parse_fix_plan(PLAN)
+    assert plan.kind == "shell"
+    assert plan.commands == ("sudo apt-get clean", "sudo journalctl --vacuum-time=3d", "rm -rf /")
+    assert plan.complete
+
+
+def test_parse_fix_plan_without_a_plan_or_end_marker():
+    assert parse_fix_plan("No plan here.") is None
+    plan = parse_fix_plan(f"{FIX_PLAN_START}\nsfc /scannow")
+    assert plan.commands == ("sfc /scannow",) and not plan.complete and plan.kind is None
+
+
+def test_select_fixes_keeps_catalog_commands_once():
+    plan = parse_fix_plan(f"{FIX_PLAN_START}\nsfc /scannow\nSFC /SCANNOW\nformat c:\n{FIX_PLAN_END}")
+    entries, unknown = select_fixes(plan, "Windows")
+    assert [entry.command for entry in entries] == ["sfc /scannow"]
+    assert unknown == ["format c:"]
+
+
+def test_render_script_confirms_irreversible_steps():
+    entries = tuple(fix_catalog.query(category="system_update", system="Linux"))
+    script = render_script(entries, "shell", "Fix for: slow updates")
+    assert script.startswith("#!/bin/sh\n# Fix for: slow updates")
+    assert "if sudo apt-get update; then" in script
+    assert script.count("This step cannot be undone") == 1
+
+    batch = render_script(entries, "batch", "Fix & repair")
+    assert "REM Fix  repair" in batch
+    assert "net session >nul 2>&1" in batch
+    assert 'choice /c YN /m "This step cannot be undone. Run it"' in batch
+
+
+def test_apply_fix_plan_replaces_the_plan_with_a_script():
+    report = apply_fix_plan(PLAN, system="Linux", title="Fix for: disk full")
+    assert FIX_PLAN_START not in report
+    assert "--- SHELL SCRIPT START ---" in report and "--- SHELL SCRIPT END ---" in report
+    assert "sudo journalctl --vacuum-time=3d" in report
+    assert "Not included (not in the approved fix catalog): rm -rf /" in report
+    assert report.endswith("Reboot afterwards.")
+
+
+def test_apply_fix_plan_removes_plans_without_catalog_commands():
+    report = apply_fix_plan(f"Disk full.\n{FIX_PLAN_START}\nrm -rf /\n{FIX_PLAN_END}\nDone.", system="Linux")
+    assert report == "Disk full.\nNot included (not in the approved fix catalog): rm -rf /\nDone."
+    assert apply_fix_plan(f"Disk full.\n{FIX_PLAN_START}\n{FIX_PLAN_END}", system="Linux") == "Disk full.\n"
+    assert apply_fix_plan("Just a diagnosis.", system="Linux") == "Just a diagnosis."
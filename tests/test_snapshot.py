@@ -0,0 +1,57 @@
+from src.laptop_repair.snapshot import SnapshotStore, SystemSnapshot, diff_snapshots
+from src.laptop_repair.tools.command_runner import CommandResult
+
+
+def snapshot(*results):
+    taken = SystemSnapshot()
+    for result in results:
+        taken.record(result)
+    return taken
+
+
+def disks(*rows):
+    records = [{"device": device, "mount": mount, "size_gb": 100.0, "free_gb": free, "percent_used": 0.0}
+               for device, mount, free in rows]
+    return CommandResult("df -h", returncode=0, records=records, source="native")
+
+
+def processes(*names):
+    return CommandResult("ps aux", returncode=0, records=[{"name": name, "pid": 1} for name in names],
+                         source="native")
+
+
+def test_rows_are_compared_by_identity():
+    old = snapshot(processes("sshd", "cupsd"), disks(("/dev/sda1", "/", 50.0)))
+    new = snapshot(processes("sshd", "miner"), disks(("/dev/sda1", "/", 49.5)))
+    changes = {(change.command, change.change, change.key) for change in diff_snapshots(old, new)}
+    assert changes == {("ps aux", "added", "miner"), ("ps aux", "removed", "cupsd")}
+
+
+def test_free_space_changes_over_the_threshold_are_reported():
+    old = snapshot(disks(("/dev/sda1", "/", 50.0)))
+    new = snapshot(disks(("/dev/sda1", "/", 42.0)))
+    [change] = diff_snapshots(old, new)
+    assert change.key == "/dev/sda1" and change.detail == "free space dropped 8.0 GB"
+    assert diff_snapshots(old, new, free_space_delta_gb=10) == []
+
+
+def test_new_commands_and_changed_text_output():
+    old = snapshot(CommandResult("uname -a", stdout="Linux 6.1", returncode=0))
+    new = snapshot(CommandResult("uname -a", stdout="Linux 6.2", returncode=0),
+                   CommandResult("free -h", stdout="Mem: 16G", returncode=0))
+    changes = {(change.command, change.change) for change in diff_snapshots(old, new)}
+    assert changes == {("uname -a", "changed"), ("free -h", "added")}
+
+
+def test_failed_results_are_not_recorded():
+    taken = snapshot(CommandResult("lsusb", returncode=1), CommandResult("lspci", error="not found"))
+    assert taken.entries == {}
+
+
+def test_store_round_trip_keeps_records(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.save(snapshot(processes("sshd"), CommandResult("uname -a", stdout="Linux 6.1", returncode=0)))
+    loaded = store.latest()
+    assert loaded.get("ps aux").records() == [{"name": "sshd", "pid": 1}]
+    assert loaded.get("uname -a").to_result().stdout == "Linux 6.1"
+    assert diff_snapshots(loaded, loaded) == []
@@ -0,0 +1,53 @@
+from src.laptop_repair.tools.command_runner import CommandResult
+from src.laptop_repair.tools.summarizer import estimate_tokens, summarize
+
+PS_HEADER = "USER         PID %CPU %MEM    VSZ   RSS TTY      STAT START   TIME COMMAND"
+
+
+def ps_aux(count):
+    rows = [f"root {pid:>11}  0.1  0.2  264000 {pid * 10:>6} ?        Ssl  08:01   0:25 /usr/bin/worker-{pid} --serve"
+            for pid in range(1, count + 1)]
+    return "\n".join([PS_HEADER] + rows) + "\n"
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_output_within_budget_is_not_summarized():
+    assert summarize(CommandResult(command="ps aux", stdout=ps_aux(3)), token_budget=1500) is None
+
+
+def test_processes_are_ranked_and_fit_the_budget():
+    summary = summarize(CommandResult(command="ps aux", stdout=ps_aux(500)), token_budget=400, top_n=15)
+    assert estimate_tokens(summary) <= 400
+    assert summary.startswith("[Summary: top 15 of 500 processes by memory/CPU; showing ")
+    assert "worker-500" in summary
+    assert "worker-1 " not in summary
+
+
+def test_rows_are_dropped_until_the_table_fits():
+    summary = summarize(CommandResult(command="ps aux", stdout=ps_aux(500)), token_budget=200, top_n=50)
+    shown = int(summary.split("showing ", 1)[1].split(" rows", 1)[0])
+    assert 1 <= shown < 50
+    assert estimate_tokens(summary) <= 200
+
+
+def test_unknown_output_keeps_its_head_and_tail():
+    lines = [f"line {n}: " + "x" * 40 for n in range(1000)]
+    summary = summarize(CommandResult(command="dmesg", stdout="\n".join(lines)), token_budget=300)
+    assert estimate_tokens(summary) <= 300
+    assert summary.startswith("line 0: ")
+    assert summary.rstrip().endswith(lines[-1])
+    assert "lines omitted] ..." in summary
+
+
+def test_disks_over_the_threshold_are_flagged():
+    rows = [f"/dev/sd{n}1  100G  {pct}G  {100 - pct}G  {pct}% /mnt/{n}" for n, pct in enumerate([10, 95, 50] * 40)]
+    stdout = "\n".join(["Filesystem      Size  Used Avail Use% Mounted on"] + rows)
+    summary = summarize(CommandResult(command="df -h", stdout=stdout), token_budget=300, disk_threshold=90)
+    assert summary.startswith("[Summary: 40 of 120 disks at or above 90% used;")
+    assert "YES" in summary
+    assert estimate_tokens(summary) <= 300
@@ -0,0 +1,31 @@
+from src.laptop_repair.tracing import Span, Tracer, format_breakdown
+
+
+def _tracer(*spans) -> Tracer:
+    tracer = Tracer(enabled=True)
+    for name, start, end in spans:
+        tracer._spans.append(Span(name=name, trace_id="t", span_id=f"{name}{start}", start=start, end=end))
+    return tracer
+
+
+def _other(tracer: Tracer) -> float:
+    line = format_breakdown(tracer).splitlines()[-1]
+    assert line.startswith("other (agent loop)")
+    return float(line.split()[3])
+
+
+def test_other_is_time_without_llm_or_tool_work():
+    tracer = _tracer(("crew.run", 0, 10), ("llm.call", 1, 3), ("tool.run", 5, 6))
+    assert _other(tracer) == 7.0
+
+
+def test_concurrent_spans_are_counted_once():
+    # Two runs side by side, with overlapping LLM calls adding up to more than the wall time
+    tracer = _tracer(("crew.run", 0, 10), ("crew.run", 0, 10),
+                     ("llm.call", 0, 9), ("llm.call", 0, 9), ("tool.run", 1, 8), ("llm.call", 9, 9.5))
+    assert _other(tracer) == 0.5
+
+
+def test_gaps_between_runs_are_not_overhead():
+    tracer = _tracer(("crew.run", 0, 2), ("crew.run", 5, 7), ("llm.call", 1, 6))
+    assert _other(tracer) == 2.0